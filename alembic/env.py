@@ -9,8 +9,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Importar los modelos de la aplicación
-from app.core.models import Conversation, User, EmailMessage
-from app.core.database import Base
+from app.core.models import Base
+from app.core.database import DATABASE_URL
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -32,7 +32,7 @@ target_metadata = Base.metadata
 
 def get_url():
     """Obtiene la URL de la base de datos desde las variables de entorno."""
-    return os.getenv("DATABASE_URL", "sqlite:///agentic_ai.db")
+    return DATABASE_URL
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -0,0 +1,37 @@
+"""Content hash of claim documents, so copies of a stored file reuse its storage location
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    # Tables created with create_all after the column was added already have it
+    if not inspector.has_table("claim_documents"):
+        return
+    
+    existing = {column["name"] for column in inspector.get_columns("claim_documents")}
+    if "content_sha256" not in existing:
+        with op.batch_alter_table("claim_documents") as batch_op:
+            batch_op.add_column(sa.Column("content_sha256", sa.String(64), nullable=True))
+    
+    indexes = {index["name"] for index in inspector.get_indexes("claim_documents")}
+    if "ix_claim_documents_content_sha256" not in indexes:
+        op.create_index("ix_claim_documents_content_sha256", "claim_documents", ["content_sha256"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_claim_documents_content_sha256", "claim_documents")
+    with op.batch_alter_table("claim_documents") as batch_op:
+        batch_op.drop_column("content_sha256")
@@ -2,7 +2,7 @@
 
 from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, BigInteger, ForeignKey, Enum, Numeric, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
@@ -76,6 +76,10 @@ class ClaimDocument(Base):
     # Document source
     source_type = Column(String(50), nullable=False)  # 'email_attachment', 'web_form', 'manual_pdf'
     
+    # SHA-256 of the content; copies of an already stored file reuse its storage location.
+    # Deferred so documents still load on databases where alembic revision 0001 has not run
+    content_sha256 = deferred(Column(String(64), index=True))
+    
     # Timestamps
     created_at = Column(DateTime, default=func.now())
     
@@ -3,8 +3,10 @@ Procesador de claims que maneja el flujo completo desde la recepción del email.
 """
 
 import os
+import hashlib
 from datetime import datetime
 from typing import Dict, List, Optional
+from sqlalchemy import insert, inspect
 from app.core.database import get_db
 from app.core.models import Claim, ClaimDocument, ClaimStatus, generate_claim_number
 from app.services.gmail_service import GmailService
@@ -16,6 +18,7 @@ class ClaimsProcessor:
     def __init__(self):
         self.gmail_service = GmailService()
         self.storage_service = gcs_storage
+        self._content_hash_ready = False
     
     def process_claim_email(self, email_data: Dict) -> Dict:
         """
@@ -128,6 +131,15 @@ class ClaimsProcessor:
             return sender_header.split('<')[0].strip()
         return None
     
+    def _has_content_hash(self, db) -> bool:
+        """Indica si claim_documents ya tiene la columna content_sha256 (alembic upgrade head)."""
+        if not self._content_hash_ready:
+            columns = inspect(db.get_bind()).get_columns(ClaimDocument.__tablename__)
+            self._content_hash_ready = any(column['name'] == 'content_sha256' for column in columns)
+            if not self._content_hash_ready:
+                print("⚠️ claim_documents sin content_sha256: ejecuta 'alembic upgrade head' para reutilizar documentos")
+        return self._content_hash_ready
+    
     def _process_attachment(self, claim_id: int, claim_number: str, email_id: str, 
                           attachment: Dict, db) -> Optional[Dict]:
         """Procesa un adjunto individual."""
@@ -148,34 +160,53 @@ class ClaimsProcessor:
                 print(f"❌ Error descargando adjunto: {filename}")
                 return None
             
-            # Subir a Google Cloud Storage
-            storage_url = self.storage_service.upload_file(
-                file_content=attachment_data['content'],
-                filename=filename,
-                numero_siniestro=claim_number,
-                email_id=email_id,
-                content_type=mime_type
-            )
+            # Si el mismo archivo ya se subió (reenvíos del cliente), reutilizar su ubicación.
+            # Sin la migración de content_sha256 se sube siempre, como antes
+            content_sha256 = None
+            existing = None
+            if self._has_content_hash(db):
+                content_sha256 = hashlib.sha256(attachment_data['content']).hexdigest()
+                existing = db.query(ClaimDocument).filter(
+                    ClaimDocument.content_sha256 == content_sha256,
+                    ClaimDocument.storage_url.isnot(None)
+                ).first()
+            
+            if existing:
+                storage_url = existing.storage_url
+                storage_path = existing.storage_path
+                print(f"♻️ Documento ya almacenado, se reutiliza: {storage_url}")
+            else:
+                # Subir a Google Cloud Storage
+                storage_url = self.storage_service.upload_file(
+                    file_content=attachment_data['content'],
+                    filename=filename,
+                    numero_siniestro=claim_number,
+                    email_id=email_id,
+                    content_type=mime_type
+                )
+                storage_path = f"{claim_number}/email-{email_id}/{filename}"
             
             if storage_url:
                 print(f"✅ Documento subido exitosamente")
                 print(f"   URL: {storage_url}")
                 
-                # Crear registro en base de datos
-                document = ClaimDocument(
+                # Crear registro en base de datos (solo con las columnas que existen)
+                document = dict(
                     claim_id=claim_id,
                     filename=filename,
                     mime_type=mime_type,
                     file_size_bytes=size,
                     storage_url=storage_url,
-                    storage_path=f"{claim_number}/email-{email_id}/{filename}",
+                    storage_path=storage_path,
                     source_type='email_attachment'
                 )
+                if content_sha256:
+                    document['content_sha256'] = content_sha256
                 
-                db.add(document)
+                result = db.execute(insert(ClaimDocument).values(**document))
                 db.commit()
                 
-                print(f"✅ Documento registrado en BD: {document.id}")
+                print(f"✅ Documento registrado en BD: {result.inserted_primary_key[0]}")
                 
                 return {
                     'filename': filename,
@@ -7,7 +7,7 @@ import time
 import json
 import logging
 from typing import Dict, Any
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 
 try:
@@ -27,6 +27,10 @@ class GeminiOCRService:
             raise ImportError("Falta la librería google-generativeai. Instálala con 'pip install google-generativeai pillow'")
         genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Preprocesamiento de imágenes antes de enviarlas a Gemini
+        self.max_dimension = int(os.getenv('IMAGE_MAX_DIMENSION', '2048'))
+        self.grayscale = os.getenv('IMAGE_GRAYSCALE', 'true').lower() == 'true'
+        self.jpeg_quality = int(os.getenv('IMAGE_OUTPUT_QUALITY', '80'))
 
     def process_document_image(self, image_data: bytes, filename: str) -> Dict[str, Any]:
         """
@@ -39,10 +43,10 @@ class GeminiOCRService:
         """
         start_time = time.time()
         try:
-            # Convertir bytes a imagen PIL
+            # Convertir bytes a imagen PIL y reducirla antes de enviarla
             image = Image.open(io.BytesIO(image_data))
             prompt = self._create_ocr_prompt(filename)
-            response = self.model.generate_content([prompt, image])
+            response = self.model.generate_content([prompt, self._prepare_image(image)])
             result = self._parse_gemini_response(response.text, filename)
             processing_time = time.time() - start_time
             result.update({
@@ -64,6 +68,23 @@ class GeminiOCRService:
                 'structured_data': None
             }
 
+    def _prepare_image(self, image: Image.Image) -> Dict[str, Any]:
+        """
+        Endereza (EXIF), reduce y pasa a escala de grises la imagen y la codifica como JPEG.
+        Las fotos de teléfono (4000x3000, varios MB) se envían así en una fracción del tamaño.
+        """
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > self.max_dimension:
+            image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+        if self.grayscale:
+            image = ImageOps.autocontrast(ImageOps.grayscale(image), cutoff=1)
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=self.jpeg_quality)
+        return {'mime_type': 'image/jpeg', 'data': output.getvalue()}
+
     def process_document_pdf(self, pdf_data: bytes, filename: str) -> Dict[str, Any]:
         """
         Procesa un PDF usando Gemini Vision API.
@@ -75,18 +96,15 @@ class GeminiOCRService:
         """
         start_time = time.time()
         try:
-            # Para PDFs, por ahora usamos el mismo método que imágenes
-            # En el futuro se podría implementar conversión de PDF a imágenes
-            logger.info(f"Procesando PDF {filename} como imagen")
+            # Gemini lee el PDF completo (todas las páginas) en una sola llamada
+            logger.info(f"Procesando PDF {filename}")
             
-            # Intentar abrir como imagen (algunos PDFs pueden ser procesados así)
             try:
-                image = Image.open(io.BytesIO(pdf_data))
                 prompt = self._create_ocr_prompt(filename)
-                response = self.model.generate_content([prompt, image])
+                response = self.model.generate_content([prompt, {"mime_type": "application/pdf", "data": pdf_data}])
                 result = self._parse_gemini_response(response.text, filename)
             except Exception as img_error:
-                logger.warning(f"No se pudo procesar PDF como imagen: {img_error}")
+                logger.warning(f"No se pudo procesar PDF con Gemini: {img_error}")
                 # Fallback: tratar como texto plano
                 result = {
                     'structured_data': {
@@ -0,0 +1,169 @@
+"""Baseline schema (tables created by Base.metadata.create_all before migrations)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Databases created by the old create_all startup already have these tables,
+so each one is only created when missing.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not _has_table("EMAILS"):
+        op.create_table(
+            "EMAILS",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("gmail_id", sa.String(255), nullable=False, unique=True),
+            sa.Column("thread_id", sa.String(255), nullable=False),
+            sa.Column("from_email", sa.String(255), nullable=False),
+            sa.Column("to_email", sa.String(255), nullable=False),
+            sa.Column("subject", sa.String(500), nullable=False),
+            sa.Column("body_text", sa.Text(), nullable=True),
+            sa.Column("body_html", sa.Text(), nullable=True),
+            sa.Column("received_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("is_processed", sa.Boolean(), nullable=True),
+            sa.Column("is_first_notification", sa.Boolean(), nullable=True),
+        )
+        op.create_index("ix_EMAILS_id", "EMAILS", ["id"])
+    
+    if not _has_table("CLAIM_SUBMISSIONS"):
+        op.create_table(
+            "CLAIM_SUBMISSIONS",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("claim_number", sa.String(50), nullable=True),
+            sa.Column("email_id", sa.Integer(), sa.ForeignKey("EMAILS.id"), nullable=False),
+            sa.Column("customer_name", sa.String(200), nullable=False),
+            sa.Column("customer_email", sa.String(200), nullable=False),
+            sa.Column("policy_number", sa.String(100), nullable=True),
+            sa.Column("claim_type", sa.String(100), nullable=False),
+            sa.Column("incident_date", sa.DateTime(), nullable=True),
+            sa.Column("incident_description", sa.Text(), nullable=True),
+            sa.Column("estimated_amount", sa.Float(), nullable=True),
+            sa.Column("status", sa.String(50), nullable=True),
+            sa.Column("priority", sa.String(20), nullable=True),
+            sa.Column("llm_summary", sa.Text(), nullable=True),
+            sa.Column("llm_recommendation", sa.String(100), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("closed_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_CLAIM_SUBMISSIONS_id", "CLAIM_SUBMISSIONS", ["id"])
+        op.create_index("ix_CLAIM_SUBMISSIONS_claim_number", "CLAIM_SUBMISSIONS", ["claim_number"], unique=True)
+    
+    if not _has_table("DOCUMENTS_AGENT_OCR"):
+        op.create_table(
+            "DOCUMENTS_AGENT_OCR",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("claim_submission_id", sa.Integer(), sa.ForeignKey("CLAIM_SUBMISSIONS.id"), nullable=False),
+            sa.Column("email_id", sa.Integer(), sa.ForeignKey("EMAILS.id"), nullable=True),
+            sa.Column("original_filename", sa.String(255), nullable=False),
+            sa.Column("file_type", sa.String(100), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column("storage_url", sa.String(500), nullable=False),
+            sa.Column("storage_path", sa.String(500), nullable=False),
+            sa.Column("ocr_text", sa.Text(), nullable=True),
+            sa.Column("structured_data", sa.JSON(), nullable=True),
+            sa.Column("image_description", sa.JSON(), nullable=True),
+            sa.Column("document_type", sa.String(100), nullable=True),
+            sa.Column("inferred_costs", sa.JSON(), nullable=True),
+            sa.Column("is_processed", sa.Boolean(), nullable=True),
+            sa.Column("processing_errors", sa.Text(), nullable=True),
+            sa.Column("uploaded_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_DOCUMENTS_AGENT_OCR_id", "DOCUMENTS_AGENT_OCR", ["id"])
+    
+    if not _has_table("CLAIM_STATUS_UPDATES"):
+        op.create_table(
+            "CLAIM_STATUS_UPDATES",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("claim_submission_id", sa.Integer(), sa.ForeignKey("CLAIM_SUBMISSIONS.id"), nullable=False),
+            sa.Column("old_status", sa.String(50), nullable=True),
+            sa.Column("new_status", sa.String(50), nullable=False),
+            sa.Column("reason", sa.Text(), nullable=True),
+            sa.Column("analyst_name", sa.String(200), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_CLAIM_STATUS_UPDATES_id", "CLAIM_STATUS_UPDATES", ["id"])
+    
+    if not _has_table("DASHBOARD_STATS"):
+        op.create_table(
+            "DASHBOARD_STATS",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("total_claims", sa.Integer(), nullable=True),
+            sa.Column("pending_claims", sa.Integer(), nullable=True),
+            sa.Column("approved_claims", sa.Integer(), nullable=True),
+            sa.Column("rejected_claims", sa.Integer(), nullable=True),
+            sa.Column("closed_claims", sa.Integer(), nullable=True),
+            sa.Column("total_amount_requested", sa.Float(), nullable=True),
+            sa.Column("total_amount_approved", sa.Float(), nullable=True),
+            sa.Column("last_updated", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_DASHBOARD_STATS_id", "DASHBOARD_STATS", ["id"])
+    
+    if not _has_table("CLAIM_FORM"):
+        op.create_table(
+            "CLAIM_FORM",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("claim_id", sa.String(50), nullable=True),
+            sa.Column("coverage_type", sa.String(100), nullable=False),
+            sa.Column("full_name", sa.String(200), nullable=False),
+            sa.Column("email", sa.String(200), nullable=False),
+            sa.Column("phone", sa.String(50), nullable=True),
+            sa.Column("policy_number", sa.String(100), nullable=True),
+            sa.Column("incident_date", sa.DateTime(), nullable=True),
+            sa.Column("incident_location", sa.String(500), nullable=True),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("estimated_amount", sa.Float(), nullable=True),
+            sa.Column("status", sa.String(50), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("customer_email", sa.String(200), nullable=True),
+            sa.Column("sentiment_analysis", sa.String(50), nullable=True),
+            sa.Column("risk_score", sa.Float(), nullable=True),
+            sa.Column("priority_level", sa.String(50), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_CLAIM_FORM_id", "CLAIM_FORM", ["id"])
+        op.create_index("ix_CLAIM_FORM_claim_id", "CLAIM_FORM", ["claim_id"], unique=True)
+    
+    if not _has_table("DOCUMENTS"):
+        op.create_table(
+            "DOCUMENTS",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("claim_form_id", sa.Integer(), sa.ForeignKey("CLAIM_FORM.id"), nullable=False),
+            sa.Column("filename", sa.String(255), nullable=False),
+            sa.Column("original_filename", sa.String(255), nullable=False),
+            sa.Column("file_type", sa.String(100), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column("document_type", sa.String(100), nullable=False),
+            sa.Column("storage_url", sa.String(500), nullable=False),
+            sa.Column("storage_path", sa.String(500), nullable=False),
+            sa.Column("uploaded_by", sa.String(200), nullable=True),
+            sa.Column("upload_notes", sa.Text(), nullable=True),
+            sa.Column("is_verified", sa.Boolean(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("uploaded_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_DOCUMENTS_id", "DOCUMENTS", ["id"])
+
+
+def downgrade() -> None:
+    for table in ("DOCUMENTS", "CLAIM_FORM", "DASHBOARD_STATS", "CLAIM_STATUS_UPDATES",
+                  "DOCUMENTS_AGENT_OCR", "CLAIM_SUBMISSIONS", "EMAILS"):
+        op.drop_table(table)
@@ -0,0 +1,109 @@
+"""Gmail sync checkpoint, claim analyses, OCR jobs and the new claim/stats columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Skips anything that already exists, for databases that picked these up through create_all.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = {
+    "CLAIM_SUBMISSIONS": [
+        sa.Column("sentiment_analysis", sa.String(50), nullable=True),
+        sa.Column("risk_score", sa.Float(), nullable=True),
+        sa.Column("priority_level", sa.String(50), nullable=True),
+    ],
+    "DASHBOARD_STATS": [
+        sa.Column("under_review_claims", sa.Integer(), nullable=True),
+        sa.Column("total_emails", sa.Integer(), nullable=True),
+        sa.Column("processed_emails", sa.Integer(), nullable=True),
+        sa.Column("total_documents", sa.Integer(), nullable=True),
+        sa.Column("computed_at", sa.DateTime(timezone=True), nullable=True),
+    ],
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table("GMAIL_SYNC_STATE"):
+        op.create_table(
+            "GMAIL_SYNC_STATE",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("account", sa.String(255), nullable=False, unique=True),
+            sa.Column("history_id", sa.String(50), nullable=True),
+            sa.Column("last_full_sync_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_GMAIL_SYNC_STATE_id", "GMAIL_SYNC_STATE", ["id"])
+    
+    if not inspector.has_table("CLAIM_ANALYSES"):
+        op.create_table(
+            "CLAIM_ANALYSES",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("claim_submission_id", sa.Integer(), sa.ForeignKey("CLAIM_SUBMISSIONS.id"),
+                      nullable=False, unique=True),
+            sa.Column("input_hash", sa.String(64), nullable=False),
+            sa.Column("prompt_version", sa.String(20), nullable=False),
+            sa.Column("sentiment_label", sa.String(20), nullable=True),
+            sa.Column("sentiment_score", sa.Float(), nullable=True),
+            sa.Column("risk_score", sa.Float(), nullable=True),
+            sa.Column("priority_level", sa.String(20), nullable=True),
+            sa.Column("traffic_light", sa.String(10), nullable=True),
+            sa.Column("analysis", sa.JSON(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_CLAIM_ANALYSES_id", "CLAIM_ANALYSES", ["id"])
+    
+    if not inspector.has_table("OCR_JOBS"):
+        op.create_table(
+            "OCR_JOBS",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("job_id", sa.String(32), nullable=False),
+            sa.Column("claim_submission_id", sa.Integer(), sa.ForeignKey("CLAIM_SUBMISSIONS.id"), nullable=False),
+            sa.Column("document_id", sa.Integer(), sa.ForeignKey("DOCUMENTS_AGENT_OCR.id"), nullable=True),
+            sa.Column("original_filename", sa.String(255), nullable=False),
+            sa.Column("file_type", sa.String(100), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column("content_sha256", sa.String(64), nullable=True),
+            sa.Column("document_type", sa.String(100), nullable=True),
+            sa.Column("file_path", sa.String(500), nullable=False),
+            sa.Column("status", sa.String(20), nullable=True),
+            sa.Column("attempts", sa.Integer(), nullable=True),
+            sa.Column("result", sa.JSON(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_OCR_JOBS_id", "OCR_JOBS", ["id"])
+        op.create_index("ix_OCR_JOBS_job_id", "OCR_JOBS", ["job_id"], unique=True)
+        op.create_index("ix_OCR_JOBS_status", "OCR_JOBS", ["status"])
+    
+    for table, columns in NEW_COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        missing = [column for column in columns if column.name not in existing]
+        if missing:
+            with op.batch_alter_table(table) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+
+
+def downgrade() -> None:
+    for table, columns in NEW_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.drop_column(column.name)
+    
+    op.drop_table("OCR_JOBS")
+    op.drop_table("CLAIM_ANALYSES")
+    op.drop_table("GMAIL_SYNC_STATE")
@@ -0,0 +1,79 @@
+"""Indexes for the hot query predicates
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+- EMAILS: thread history lookups (thread_id, received_at) and the email list ordering
+- CLAIM_SUBMISSIONS: lookup by email_id and the keyset-paginated claims list, with and
+  without status/priority filters; SQLite gets julianday(created_at) expression indexes
+  because that is what the list orders by there
+- DOCUMENTS_AGENT_OCR: documents per claim (newest first) and per email
+- CLAIM_STATUS_UPDATES: status history per claim
+
+test_query_plans.py checks that the hot queries use them.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_emails_thread_id_received_at", "EMAILS", ["thread_id", "received_at"]),
+    ("ix_emails_received_at", "EMAILS", ["received_at"]),
+    ("ix_emails_is_processed_received_at", "EMAILS", ["is_processed", "received_at"]),
+    ("ix_claim_submissions_email_id", "CLAIM_SUBMISSIONS", ["email_id"]),
+    ("ix_claim_submissions_created_at_id", "CLAIM_SUBMISSIONS", ["created_at", "id"]),
+    ("ix_claim_submissions_status_created_at_id", "CLAIM_SUBMISSIONS", ["status", "created_at", "id"]),
+    ("ix_claim_submissions_priority_created_at_id", "CLAIM_SUBMISSIONS", ["priority", "created_at", "id"]),
+    ("ix_documents_agent_ocr_claim_uploaded_at", "DOCUMENTS_AGENT_OCR", ["claim_submission_id", "uploaded_at"]),
+    ("ix_documents_agent_ocr_email_id", "DOCUMENTS_AGENT_OCR", ["email_id"]),
+    ("ix_documents_agent_ocr_uploaded_at", "DOCUMENTS_AGENT_OCR", ["uploaded_at"]),
+    ("ix_claim_status_updates_claim_created_at", "CLAIM_STATUS_UPDATES", ["claim_submission_id", "created_at"]),
+]
+
+SQLITE_EXPRESSION_INDEXES = [
+    ("ix_claim_submissions_created_jd_id", "CLAIM_SUBMISSIONS", [sa.text("julianday(created_at)"), "id"]),
+    ("ix_claim_submissions_status_created_jd_id", "CLAIM_SUBMISSIONS",
+     ["status", sa.text("julianday(created_at)"), "id"]),
+    ("ix_claim_submissions_priority_created_jd_id", "CLAIM_SUBMISSIONS",
+     ["priority", sa.text("julianday(created_at)"), "id"]),
+]
+
+
+def _existing_index_names(bind, inspector, table):
+    if bind.dialect.name == "sqlite":
+        # The inspector skips expression indexes on SQLite
+        rows = bind.execute(
+            sa.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+            {"table": table}
+        )
+        return {row[0] for row in rows}
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def _indexes(bind):
+    if bind.dialect.name == "sqlite":
+        return INDEXES + SQLITE_EXPRESSION_INDEXES
+    return INDEXES
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = {}
+    
+    for name, table, columns in _indexes(bind):
+        if table not in existing:
+            existing[table] = _existing_index_names(bind, inspector, table)
+        if name not in existing[table]:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(_indexes(op.get_bind())):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,38 @@
+"""Write journal for changes made on the SQLite replica during a primary outage
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("WRITE_JOURNAL"):
+        return
+    
+    op.create_table(
+        "WRITE_JOURNAL",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("table_name", sa.String(100), nullable=False),
+        sa.Column("operation", sa.String(10), nullable=False),
+        sa.Column("row_id", sa.Integer(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=True),
+        sa.Column("remote_id", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("replayed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_write_journal_status_id", "WRITE_JOURNAL", ["status", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("WRITE_JOURNAL")
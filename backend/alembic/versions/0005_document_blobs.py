@@ -0,0 +1,59 @@
+"""Content-hash deduplication of documents: DOCUMENT_BLOBS and the document's hash/blob link
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = [
+    sa.Column("content_sha256", sa.String(64), nullable=True),
+    sa.Column("blob_id", sa.Integer(), sa.ForeignKey("DOCUMENT_BLOBS.id", name="fk_documents_agent_ocr_blob_id"), nullable=True),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table("DOCUMENT_BLOBS"):
+        op.create_table(
+            "DOCUMENT_BLOBS",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("content_sha256", sa.String(64), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column("mime_type", sa.String(100), nullable=True),
+            sa.Column("storage_url", sa.String(500), nullable=True),
+            sa.Column("storage_path", sa.String(500), nullable=True),
+            sa.Column("ocr_result", sa.JSON(), nullable=True),
+            sa.Column("ocr_document_type", sa.String(100), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("ocr_processed_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_DOCUMENT_BLOBS_id", "DOCUMENT_BLOBS", ["id"])
+        op.create_index("ix_DOCUMENT_BLOBS_content_sha256", "DOCUMENT_BLOBS", ["content_sha256"], unique=True)
+    
+    existing = {column["name"] for column in inspector.get_columns("DOCUMENTS_AGENT_OCR")}
+    missing = [column for column in NEW_COLUMNS if column.name not in existing]
+    if missing:
+        with op.batch_alter_table("DOCUMENTS_AGENT_OCR") as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+    
+    indexes = {index["name"] for index in inspector.get_indexes("DOCUMENTS_AGENT_OCR")}
+    if "ix_DOCUMENTS_AGENT_OCR_content_sha256" not in indexes:
+        op.create_index("ix_DOCUMENTS_AGENT_OCR_content_sha256", "DOCUMENTS_AGENT_OCR", ["content_sha256"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_DOCUMENTS_AGENT_OCR_content_sha256", "DOCUMENTS_AGENT_OCR")
+    with op.batch_alter_table("DOCUMENTS_AGENT_OCR") as batch_op:
+        for column in NEW_COLUMNS:
+            batch_op.drop_column(column.name)
+    op.drop_table("DOCUMENT_BLOBS")
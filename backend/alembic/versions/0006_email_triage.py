@@ -0,0 +1,34 @@
+"""Claim triage: the LLM's claim verdict and the local model's score on EMAILS
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = [
+    sa.Column("is_claim", sa.Boolean(), nullable=True),
+    sa.Column("triage_score", sa.Float(), nullable=True),
+]
+
+
+def upgrade() -> None:
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("EMAILS")}
+    missing = [column for column in NEW_COLUMNS if column.name not in existing]
+    if missing:
+        with op.batch_alter_table("EMAILS") as batch_op:
+            for column in missing:
+                batch_op.add_column(column)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("EMAILS") as batch_op:
+        for column in NEW_COLUMNS:
+            batch_op.drop_column(column.name)
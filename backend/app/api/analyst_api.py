@@ -10,20 +10,27 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Form, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
 from sqlalchemy import func, text
 from typing import List, Optional
 import json
+import base64
 from datetime import datetime, timedelta
 import random
 
 from app.core.database import get_db
-from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, ClaimStatusUpdate, DashboardStats
+from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, ClaimStatusUpdate, DashboardStats, ClaimAnalysis
 from app.models.claim_models import ClaimForm, Document
 from app.services.llm_service import LLMService
+from app.services.async_llm_service import get_async_llm_service
+from app.services.email_processor import _parse_llm_json, CLAIM_PRIORITIES
 from app.services.sentiment_analysis_service import SentimentAnalysisService
-from app.services.enhanced_ocr_service import EnhancedOCRService
+from app.services.ocr_job_queue import ocr_job_queue, UploadTooLargeError
+from app.services.dashboard_stats_service import dashboard_stats, STATUS_COLUMNS
+from app.services.claim_loader import load_claim_aggregate, load_claim_documents, load_document, ocr_preview
 
 router = APIRouter(prefix="/api/analyst", tags=["Analyst Interface"])
 
@@ -197,43 +204,11 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
     try:
         # Try to get real data first
         try:
-            # Try to get from database
-            result = db.execute(text("""
-                SELECT 
-                    total_claims, pending_claims, approved_claims, rejected_claims,
-                    closed_claims, total_amount_requested, total_amount_approved,
-                    last_updated
-                FROM dashboard_stats 
-                ORDER BY last_updated DESC 
-                LIMIT 1
-            """))
-            row = result.fetchone()
-            
-            if row:
-                return {
-                    "claims_summary": {
-                        "total_claims": row[0] or 0,
-                        "pending_claims": row[1] or 0,
-                        "approved_claims": row[2] or 0,
-                        "rejected_claims": row[3] or 0,
-                        "closed_claims": row[4] or 0,
-                        "status_breakdown": {"PENDING": row[1] or 0}
-                    },
-                    "financial_summary": {
-                        "total_amount_requested": float(row[5] or 0),
-                        "total_amount_approved": float(row[6] or 0),
-                        "approval_rate": 0
-                    },
-                    "processing_summary": {
-                        "total_emails": 0,
-                        "processed_emails": 0,
-                        "unprocessed_emails": 0,
-                        "total_documents": 0
-                    },
-                    "last_updated": row[7] or datetime.now().isoformat()
-                }
+            # Materialized row, kept current by the write paths
+            return dashboard_stats.get_snapshot(db)
         except Exception as e:
             print(f"Database query failed: {e}")
+            db.rollback()
         
         # If we get here, use simulated data
         print("⚠️ Using simulated data - database not available")
@@ -244,52 +219,148 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
         # Return simulated data as last resort
         return get_simulated_data()["stats"]
 
+# Columns the claims list can project with ?fields= (traffic_light is derived from risk_score)
+CLAIM_LIST_FIELDS = [
+    "id", "claim_number", "customer_name", "customer_email", "claim_type", "status", "priority",
+    "estimated_amount", "created_at", "updated_at", "llm_summary", "llm_recommendation",
+    "risk_score", "traffic_light"
+]
+
+# (status, priority) -> (count, computed_at) for count=estimated; only known values are cached,
+# so query strings cannot grow it
+_claim_count_cache = {}
+CLAIM_COUNT_CACHE_SECONDS = int(os.getenv("CLAIM_COUNT_CACHE_SECONDS", "60"))
+
+def _encode_claims_cursor(created_at: datetime, claim_id: int) -> str:
+    """Opaque cursor for the last row of a page"""
+    raw = json.dumps([created_at.isoformat(), claim_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_claims_cursor(cursor: str):
+    """(created_at, id) from a cursor, or HTTP 400"""
+    try:
+        created_at, claim_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(claim_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _claims_created_at(db: Session, value=ClaimSubmission.created_at):
+    """created_at (or a cursor value) as a comparable expression
+
+    SQLite stores timestamps as text in more than one format ("...:00" from CURRENT_TIMESTAMP,
+    "...:00.000000" from bound datetimes), so compare them as julian days there.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return func.julianday(value)
+    return value
+
+def _estimated_claims_count(db: Session, status: Optional[str], priority: Optional[str], base_query) -> int:
+    """Total from the materialized dashboard stats when possible, otherwise a briefly cached COUNT(*)"""
+    if not priority:
+        snapshot = dashboard_stats.get_snapshot(db)["claims_summary"]
+        if not status:
+            return snapshot["total_claims"]
+        if status in snapshot["status_breakdown"]:
+            return snapshot["status_breakdown"][status]
+    
+    if (status and status not in STATUS_COLUMNS) or (priority and priority not in CLAIM_PRIORITIES):
+        return base_query.count()
+    
+    key = (status, priority)
+    cached = _claim_count_cache.get(key)
+    if cached and (datetime.now() - cached[1]).total_seconds() < CLAIM_COUNT_CACHE_SECONDS:
+        return cached[0]
+    
+    total = base_query.count()
+    _claim_count_cache[key] = (total, datetime.now())
+    return total
+
 @router.get("/claims")
 def get_claims(
     status: Optional[str] = Query(None, description="Filtrar por status"),
     priority: Optional[str] = Query(None, description="Filtrar por prioridad"),
-    limit: int = Query(50, description="Número máximo de claims"),
-    offset: int = Query(0, description="Offset para paginación"),
+    limit: int = Query(50, ge=1, le=200, description="Número máximo de claims"),
+    offset: int = Query(0, ge=0, description="Offset para paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (next_cursor); reemplaza a offset"),
+    fields: Optional[str] = Query(None, description="Columnas a devolver, separadas por comas"),
+    count: str = Query("exact", pattern="^(exact|estimated|none)$", description="Total: exact, estimated o none"),
     db: Session = Depends(get_db)
 ):
     """Obtener lista de claims con filtros"""
     try:
         # Try to get real data first
         try:
-            # Try to get from database
-            query = db.query(ClaimSubmission)
+            # Only the requested columns; id and created_at are always needed for the cursor
+            selected = CLAIM_LIST_FIELDS
+            if fields:
+                requested = [f.strip() for f in fields.split(",") if f.strip()]
+                unknown = [f for f in requested if f not in CLAIM_LIST_FIELDS]
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}")
+                selected = requested
+            
+            columns = {"id", "created_at"} | {f for f in selected if f != "traffic_light"}
+            if "traffic_light" in selected:
+                columns.add("risk_score")
+            
+            query = db.query(*[getattr(ClaimSubmission, c) for c in sorted(columns)])
             
             if status:
                 query = query.filter(ClaimSubmission.status == status)
             if priority:
                 query = query.filter(ClaimSubmission.priority == priority)
             
-            total = query.count()
-            claims = query.order_by(ClaimSubmission.created_at.desc()).offset(offset).limit(limit).all()
+            if count == "exact":
+                total = query.count()
+            elif count == "estimated":
+                total = _estimated_claims_count(db, status, priority, query)
+            else:
+                total = None
             
-            if claims:
+            # Keyset pagination on (created_at, id), newest first
+            created_at = _claims_created_at(db)
+            query = query.order_by(created_at.desc(), ClaimSubmission.id.desc())
+            if cursor:
+                cursor_created_at, cursor_id = _decode_claims_cursor(cursor)
+                cursor_value = _claims_created_at(db, cursor_created_at)
+                query = query.filter(
+                    (created_at < cursor_value) |
+                    ((created_at == cursor_value) & (ClaimSubmission.id < cursor_id))
+                )
+            else:
+                query = query.offset(offset)
+            
+            # One extra row tells whether there is a next page
+            rows = query.limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            
+            if rows or cursor:
+                claims = []
+                for row in rows:
+                    claim = {}
+                    for field in selected:
+                        if field == "traffic_light":
+                            value = sentiment_service.get_traffic_light_color(row.risk_score) if row.risk_score is not None else None
+                        else:
+                            value = getattr(row, field)
+                            if isinstance(value, datetime):
+                                value = value.isoformat()
+                            elif field == "estimated_amount" and value is not None:
+                                value = float(value)
+                        claim[field] = value
+                    claims.append(claim)
+                
                 return {
-                    "claims": [
-                        {
-                            "id": claim.id,
-                            "claim_number": claim.claim_number,
-                            "customer_name": claim.customer_name,
-                            "customer_email": claim.customer_email,
-                            "claim_type": claim.claim_type,
-                            "status": claim.status,
-                            "priority": claim.priority,
-                            "estimated_amount": float(claim.estimated_amount) if claim.estimated_amount else None,
-                            "created_at": claim.created_at.isoformat(),
-                            "updated_at": claim.updated_at.isoformat() if claim.updated_at else None,
-                            "llm_summary": claim.llm_summary,
-                            "llm_recommendation": claim.llm_recommendation
-                        }
-                        for claim in claims
-                    ],
+                    "claims": claims,
                     "total": total,
+                    "total_is_estimate": count == "estimated",
                     "limit": limit,
-                    "offset": offset
+                    "offset": offset if not cursor else None,
+                    "next_cursor": _encode_claims_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
                 }
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Database query failed: {e}")
         
@@ -297,34 +368,35 @@ def get_claims(
         print("⚠️ Using simulated claims data - database not available")
         return get_simulated_data()["claims"]
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error getting claims: {e}")
         # Return simulated data as last resort
         return get_simulated_data()["claims"]
 
 @router.get("/claims/{claim_id}")
-def get_claim_details(claim_id: int, db: Session = Depends(get_db)):
+def get_claim_details(
+    claim_id: int,
+    include_ocr: bool = Query(False, description="Incluir texto OCR completo y datos estructurados de los documentos"),
+    db: Session = Depends(get_db)
+):
     """Obtener detalles completos de un claim"""
     try:
         # Try to get real data first
         try:
-            # Try to get from database
-            claim = db.query(ClaimSubmission).filter(ClaimSubmission.id == claim_id).first()
+            # Claim, email, documents and status history in two round-trips
+            claim = load_claim_aggregate(db, claim_id, include_ocr=include_ocr)
             if not claim:
                 raise HTTPException(status_code=404, detail="Claim no encontrado")
             
-            # Obtener email asociado
-            email = db.query(Email).filter(Email.id == claim.email_id).first()
-            
-            # Obtener documentos
-            documents = db.query(DocumentAgentOCR).filter(
-                DocumentAgentOCR.claim_submission_id == claim_id
-            ).all()
-            
-            # Obtener historial de cambios de estado
-            status_updates = db.query(ClaimStatusUpdate).filter(
-                ClaimStatusUpdate.claim_submission_id == claim_id
-            ).order_by(ClaimStatusUpdate.created_at.desc()).all()
+            email = claim.initial_email
+            documents = claim.documents
+            status_updates = sorted(
+                claim.status_updates,
+                key=lambda update: (update.created_at is not None, update.created_at),
+                reverse=True
+            )
             
             return {
                 "claim": {
@@ -362,7 +434,11 @@ def get_claim_details(claim_id: int, db: Session = Depends(get_db)):
                         "storage_url": doc.storage_url,
                         "is_processed": doc.is_processed,
                         "uploaded_at": doc.uploaded_at.isoformat() if getattr(doc, 'uploaded_at', None) else None,
-                        "ocr_text": doc.ocr_text[:500] + "..." if doc.ocr_text and len(doc.ocr_text) > 500 else doc.ocr_text
+                        "ocr_text": ocr_preview(doc),
+                        **({
+                            "full_ocr_text": doc.ocr_text,
+                            "structured_data": json.loads(doc.structured_data) if doc.structured_data else {}
+                        } if include_ocr else {})
                     }
                     for doc in documents
                 ],
@@ -537,6 +613,7 @@ def update_claim_status(
             )
             
             db.add(status_update)
+            dashboard_stats.on_claim_status_changed(db, old_status, status, claim.estimated_amount)
             db.commit()
             
             return {"message": f"Status actualizado de {old_status} a {status}"}
@@ -749,10 +826,46 @@ def get_documents(
             "offset": offset
         }
 
+def _save_claim_analysis(db: Session, claim: ClaimSubmission, summary: str, recommendation: str):
+    claim.llm_summary = summary
+    claim.llm_recommendation = recommendation
+    db.commit()
+
 @router.post("/claims/{claim_id}/analyze")
-def analyze_claim(claim_id: int, db: Session = Depends(get_db)):
+async def analyze_claim(claim_id: int, db: Session = Depends(get_db)):
     """Analyze a specific claim using AI"""
     try:
+        claim = await run_in_threadpool(
+            lambda: db.query(ClaimSubmission).filter(ClaimSubmission.id == claim_id).first()
+        )
+        if claim:
+            prompt = f"""
+            Analyze this insurance claim and provide a summary and recommendation.
+            
+            Claim Details:
+            - Customer: {claim.customer_name}
+            - Type: {claim.claim_type}
+            - Description: {claim.incident_description}
+            - Amount: ${claim.estimated_amount}
+            
+            Return as JSON:
+            {{"summary": "brief summary", "recommendation": "CLOSE_CASE|REQUEST_MORE_DOCS|APPROVE|REJECT", "confidence": 0.0-1.0}}
+            """
+            try:
+                # Awaited on the event loop: no threadpool thread is held while Gemini answers
+                result = _parse_llm_json(await get_async_llm_service().analyze_text(prompt))
+                summary = str(result.get("summary") or "Claim requires review")
+                recommendation = str(result.get("recommendation") or "REQUEST_MORE_DOCS").upper()
+                await run_in_threadpool(_save_claim_analysis, db, claim, summary, recommendation)
+                return {
+                    "summary": summary,
+                    "recommendation": recommendation,
+                    "confidence": max(0.0, min(1.0, float(result.get("confidence", 0.8)))),
+                    "analysis_date": datetime.now().isoformat()
+                }
+            except Exception as e:
+                print(f"❌ Error analyzing claim {claim_id} with Gemini, using simulated analysis: {e}")
+        
         # Simulate AI analysis
         analysis_result = {
             "summary": f"AI analysis completed for claim {claim_id}. This is a simulated analysis result.",
@@ -794,20 +907,54 @@ def get_demo_credentials(db: Session = Depends(get_db)):
 
 # Initialize services
 sentiment_service = SentimentAnalysisService()
-ocr_service = EnhancedOCRService()
+
+@router.get("/claims/{claim_id}/sentiment-analysis")
+def get_claim_sentiment(claim_id: int, db: Session = Depends(get_db)):
+    """Get the stored sentiment analysis of a claim without calling the LLM"""
+    stored = db.query(ClaimAnalysis).filter(ClaimAnalysis.claim_submission_id == claim_id).first()
+    if not stored:
+        raise HTTPException(status_code=404, detail="No analysis stored for this claim")
+    
+    claim = stored.claim_submission
+    current_hash = sentiment_service.compute_input_hash(
+        claim.incident_description or "No description provided",
+        claim.customer_name or "Unknown",
+        claim.claim_type or "OTHER"
+    )
+    
+    return {
+        "claim_id": claim_id,
+        "analysis": stored.analysis,
+        "analysis_date": (stored.updated_at or stored.created_at).isoformat(),
+        "prompt_version": stored.prompt_version,
+        "stale": stored.input_hash != current_hash,
+        "cached": True
+    }
 
 @router.post("/claims/{claim_id}/sentiment-analysis")
-def analyze_claim_sentiment(claim_id: int, db: Session = Depends(get_db)):
+async def analyze_claim_sentiment(
+    claim_id: int,
+    refresh: bool = Query(False, description="Recalcular aunque exista un análisis vigente"),
+    db: Session = Depends(get_db)
+):
     """Analyze sentiment and provide detailed recommendations for a claim"""
     try:
         # Try to get real claim data
         try:
-            claim = db.query(ClaimSubmission).filter(ClaimSubmission.id == claim_id).first()
+            claim = await run_in_threadpool(
+                lambda: db.query(ClaimSubmission).filter(ClaimSubmission.id == claim_id).first()
+            )
             if claim:
-                # Use real claim data
-                description = claim.incident_description or "No description provided"
-                customer_name = claim.customer_name or "Unknown"
-                claim_type = claim.claim_type or "OTHER"
+                # Stored analysis unless the claim changed or a refresh was requested
+                analysis, cached = await sentiment_service.get_claim_analysis_async(db, claim, refresh=refresh)
+                stored = await run_in_threadpool(lambda: claim.analysis)
+                analysis_date = (stored.updated_at or stored.created_at) if stored else None
+                return {
+                    "claim_id": claim_id,
+                    "analysis": analysis,
+                    "analysis_date": (analysis_date or datetime.now()).isoformat(),
+                    "cached": cached
+                }
             else:
                 # Use simulated data
                 simulated_claim = next((c for c in SIMULATED_CLAIMS if c["id"] == claim_id), None)
@@ -829,7 +976,7 @@ def analyze_claim_sentiment(claim_id: int, db: Session = Depends(get_db)):
                 raise HTTPException(status_code=404, detail="Claim not found")
         
         # Perform sentiment analysis
-        analysis = sentiment_service.analyze_claim_sentiment(
+        analysis = await sentiment_service.analyze_claim_sentiment_async(
             claim_description=description,
             customer_name=customer_name,
             claim_type=claim_type
@@ -851,72 +998,121 @@ def analyze_claim_sentiment(claim_id: int, db: Session = Depends(get_db)):
             "error": "Analysis failed, using default values"
         }
 
-@router.post("/documents/upload")
+# Room for the multipart boundaries, part headers and form fields sent along with the file
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+class UploadLimitRoute(APIRoute):
+    """
+    Refuses an upload over MAX_UPLOAD_SIZE_MB before FastAPI parses and spools its body
+    
+    A declared Content-Length over the limit is rejected without reading the body; without one
+    (or when it lies) the body is counted as it arrives and reading stops at the limit.
+    """
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def limited_handler(request: Request):
+            limit = ocr_job_queue.max_upload_bytes + UPLOAD_FORM_OVERHEAD
+            too_large = HTTPException(
+                status_code=413, detail=f"Upload exceeds the {ocr_job_queue.max_upload_bytes // (1024 * 1024)} MB limit"
+            )
+            
+            declared = request.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > limit:
+                raise too_large
+            
+            receive = request.receive
+            received = 0
+            
+            async def counted_receive():
+                nonlocal received
+                message = await receive()
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise too_large
+                return message
+            
+            return await handler(Request(request.scope, counted_receive))
+        
+        return limited_handler
+
 async def upload_and_process_document(
     file: UploadFile = File(...),
     claim_id: int = Form(...),
     document_type: str = Form("OTHER"),
     db: Session = Depends(get_db)
 ):
-    """Upload and process a document with enhanced OCR"""
+    """Upload a document and queue it for enhanced OCR; poll /jobs/{job_id} for the result"""
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Process with enhanced OCR
-        ocr_result = ocr_service.process_document_with_gemini(
-            image_data=file_content,
-            filename=file.filename,
-            document_type=document_type
-        )
+        # The route stopped reading at the limit plus form overhead; this is the file's own size
+        if file.size is not None and file.size > ocr_job_queue.max_upload_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {ocr_job_queue.max_upload_bytes // (1024 * 1024)} MB limit")
         
-        # Create document record
-        document_data = {
-            "claim_submission_id": claim_id,
-            "original_filename": file.filename,
-            "file_type": file.content_type,
-            "file_size": len(file_content),
-            "document_type": document_type,
-            "storage_url": f"uploaded/{file.filename}",
-            "is_processed": True,
-            "uploaded_at": datetime.now(),
-            "processed_at": datetime.now(),
-            "ocr_text": ocr_result.get("extracted_text", ""),
-            "structured_data": json.dumps(ocr_result.get("structured_data", {})),
-            "inferred_costs": ocr_result.get("key_information", {}).get("total_amount", "")
-        }
+        # Copy to disk in chunks (the limit is checked again while streaming)
+        spooled = await ocr_job_queue.spool_upload(file)
         
-        # Try to save to database
-        try:
-            new_document = DocumentAgentOCR(**document_data)
-            db.add(new_document)
-            db.commit()
-            db.refresh(new_document)
-            document_id = new_document.id
-        except Exception as e:
-            print(f"Database save failed: {e}")
-            document_id = random.randint(1000, 9999)
+        # OCR runs on the job queue's worker pool, not on the event loop
+        job = await run_in_threadpool(
+            ocr_job_queue.submit, db, spooled, file.filename, file.content_type, claim_id, document_type
+        )
         
         return {
-            "document_id": document_id,
+            "job_id": job.job_id,
+            "status": job.status,
             "filename": file.filename,
-            "ocr_result": ocr_result,
-            "summary": ocr_service.get_document_summary(ocr_result),
+            "status_url": f"/api/analyst/jobs/{job.job_id}",
             "upload_date": datetime.now().isoformat()
         }
         
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
+# Registered with its own route class so the size limit applies before the body is read
+router.add_api_route("/documents/upload", upload_and_process_document, methods=["POST"], status_code=202,
+                     route_class_override=UploadLimitRoute)
+
+@router.get("/jobs/{job_id}")
+def get_ocr_job_status(job_id: str, db: Session = Depends(get_db)):
+    """Get the status of a document OCR job (and its result once done)"""
+    job = ocr_job_queue.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    response = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "claim_id": job.claim_submission_id,
+        "filename": job.original_filename,
+        "document_type": job.document_type,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+    
+    if job.status == "done":
+        response["document_id"] = job.document_id
+        response["ocr_result"] = (job.result or {}).get("ocr_result")
+        response["summary"] = (job.result or {}).get("summary")
+    elif job.status == "failed":
+        response["error"] = job.error
+    
+    return response
+
 @router.get("/claims/{claim_id}/documents")
-def get_claim_documents(claim_id: int, db: Session = Depends(get_db)):
+def get_claim_documents(
+    claim_id: int,
+    include_ocr: bool = Query(True, description="Incluir texto OCR completo y datos estructurados"),
+    db: Session = Depends(get_db)
+):
     """Get all documents associated with a specific claim"""
     try:
         # Try to get real documents
         try:
-            documents = db.query(DocumentAgentOCR).filter(
-                DocumentAgentOCR.claim_submission_id == claim_id
-            ).order_by(DocumentAgentOCR.uploaded_at.desc()).all()
+            documents = load_claim_documents(db, claim_id, include_ocr=include_ocr)
             
             if documents:
                 return {
@@ -932,8 +1128,8 @@ def get_claim_documents(claim_id: int, db: Session = Depends(get_db)):
                             "is_processed": doc.is_processed,
                             "uploaded_at": doc.uploaded_at.isoformat(),
                             "processed_at": doc.processed_at.isoformat() if doc.processed_at else None,
-                            "ocr_text": doc.ocr_text,
-                            "structured_data": json.loads(doc.structured_data) if doc.structured_data else {},
+                            "ocr_text": doc.ocr_text if include_ocr else ocr_preview(doc),
+                            "structured_data": (json.loads(doc.structured_data) if doc.structured_data else {}) if include_ocr else None,
                             "inferred_costs": doc.inferred_costs
                         }
                         for doc in documents
@@ -982,12 +1178,16 @@ def get_claim_documents(claim_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error retrieving documents: {str(e)}")
 
 @router.get("/documents/{document_id}/details")
-def get_document_details(document_id: int, db: Session = Depends(get_db)):
+def get_document_details(
+    document_id: int,
+    include_ocr: bool = Query(True, description="Incluir texto OCR completo y datos estructurados"),
+    db: Session = Depends(get_db)
+):
     """Get detailed information about a specific document"""
     try:
         # Try to get real document
         try:
-            document = db.query(DocumentAgentOCR).filter(DocumentAgentOCR.id == document_id).first()
+            document = load_document(db, document_id, include_ocr=include_ocr)
             if document:
                 return {
                     "id": document.id,
@@ -1000,8 +1200,8 @@ def get_document_details(document_id: int, db: Session = Depends(get_db)):
                     "is_processed": document.is_processed,
                     "uploaded_at": document.uploaded_at.isoformat(),
                     "processed_at": document.processed_at.isoformat() if document.processed_at else None,
-                    "ocr_text": document.ocr_text,
-                    "structured_data": json.loads(document.structured_data) if document.structured_data else {},
+                    "ocr_text": document.ocr_text if include_ocr else ocr_preview(document),
+                    "structured_data": (json.loads(document.structured_data) if document.structured_data else {}) if include_ocr else None,
                     "inferred_costs": document.inferred_costs
                 }
         except Exception as e:
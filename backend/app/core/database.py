@@ -2,10 +2,15 @@
 Database configuration and connection setup with SQLite fallback
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.exc import OperationalError
 import os
+import time
+import threading
+from typing import Optional
 from dotenv import load_dotenv
 import sqlite3
 from pathlib import Path
@@ -28,60 +33,25 @@ os.makedirs(sqlite_data_dir, exist_ok=True)
 # SQLite fallback URL
 SQLITE_DATABASE_URL = f"sqlite:///{SQLITE_DATABASE_PATH}"
 
-def test_render_connection():
-    """Test if Render database is available"""
-    if not RENDER_DATABASE_URL:
-        return False
-    
-    try:
-        # Fix DATABASE_URL for Render PostgreSQL
-        render_url = RENDER_DATABASE_URL
-        if render_url.startswith("postgres://"):
-            render_url = render_url.replace("postgres://", "postgresql://", 1)
-        
-        # Test connection with timeout
-        test_engine = create_engine(
-            render_url,
-            pool_pre_ping=True,
-            connect_args={"connect_timeout": 5}
-        )
-        
-        with test_engine.connect() as conn:
-            from sqlalchemy import text
-            conn.execute(text("SELECT 1"))
-        return True
-    except Exception as e:
-        print(f"⚠️ Render database not available: {e}")
-        return False
+def _normalize_url(url):
+    """Fix DATABASE_URL for Render PostgreSQL (SQLAlchemy wants postgresql://)"""
+    if url and url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
 
-def get_database_url():
-    """Get the appropriate database URL based on availability"""
-    if test_render_connection():
-        print("✅ Using Render PostgreSQL database")
-        # Fix DATABASE_URL for Render PostgreSQL
-        url = RENDER_DATABASE_URL
-        if url and url.startswith("postgres://"):
-            url = url.replace("postgres://", "postgresql://", 1)
-        return url or SQLITE_DATABASE_URL
-    else:
-        print("🔄 Using SQLite fallback database")
-        return SQLITE_DATABASE_URL
-
-# Get the appropriate database URL
-DATABASE_URL = get_database_url()
-
-# Create SQLAlchemy engine with robust configuration
-if DATABASE_URL.startswith("sqlite"):
-    # SQLite configuration
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        pool_pre_ping=True
-    )
-else:
+def _create_engine_for(url):
+    """Create SQLAlchemy engine with robust configuration"""
+    if url.startswith("sqlite"):
+        # SQLite configuration
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            pool_pre_ping=True
+        )
+    
     # PostgreSQL configuration
-    engine = create_engine(
-        DATABASE_URL, 
+    return create_engine(
+        url,
         pool_pre_ping=True,
         pool_recycle=300,  # Recycle connections every 5 minutes
         pool_timeout=20,   # Connection timeout
@@ -92,8 +62,326 @@ else:
         }
     )
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _probe_url(url, timeout=None):
+    """True if a fresh connection to url answers SELECT 1 within timeout seconds"""
+    if timeout is None:
+        timeout = int(os.getenv("DATABASE_PROBE_TIMEOUT_SECONDS", "5"))
+    
+    # No pool: the engine is thrown away
+    connect_args = {} if url.startswith("sqlite") else {"connect_timeout": timeout}
+    test_engine = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+    try:
+        with test_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    finally:
+        test_engine.dispose()
+
+def test_render_connection(timeout=None):
+    """Test if Render database is available"""
+    if not RENDER_DATABASE_URL:
+        return False
+    
+    try:
+        return _probe_url(_normalize_url(RENDER_DATABASE_URL), timeout)
+    except Exception as e:
+        print(f"⚠️ Render database not available: {e}")
+        return False
+
+class DatabaseManager:
+    """
+    Lazy, failover-aware engine factory for Render PostgreSQL (primary) and the SQLite replica
+    
+    Nothing connects at import time. start() resolves the backend in a background thread
+    and then re-probes the primary periodically; callers that need the engine before the
+    decision is made wait for that single probe instead of starting their own.
+    
+    When the primary fails (a dropped or refused connection, or a failed probe) new sessions
+    go to SQLite, and every write made there is journaled in WRITE_JOURNAL in the same
+    transaction. Once the primary answers again the journal is replayed on it and sessions
+    switch back.
+    """
+    
+    def __init__(self, primary_url: Optional[str] = None, fallback_url: Optional[str] = None):
+        self.primary_url = primary_url if primary_url is not None else _normalize_url(RENDER_DATABASE_URL)
+        self.fallback_url = fallback_url or SQLITE_DATABASE_URL
+        self.health_check_interval = int(os.getenv("DATABASE_HEALTH_CHECK_INTERVAL_SECONDS", "60"))
+        
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False)
+        event.listen(self.session_factory, "after_flush", self._after_flush)
+        event.listen(self.session_factory, "do_orm_execute", self._do_orm_execute)
+        
+        self._engine = None
+        self._url = None
+        self._primary_engine = None
+        self._fallback_engine = None
+        self._fallback_schema_ready = False
+        self._lock = threading.RLock()
+        self._resolved = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        # Health of the primary as seen by the last probe, and failover history
+        self.primary_available = None
+        self.last_probe_at = None
+        self.failovers = 0
+        self.last_failover_at = None
+        self.last_failback_at = None
+        self.last_failover_reason = None
+    
+    @property
+    def is_resolved(self) -> bool:
+        return self._engine is not None
+    
+    @property
+    def role(self) -> Optional[str]:
+        """primary, fallback (primary configured but down) or standalone (SQLite only)"""
+        if self._url is None:
+            return None
+        if self._url == self.primary_url:
+            return "primary"
+        return "fallback" if self.primary_url else "standalone"
+    
+    def start(self):
+        """Resolve the backend and keep re-probing it in a background thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="db-health", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop the background re-probe"""
+        self._stop.set()
+    
+    def get_engine(self):
+        """The engine for the chosen backend, resolving it now if nobody has yet"""
+        if self._engine is not None:
+            return self._engine
+        
+        with self._lock:
+            if self._engine is None:
+                self._resolve()
+            return self._engine
+    
+    def get_url(self) -> str:
+        """URL of the chosen backend"""
+        self.get_engine()
+        return self._url
+    
+    def wait_until_resolved(self, timeout: Optional[float] = None) -> bool:
+        """Block until the backend is chosen (or timeout); True when it is"""
+        return self._resolved.wait(timeout)
+    
+    def fail_over(self, reason: str):
+        """Send new sessions to the SQLite replica (no-op unless currently on the primary)"""
+        with self._lock:
+            if self.role != "primary":
+                return
+            print(f"⚠️ Primary database unavailable ({reason}), failing over to SQLite")
+            self.primary_available = False
+            self.failovers += 1
+            self.last_failover_at = time.time()
+            self.last_failover_reason = reason
+            self._use(self.fallback_url)
+    
+    def check_primary(self) -> bool:
+        """
+        One health check: probe the primary, fail over or replay the journal and fail back
+        
+        Returns True when sessions are on the primary afterwards.
+        """
+        if not self.primary_url:
+            return False
+        
+        available = self._probe_primary()
+        if not available:
+            self.fail_over("health probe failed")
+            return False
+        
+        if self.role == "fallback":
+            # Drain the journal while writes still go to SQLite, then switch and drain what
+            # sessions opened before the switch committed
+            self._replay_journal()
+            with self._lock:
+                print("🔄 Render PostgreSQL is reachable again, switching back from SQLite")
+                self._use(self.primary_url)
+                self.last_failback_at = time.time()
+        
+        self._replay_journal()
+        if self.role == "primary":
+            from app.core.write_journal import purge_replayed
+            purge_replayed(self._get_fallback_engine(), self._metadata())
+        return True
+    
+    def info(self) -> dict:
+        """Current backend, role and replication state, without triggering resolution"""
+        if self._url is None:
+            return {"type": "unresolved", "resolving": self._thread is not None}
+        
+        if self._url.startswith("sqlite"):
+            info = {
+                "type": "sqlite",
+                "path": SQLITE_DATABASE_PATH,
+                "fallback": True
+            }
+        else:
+            info = {
+                "type": "postgresql",
+                "url": RENDER_DATABASE_URL[:50] + "..." if RENDER_DATABASE_URL else None,
+                "fallback": False
+            }
+        
+        info.update({
+            "role": self.role,
+            "primary_available": self.primary_available,
+            "last_probe_at": self.last_probe_at,
+            "failovers": self.failovers,
+            "last_failover_at": self.last_failover_at,
+            "last_failover_reason": self.last_failover_reason,
+            "last_failback_at": self.last_failback_at
+        })
+        
+        if self.primary_url:
+            try:
+                from app.core.write_journal import journal_stats
+                info.update(journal_stats(self._get_fallback_engine(), self._metadata()))
+            except Exception as e:
+                info["journal_error"] = str(e)
+        return info
+    
+    def _resolve(self):
+        """Probe the primary once and build the engine for the winner (caller holds the lock)"""
+        started = time.perf_counter()
+        if self.primary_url and self._probe_primary():
+            print("✅ Using Render PostgreSQL database")
+            url = self.primary_url
+        else:
+            print("🔄 Using SQLite fallback database")
+            url = self.fallback_url
+        
+        self._use(url)
+        print(f"⏱️ Database backend resolved in {time.perf_counter() - started:.2f}s")
+    
+    def _probe_primary(self) -> bool:
+        try:
+            self.primary_available = _probe_url(self.primary_url)
+        except Exception as e:
+            print(f"⚠️ Render database not available: {e}")
+            self.primary_available = False
+        self.last_probe_at = time.time()
+        return self.primary_available
+    
+    def _get_primary_engine(self):
+        with self._lock:
+            if self._primary_engine is None:
+                self._primary_engine = _create_engine_for(self.primary_url)
+                event.listen(self._primary_engine, "handle_error", self._on_primary_error)
+            return self._primary_engine
+    
+    def _get_fallback_engine(self):
+        with self._lock:
+            if self._fallback_engine is None:
+                self._fallback_engine = _create_engine_for(self.fallback_url)
+            return self._fallback_engine
+    
+    def _use(self, url: str):
+        """Point the engine and session factory at url (caller holds the lock)"""
+        if url == self.primary_url:
+            engine = self._get_primary_engine()
+        else:
+            engine = self._get_fallback_engine()
+            if self.primary_url:
+                self._ensure_fallback_schema(engine)
+        
+        self.session_factory.configure(bind=engine)
+        self._url = url
+        self._engine = engine
+        self._resolved.set()
+        
+        if url != self.primary_url and self._primary_engine is not None:
+            # Drop the dead pool; connections still checked out are closed when returned
+            self._primary_engine.dispose()
+    
+    def _ensure_fallback_schema(self, engine):
+        """The replica needs the journal table (and current schema) before it takes writes"""
+        if self._fallback_schema_ready:
+            return
+        try:
+            from app.core.migrations import run_migrations
+            run_migrations(engine)
+            self._fallback_schema_ready = True
+        except Exception as e:
+            print(f"❌ Could not migrate the SQLite replica: {e}")
+    
+    def _metadata(self):
+        import app.models.email_models  # noqa: F401 - registers WRITE_JOURNAL
+        return Base.metadata
+    
+    def _on_primary_error(self, context):
+        """handle_error hook on the primary engine: a lost or refused connection means failover"""
+        if context.is_disconnect or context.connection is None:
+            self.fail_over(str(context.original_exception).strip())
+    
+    def _journaling(self, session) -> bool:
+        """Whether the session writes to the replica while the primary is configured"""
+        if not self.primary_url or self._fallback_engine is None:
+            return False
+        return session.get_bind() is self._fallback_engine
+    
+    def _after_flush(self, session, flush_context):
+        """Journal writes that land on the replica while the primary is configured"""
+        if not self._journaling(session):
+            return
+        from app.core.write_journal import record_flush
+        record_flush(session, self._metadata())
+    
+    def _do_orm_execute(self, orm_execute_state):
+        """Journal bulk query.update()/delete() calls, which do not go through a flush"""
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return None
+        if not self._journaling(orm_execute_state.session):
+            return None
+        from app.core.write_journal import record_bulk_write
+        return record_bulk_write(orm_execute_state, self._metadata())
+    
+    def _replay_journal(self):
+        from app.core.write_journal import replay_pending
+        replay_pending(self._get_fallback_engine(), self._get_primary_engine(), self._metadata())
+    
+    def _run(self):
+        """Background thread: resolve, then health-check the primary every health_check_interval"""
+        try:
+            self.get_engine()
+        except Exception as e:
+            print(f"❌ Error resolving database backend: {e}")
+        
+        while self.primary_url and not self._stop.wait(self.health_check_interval):
+            try:
+                self.check_primary()
+            except Exception as e:
+                print(f"⚠️ Database health check failed: {e}")
+
+# Global database manager instance
+db_manager = DatabaseManager()
+
+def get_database_url():
+    """Get the appropriate database URL based on availability"""
+    return db_manager.get_url()
+
+def SessionLocal(**kwargs):
+    """New session on the resolved engine (same call signature as the old sessionmaker)"""
+    db_manager.get_engine()
+    return db_manager.session_factory(**kwargs)
+
+def __getattr__(name):
+    # engine and DATABASE_URL are resolved on first access instead of at import time
+    if name == "engine":
+        return db_manager.get_engine()
+    if name == "DATABASE_URL":
+        return db_manager.get_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Create Base class for models
 Base = declarative_base()
@@ -101,6 +389,13 @@ Base = declarative_base()
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
+    try:
+        # Connect up front: if the primary just went away, handle_error fails over and this
+        # request is served from the replica instead of failing
+        db.connection()
+    except OperationalError:
+        db.close()
+        db = SessionLocal()
     try:
         yield db
     finally:
@@ -108,15 +403,4 @@ def get_db():
 
 def get_current_database_info():
     """Get information about which database is being used"""
-    if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
-        return {
-            "type": "sqlite",
-            "path": SQLITE_DATABASE_PATH,
-            "fallback": True
-        }
-    else:
-        return {
-            "type": "postgresql",
-            "url": RENDER_DATABASE_URL[:50] + "..." if RENDER_DATABASE_URL else None,
-            "fallback": False
-        } 
\ No newline at end of file
+    return db_manager.info()
@@ -0,0 +1,27 @@
+"""
+Schema migrations for the backend database (Alembic, scripts in backend/alembic)
+"""
+
+import os
+from sqlalchemy.engine import Engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ALEMBIC_INI_PATH = os.path.join(BACKEND_DIR, "alembic.ini")
+
+def get_alembic_config():
+    """Alembic config for backend/alembic, usable from any working directory"""
+    from alembic.config import Config
+    
+    config = Config(ALEMBIC_INI_PATH)
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+def run_migrations(engine: Engine, revision: str = "head"):
+    """Upgrade the database behind engine to revision (idempotent)"""
+    from alembic import command
+    
+    config = get_alembic_config()
+    with engine.begin() as connection:
+        # env.py runs the migrations on this connection instead of opening its own
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
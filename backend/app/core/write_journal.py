@@ -0,0 +1,270 @@
+"""
+Durable journal of writes made on the SQLite replica while the primary database is down
+Entries are written in the same transaction as the change and replayed in order on failback
+"""
+
+import json
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Dict, Any, Optional, Set, Tuple
+
+from sqlalchemy import MetaData, Table, DateTime, Date, select, func, inspect as sa_inspect
+from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.exc import IntegrityError
+
+JOURNAL_TABLE = "WRITE_JOURNAL"
+
+# Derived data is recomputed on the primary rather than replayed
+NOT_JOURNALED = {"DASHBOARD_STATS", JOURNAL_TABLE}
+
+REPLAY_BATCH_SIZE = 500
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot journal value of type {type(value).__name__}")
+
+def _decode_values(table: Table, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn journaled JSON back into column values (dates were stored as ISO strings)"""
+    decoded = {}
+    for name, value in values.items():
+        if name not in table.c:
+            continue
+        column_type = table.c[name].type
+        if isinstance(value, str) and isinstance(column_type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, str) and isinstance(column_type, Date):
+            value = date.fromisoformat(value)
+        decoded[name] = value
+    return decoded
+
+def record_flush(session, metadata: MetaData):
+    """
+    Journal the rows a flush inserted, updated or deleted (call from an after_flush hook)
+    
+    Inserted rows are read back so server defaults are captured; updates keep only the
+    changed columns. Bulk query.update()/delete() calls bypass the flush: see record_bulk_write.
+    """
+    order = {table.name: index for index, table in enumerate(metadata.sorted_tables)}
+    connection = session.connection()
+    entries = []
+    
+    def tracked(objects):
+        states = [sa_inspect(obj) for obj in objects]
+        states = [s for s in states if s.mapper.local_table.name not in NOT_JOURNALED]
+        return sorted(states, key=lambda s: order.get(s.mapper.local_table.name, 0))
+    
+    for state in tracked(session.new):
+        table = state.mapper.local_table
+        pk = table.primary_key.columns[0]
+        row_id = state.mapper.primary_key_from_instance(state.obj())[0]
+        row = connection.execute(select(table).where(pk == row_id)).mappings().first()
+        if row is not None:
+            entries.append((table.name, "insert", row_id, dict(row)))
+    
+    for state in tracked(session.dirty):
+        if not session.is_modified(state.obj(), include_collections=False):
+            continue
+        table = state.mapper.local_table
+        values = {}
+        for prop in state.mapper.column_attrs:
+            if prop.key in state.dict and state.attrs[prop.key].history.has_changes():
+                values[prop.columns[0].name] = state.dict[prop.key]
+        if values:
+            row_id = state.mapper.primary_key_from_instance(state.obj())[0]
+            entries.append((table.name, "update", row_id, values))
+    
+    for state in reversed(tracked(session.deleted)):
+        row_id = state.mapper.primary_key_from_instance(state.obj())[0]
+        entries.append((state.mapper.local_table.name, "delete", row_id, {}))
+    
+    _write_entries(connection, metadata, entries)
+
+def record_bulk_write(orm_execute_state, metadata: MetaData):
+    """
+    Run a bulk query.update()/delete() and journal the rows it changed (do_orm_execute hook)
+    
+    The rows the statement matches are read before it runs and again after, so updates keep
+    only the changed columns, with the values stored (not SQL expressions like attempts + 1).
+    """
+    mapper = orm_execute_state.bind_mapper
+    statement = orm_execute_state.statement
+    table = mapper.local_table if mapper is not None else None
+    if table is None or table.name not in metadata.tables or table.name in NOT_JOURNALED:
+        return None
+    
+    pk = table.primary_key.columns[0]
+    connection = orm_execute_state.session.connection()
+    query = select(table)
+    if statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+    before = {row[pk.name]: dict(row) for row in connection.execute(query).mappings()}
+    
+    result = orm_execute_state.invoke_statement()
+    
+    entries = []
+    after = {row[pk.name]: row for row in connection.execute(select(table).where(pk.in_(before))).mappings()}
+    for row_id in sorted(before):
+        if row_id not in after:
+            entries.append((table.name, "delete", row_id, {}))
+        else:
+            values = {name: value for name, value in after[row_id].items() if value != before[row_id][name]}
+            if values:
+                entries.append((table.name, "update", row_id, values))
+    _write_entries(connection, metadata, entries)
+    return result
+
+def _write_entries(connection: Connection, metadata: MetaData, entries):
+    """Insert (table, operation, row ID, values) entries as pending journal rows"""
+    if entries:
+        connection.execute(metadata.tables[JOURNAL_TABLE].insert(), [
+            {
+                "table_name": table_name,
+                "operation": operation,
+                "row_id": row_id,
+                "payload": json.loads(json.dumps(values, default=_json_default)),
+                "status": "pending",
+                "created_at": datetime.now()
+            }
+            for table_name, operation, row_id, values in entries
+        ])
+
+def journal_stats(fallback_engine: Engine, metadata: MetaData) -> Dict[str, Any]:
+    """Pending entry count and the age of the oldest one"""
+    journal = metadata.tables[JOURNAL_TABLE]
+    with fallback_engine.connect() as conn:
+        if not sa_inspect(conn).has_table(JOURNAL_TABLE):
+            return {"pending_writes": 0, "replay_lag_seconds": 0.0}
+        count, oldest = conn.execute(
+            select(func.count(journal.c.id), func.min(journal.c.created_at)).where(journal.c.status == "pending")
+        ).one()
+    
+    lag = (datetime.now() - oldest).total_seconds() if oldest else 0.0
+    return {"pending_writes": count, "replay_lag_seconds": round(lag, 1)}
+
+def purge_replayed(fallback_engine: Engine, metadata: MetaData) -> int:
+    """Drop replayed entries once the primary is current again (their ID mapping is no longer needed)"""
+    journal = metadata.tables[JOURNAL_TABLE]
+    with fallback_engine.begin() as conn:
+        if not sa_inspect(conn).has_table(JOURNAL_TABLE):
+            return 0
+        return conn.execute(journal.delete().where(journal.c.status == "replayed")).rowcount
+
+def _find_existing(conn: Connection, table: Table, values: Dict[str, Any]) -> Optional[int]:
+    """Primary key of a row on the primary with the same value in a unique column"""
+    pk = table.primary_key.columns[0]
+    unique_columns = [c for c in table.c if c.unique]
+    unique_columns += [list(index.columns)[0] for index in table.indexes
+                       if index.unique and len(index.columns) == 1]
+    for column in unique_columns:
+        if values.get(column.name) is not None:
+            found = conn.execute(select(pk).where(column == values[column.name])).scalar()
+            if found is not None:
+                return found
+    return None
+
+def _replay_entry(conn: Connection, table: Table, entry, id_map: Dict[Tuple[str, int], int],
+                  outage_rows: Set[Tuple[str, int]]) -> Tuple[str, Optional[int], Optional[str]]:
+    """
+    Apply one entry on the primary; returns (status, remote_id, error)
+    
+    outage_rows are the (table, local ID) of rows inserted during the outage. Their local ID
+    can belong to an unrelated row on the primary, so an entry that refers to one whose insert
+    was not replayed (no id_map entry) fails instead of falling back to the local ID.
+    """
+    values = _decode_values(table, entry.payload or {})
+    
+    # Rows created during the outage got local IDs; point references at the primary's IDs
+    for column in table.c:
+        for fk in column.foreign_keys:
+            key = (fk.column.table.name, values.get(column.name))
+            if key in id_map:
+                values[column.name] = id_map[key]
+            elif key in outage_rows:
+                return "failed", None, f"{column.name} refers to {key[0]} row {key[1]}, whose insert was not replayed"
+    
+    pk = table.primary_key.columns[0]
+    key = (table.name, entry.row_id)
+    if entry.operation != "insert" and key in outage_rows and key not in id_map:
+        return "failed", None, f"Row {entry.row_id} was inserted during the outage and its insert was not replayed"
+    row_id = id_map.get(key, entry.row_id)
+    values.pop(pk.name, None)
+    
+    if entry.operation == "insert":
+        savepoint = conn.begin_nested()
+        try:
+            remote_id = conn.execute(table.insert().values(values)).inserted_primary_key[0]
+            savepoint.commit()
+        except IntegrityError as e:
+            savepoint.rollback()
+            # Already there (e.g. the same Gmail message stored by another instance)
+            remote_id = _find_existing(conn, table, values)
+            if remote_id is None:
+                return "failed", None, str(e.orig)
+        id_map[(table.name, entry.row_id)] = remote_id
+        return "replayed", remote_id, None
+    
+    if entry.operation == "update":
+        if values:
+            conn.execute(table.update().where(pk == row_id).values(values))
+        return "replayed", None, None
+    
+    conn.execute(table.delete().where(pk == row_id))
+    return "replayed", None, None
+
+def replay_pending(fallback_engine: Engine, primary_engine: Engine, metadata: MetaData) -> int:
+    """
+    Apply pending entries to the primary in order and mark them replayed
+    
+    Each batch is one transaction on the primary, so a connection failure leaves the batch
+    pending for the next attempt. When a row inserted during the outage cannot be replayed,
+    the later entries that update, delete or reference it fail too rather than hit another
+    row. Delivery is at-least-once: a crash between the primary commit and marking the batch
+    can replay it again (inserts into tables with a unique column are matched to the existing
+    row instead of duplicated).
+    """
+    journal = metadata.tables[JOURNAL_TABLE]
+    with fallback_engine.connect() as conn:
+        if not sa_inspect(conn).has_table(JOURNAL_TABLE):
+            return 0
+        id_map = {}
+        outage_rows = set()
+        for row in conn.execute(
+            select(journal.c.table_name, journal.c.row_id, journal.c.remote_id).where(journal.c.operation == "insert")
+        ):
+            outage_rows.add((row.table_name, row.row_id))
+            if row.remote_id is not None:
+                id_map[(row.table_name, row.row_id)] = row.remote_id
+    
+    replayed = 0
+    while True:
+        with fallback_engine.connect() as conn:
+            entries = conn.execute(
+                select(journal).where(journal.c.status == "pending").order_by(journal.c.id).limit(REPLAY_BATCH_SIZE)
+            ).all()
+        if not entries:
+            return replayed
+        
+        results = []
+        with primary_engine.begin() as conn:
+            for entry in entries:
+                table = metadata.tables.get(entry.table_name)
+                if table is None:
+                    results.append((entry.id, "failed", None, f"Unknown table {entry.table_name}"))
+                    continue
+                results.append((entry.id,) + _replay_entry(conn, table, entry, id_map, outage_rows))
+        
+        now = datetime.now()
+        with fallback_engine.begin() as conn:
+            for entry_id, status, remote_id, error in results:
+                conn.execute(journal.update().where(journal.c.id == entry_id).values(
+                    status=status, remote_id=remote_id, error=error, replayed_at=now
+                ))
+        
+        failed = sum(1 for r in results if r[1] == "failed")
+        if failed:
+            print(f"⚠️ {failed} journaled writes could not be replayed (see {JOURNAL_TABLE}.error)")
+        replayed += len(results)
+        print(f"🔄 Replayed {len(results)} journaled writes on the primary database")
@@ -2,8 +2,8 @@
 Database models for email processing and OCR documents
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Boolean, JSON, Index
+from sqlalchemy.orm import relationship, query_expression
 from sqlalchemy.sql import func
 from app.core.database import Base
 import uuid
@@ -15,6 +15,12 @@ def generate_claim_number():
 class Email(Base):
     """Model for received emails"""
     __tablename__ = "EMAILS"
+    __table_args__ = (
+        # Thread history (first notification / follow-up detection) and the email list
+        Index("ix_emails_thread_id_received_at", "thread_id", "received_at"),
+        Index("ix_emails_received_at", "received_at"),
+        Index("ix_emails_is_processed_received_at", "is_processed", "received_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     gmail_id = Column(String(255), unique=True, nullable=False)  # Gmail message ID
@@ -34,6 +40,8 @@ class Email(Base):
     # Status
     is_processed = Column(Boolean, default=False)
     is_first_notification = Column(Boolean, nullable=True)  # Determined by LLM
+    is_claim = Column(Boolean, nullable=True)  # Claim or not, as judged by the LLM (triage training label)
+    triage_score = Column(Float, nullable=True)  # Local triage model's claim probability
     
     # Relationships
     claim_submission = relationship("ClaimSubmission", back_populates="initial_email")
@@ -42,6 +50,13 @@ class Email(Base):
 class ClaimSubmission(Base):
     """Model for claim submissions from emails"""
     __tablename__ = "CLAIM_SUBMISSIONS"
+    __table_args__ = (
+        # Claim lookup by email and the keyset-paginated claims list (newest first, optional filters)
+        Index("ix_claim_submissions_email_id", "email_id"),
+        Index("ix_claim_submissions_created_at_id", "created_at", "id"),
+        Index("ix_claim_submissions_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_claim_submissions_priority_created_at_id", "priority", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     claim_number = Column(String(50), unique=True, index=True, default=generate_claim_number)
@@ -66,6 +81,9 @@ class ClaimSubmission(Base):
     # LLM analysis
     llm_summary = Column(Text, nullable=True)
     llm_recommendation = Column(String(100), nullable=True)  # CLOSE_CASE, REQUEST_MORE_DOCS, APPROVE, REJECT
+    sentiment_analysis = Column(String(50), nullable=True)  # POSITIVE, NEGATIVE, NEUTRAL
+    risk_score = Column(Float, nullable=True)  # 0.0 to 1.0
+    priority_level = Column(String(50), nullable=True)  # low, normal, high, urgent
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -75,10 +93,17 @@ class ClaimSubmission(Base):
     # Relationships
     documents = relationship("DocumentAgentOCR", back_populates="claim_submission")
     status_updates = relationship("ClaimStatusUpdate", back_populates="claim_submission")
+    analysis = relationship("ClaimAnalysis", back_populates="claim_submission", uselist=False)
 
 class DocumentAgentOCR(Base):
     """Model for documents processed with OCR"""
     __tablename__ = "DOCUMENTS_AGENT_OCR"
+    __table_args__ = (
+        # Documents of a claim (newest first), of an email, and the document list
+        Index("ix_documents_agent_ocr_claim_uploaded_at", "claim_submission_id", "uploaded_at"),
+        Index("ix_documents_agent_ocr_email_id", "email_id"),
+        Index("ix_documents_agent_ocr_uploaded_at", "uploaded_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -100,6 +125,7 @@ class DocumentAgentOCR(Base):
     
     # OCR Results
     ocr_text = Column(Text, nullable=True)  # Raw OCR text
+    ocr_text_preview = query_expression()  # Start of ocr_text, filled by claim_loader when ocr_text is deferred
     structured_data = Column(JSON, nullable=True)  # Key-value pairs from OCR
     image_description = Column(JSON, nullable=True)  # Image analysis results
     
@@ -111,13 +137,88 @@ class DocumentAgentOCR(Base):
     is_processed = Column(Boolean, default=False)
     processing_errors = Column(Text, nullable=True)
     
+    # Content (SHA-256) and the shared blob holding its stored file and OCR result
+    content_sha256 = Column(String(64), nullable=True, index=True)
+    blob_id = Column(Integer, ForeignKey("DOCUMENT_BLOBS.id"), nullable=True)
+    blob = relationship("DocumentBlob")
+    
     # Timestamps
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     processed_at = Column(DateTime(timezone=True), nullable=True)
 
+class DocumentBlob(Base):
+    """Model for a unique document content, shared by every document with the same SHA-256"""
+    __tablename__ = "DOCUMENT_BLOBS"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    content_sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    file_size = Column(Integer, nullable=False)
+    mime_type = Column(String(100), nullable=True)
+    
+    # Where the first copy was stored (later copies are not uploaded again)
+    storage_url = Column(String(500), nullable=True)
+    storage_path = Column(String(500), nullable=True)
+    
+    # EnhancedOCRService result of the first copy, reused instead of another Gemini call
+    ocr_result = Column(JSON, nullable=True)
+    ocr_document_type = Column(String(100), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    ocr_processed_at = Column(DateTime(timezone=True), nullable=True)
+
+# On SQLite the claims list orders by julianday(created_at) (see analyst_api._claims_created_at),
+# which only these expression indexes can serve
+Index(
+    "ix_claim_submissions_created_jd_id",
+    func.julianday(ClaimSubmission.created_at), ClaimSubmission.id
+).ddl_if(dialect="sqlite")
+Index(
+    "ix_claim_submissions_status_created_jd_id",
+    ClaimSubmission.status, func.julianday(ClaimSubmission.created_at), ClaimSubmission.id
+).ddl_if(dialect="sqlite")
+Index(
+    "ix_claim_submissions_priority_created_jd_id",
+    ClaimSubmission.priority, func.julianday(ClaimSubmission.created_at), ClaimSubmission.id
+).ddl_if(dialect="sqlite")
+
+class OCRJob(Base):
+    """Model for background OCR jobs of uploaded documents"""
+    __tablename__ = "OCR_JOBS"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(32), unique=True, index=True, nullable=False)  # Public ID returned by the upload
+    
+    # Target claim and resulting document
+    claim_submission_id = Column(Integer, ForeignKey("CLAIM_SUBMISSIONS.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("DOCUMENTS_AGENT_OCR.id"), nullable=True)
+    
+    # Upload
+    original_filename = Column(String(255), nullable=False)
+    file_type = Column(String(100), nullable=False)  # MIME type
+    file_size = Column(Integer, nullable=False)
+    content_sha256 = Column(String(64), nullable=True)  # Computed while spooling the upload
+    document_type = Column(String(100), nullable=True)
+    file_path = Column(String(500), nullable=False)  # Local copy until the job has run
+    
+    # Processing
+    status = Column(String(20), default="pending", index=True)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    result = Column(JSON, nullable=True)  # OCR result and summary
+    error = Column(Text, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
 class ClaimStatusUpdate(Base):
     """Model for tracking claim status changes"""
     __tablename__ = "CLAIM_STATUS_UPDATES"
+    __table_args__ = (
+        # Status history of a claim
+        Index("ix_claim_status_updates_claim_created_at", "claim_submission_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -136,6 +237,32 @@ class ClaimStatusUpdate(Base):
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ClaimAnalysis(Base):
+    """Model for the persisted sentiment/risk analysis of a claim"""
+    __tablename__ = "CLAIM_ANALYSES"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Relationship (one current analysis per claim)
+    claim_submission_id = Column(Integer, ForeignKey("CLAIM_SUBMISSIONS.id"), unique=True, nullable=False)
+    claim_submission = relationship("ClaimSubmission", back_populates="analysis")
+    
+    # Version of the inputs: sha256 of the analyzed fields plus the prompt version
+    input_hash = Column(String(64), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    
+    # Results
+    sentiment_label = Column(String(20), nullable=True)  # positive, negative, neutral
+    sentiment_score = Column(Float, nullable=True)  # 0.0 to 1.0
+    risk_score = Column(Float, nullable=True)  # 0.0 to 1.0
+    priority_level = Column(String(20), nullable=True)  # low, medium, high, urgent
+    traffic_light = Column(String(10), nullable=True)  # red, yellow, green
+    analysis = Column(JSON, nullable=False)  # Full response returned by the API
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
 class DashboardStats(Base):
     """Model for dashboard statistics"""
     __tablename__ = "DASHBOARD_STATS"
@@ -148,10 +275,55 @@ class DashboardStats(Base):
     approved_claims = Column(Integer, default=0)
     rejected_claims = Column(Integer, default=0)
     closed_claims = Column(Integer, default=0)
+    under_review_claims = Column(Integer, default=0)
     
     # Financial
     total_amount_requested = Column(Float, default=0.0)
     total_amount_approved = Column(Float, default=0.0)
     
+    # Processing
+    total_emails = Column(Integer, default=0)
+    processed_emails = Column(Integer, default=0)
+    total_documents = Column(Integer, default=0)
+    
+    # Timestamps
+    last_updated = Column(DateTime(timezone=True), server_default=func.now())  # Last change (full or incremental)
+    computed_at = Column(DateTime(timezone=True), nullable=True)  # Last full recompute from the source tables
+
+class GmailSyncState(Base):
+    """Model for the incremental Gmail sync checkpoint"""
+    __tablename__ = "GMAIL_SYNC_STATE"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account = Column(String(255), unique=True, nullable=False, default="me")  # Gmail userId
+    
+    # Last Gmail historyId whose changes have been fully processed
+    history_id = Column(String(50), nullable=True)
+    last_full_sync_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WriteJournalEntry(Base):
+    """Model for writes made on the SQLite replica while the primary database was down"""
+    __tablename__ = "WRITE_JOURNAL"
+    __table_args__ = (
+        Index("ix_write_journal_status_id", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)  # Replay order
+    
+    # The change
+    table_name = Column(String(100), nullable=False)
+    operation = Column(String(10), nullable=False)  # insert, update, delete
+    row_id = Column(Integer, nullable=False)  # Primary key on the replica
+    payload = Column(JSON, nullable=True)  # Inserted row or changed columns
+    
+    # Replay
+    status = Column(String(20), default="pending")  # pending, replayed, failed
+    remote_id = Column(Integer, nullable=True)  # Primary key the primary assigned to an inserted row
+    error = Column(Text, nullable=True)
+    
     # Timestamps
-    last_updated = Column(DateTime(timezone=True), server_default=func.now()) 
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    replayed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,180 @@
+"""
+Async LLM Service using the Gemini REST API
+Coroutine counterpart of LLMService for request handlers: calls are awaited on the event loop
+(httpx), so hundreds can be in flight per worker instead of one per threadpool thread
+"""
+
+import os
+import base64
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.services.llm_cache import LLMResponseCache, get_llm_cache, make_cache_key
+from app.services.image_preprocessing import image_preprocessor
+from app.services.gemini_client import GeminiClient, gemini_client, estimate_tokens, LLMServiceError
+from app.services.llm_service import guess_mime_type
+from app.services.single_flight import llm_single_flight
+
+DEFAULT_API_BASE_URL = "https://generativelanguage.googleapis.com"
+
+class AsyncLLMService:
+    """Async text and vision calls to Gemini, sharing the rate limits and cache of LLMService"""
+    
+    _DEFAULT_CACHE = object()
+    
+    def __init__(self, cache: Optional[LLMResponseCache] = _DEFAULT_CACHE, client: Optional[GeminiClient] = None):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+        
+        self.model_name = 'gemini-1.5-flash'
+        # Overridable for tests and load tests against a fake server
+        self.base_url = os.getenv("GEMINI_API_BASE_URL", DEFAULT_API_BASE_URL).rstrip("/")
+        self.client = client or gemini_client
+        # Shared with LLMService: a sync and an async caller of the same prompt share one call
+        self.flight = llm_single_flight
+        self.max_connections = int(os.getenv("GEMINI_ASYNC_MAX_CONNECTIONS", "256"))
+        
+        # Same cache as LLMService, so sync and async callers share answers
+        self.cache = get_llm_cache() if cache is AsyncLLMService._DEFAULT_CACHE else cache
+        
+        # httpx.AsyncClient belongs to the event loop it was first used on
+        self._http = None
+        self._http_loop = None
+    
+    async def analyze_text(self, prompt: str, use_cache: bool = True) -> str:
+        """Analyze text using Gemini; use_cache=False always calls Gemini and caches the new answer"""
+        return await self._generate([{"text": prompt}], make_cache_key(self.model_name, prompt), use_cache=use_cache)
+    
+    async def generate_text(self, prompt: str, use_cache: bool = True) -> str:
+        """Generate text using Gemini (alias for analyze_text)"""
+        return await self.analyze_text(prompt, use_cache)
+    
+    async def generate_text_with_image_data(self, prompt: str, image_data: bytes, mime_type: Optional[str] = None) -> str:
+        """Generate text from raw image/PDF bytes using Gemini Vision"""
+        cache_key = make_cache_key(self.model_name, prompt, image_data)
+        
+        async def build_parts():
+            # Decoding and re-encoding an image is CPU work; keep it off the event loop
+            data, blob_mime_type = await asyncio.to_thread(
+                image_preprocessor.preprocess, image_data, mime_type or guess_mime_type(image_data)
+            )
+            parts = [
+                {"text": prompt},
+                {"inline_data": {"mime_type": blob_mime_type, "data": base64.b64encode(data).decode("ascii")}}
+            ]
+            return parts, estimate_tokens([prompt, data])
+        
+        return await self._generate(build_parts, cache_key)
+    
+    async def _generate(self, parts, cache_key: str, tokens: Optional[int] = None, use_cache: bool = True) -> str:
+        """
+        One generateContent call through the shared limiter; raises LLMServiceError
+        
+        Args:
+            parts: request parts, or a coroutine function returning (parts, tokens), run only
+                by the caller that actually sends the request
+            cache_key: cache key, also the key identical in-flight requests are coalesced on
+            tokens: estimated request tokens (default: from the prompt)
+            use_cache: False skips cached answers; the new answer is still cached
+        """
+        read_cache = self.cache if use_cache else None
+        if read_cache:
+            cached = await asyncio.to_thread(read_cache.get, cache_key)
+            if cached is not None:
+                return cached
+        
+        async def call():
+            if read_cache:
+                cached = await asyncio.to_thread(read_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+            
+            if callable(parts):
+                request_parts, request_tokens = await parts()
+            else:
+                request_parts, request_tokens = parts, tokens
+            return await self._send(request_parts, cache_key, request_tokens)
+        
+        # A bypassing call must not join one that may answer from the cache
+        return await self.flight.ado(cache_key if use_cache else f"{cache_key}:nocache", call)
+    
+    async def _send(self, parts: List[Dict[str, Any]], cache_key: str, tokens: Optional[int]) -> str:
+        http = self._get_http()
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:generateContent"
+        body = {"contents": [{"role": "user", "parts": parts}]}
+        
+        # The key goes in a header: httpx puts the request URL in its error messages
+        headers = {"x-goog-api-key": self.api_key}
+        
+        async def send(timeout: float):
+            try:
+                response = await http.post(url, headers=headers, json=body, timeout=timeout)
+            except httpx.TransportError as e:
+                raise LLMServiceError(f"Gemini request failed: {type(e).__name__}", retryable=True) from None
+            if response.is_error:
+                # Status and headers (Retry-After) are kept for the retry logic, the URL is not logged
+                raise httpx.HTTPStatusError(f"Gemini returned HTTP {response.status_code}",
+                                            request=response.request, response=response)
+            return response.json()
+        
+        tokens = tokens or estimate_tokens(parts[0]["text"])
+        try:
+            data = await self.client.acall(send, tokens)
+        except LLMServiceError as e:
+            print(f"❌ Error in async LLM call: {e}")
+            raise
+        
+        result = self._response_text(data)
+        total_tokens = (data.get("usageMetadata") or {}).get("totalTokenCount")
+        if total_tokens:
+            self.client.token_bucket.debit(total_tokens - tokens)
+        
+        if self.cache:
+            await asyncio.to_thread(self.cache.set, cache_key, result)
+        return result
+    
+    def _response_text(self, data: Dict[str, Any]) -> str:
+        """Text of a generateContent response; a blocked or empty answer is an error"""
+        try:
+            parts = data["candidates"][0]["content"]["parts"]
+            text = "".join(part.get("text", "") for part in parts).strip()
+        except (KeyError, IndexError, TypeError):
+            text = ""
+        if not text:
+            reason = (data.get("promptFeedback") or {}).get("blockReason") or "empty response"
+            raise LLMServiceError(f"Gemini returned no text: {reason}")
+        return text
+    
+    def _get_http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ))
+            self._http_loop = loop
+        return self._http
+    
+    async def aclose(self):
+        """Close the HTTP connection pool"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._http_loop = None
+
+_async_llm_service: Optional[AsyncLLMService] = None
+
+def get_async_llm_service() -> AsyncLLMService:
+    """Process-wide AsyncLLMService (one connection pool), created on first use"""
+    global _async_llm_service
+    if _async_llm_service is None:
+        _async_llm_service = AsyncLLMService()
+    return _async_llm_service
+
+async def close_async_llm_service():
+    """Close the shared service's connections on shutdown"""
+    if _async_llm_service is not None:
+        await _async_llm_service.aclose()
@@ -0,0 +1,215 @@
+"""
+Staged processing of email attachments: fetch -> store -> OCR
+Each stage runs on its own threads and hands attachments to the next through a bounded
+queue, so the first attachments are uploaded and read while the rest are still downloading
+"""
+
+import os
+import queue
+import base64
+import hashlib
+import threading
+import contextvars
+import time
+from typing import List, Dict, Any, Optional, Callable
+
+from app.services.gmail_service import GmailService
+from app.services.storage_service import StorageService
+from app.services.enhanced_ocr_service import EnhancedOCRService
+
+# Attachments Gemini can read
+OCR_MIME_PREFIXES = ("image/", "application/pdf")
+
+# Tells a stage's workers that nothing more is coming
+_DONE = object()
+
+class AttachmentPipeline:
+    """Downloads, stores and OCRs the attachments of one email with per-stage concurrency limits"""
+    
+    def __init__(self, gmail_service: GmailService, storage_service: StorageService,
+                 ocr_service: Optional[EnhancedOCRService] = None):
+        self.gmail_service = gmail_service
+        self.storage_service = storage_service
+        # Idle per-worker copies of storage_service; an upload checks one out, so no GCS client
+        # is used by two threads at once
+        self._storage_workers = queue.LifoQueue()
+        self._ocr_service = ocr_service
+        self._ocr_service_lock = threading.Lock()
+        
+        # Gmail: attachments per batched request (the client is not thread-safe, so one
+        # fetcher issues the batches); storage and Gemini: worker threads per stage
+        self.fetch_batch_size = int(os.getenv("ATTACHMENT_FETCH_BATCH_SIZE", "4"))
+        self.storage_concurrency = int(os.getenv("ATTACHMENT_STORAGE_CONCURRENCY", "4"))
+        self.ocr_concurrency = int(os.getenv("ATTACHMENT_OCR_CONCURRENCY", "3"))
+        # Attachments waiting between stages; a slow stage makes the one before it wait
+        self.queue_size = int(os.getenv("ATTACHMENT_QUEUE_SIZE", "8"))
+        self.ocr_enabled = os.getenv("ATTACHMENT_OCR_ENABLED", "true").lower() == "true"
+    
+    def process(self, message_id: str, payload: Dict, claim_number: str,
+                known_blobs: Optional[Callable[[List[str]], Dict[str, Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """
+        Run every attachment of a message through the pipeline
+        
+        Args:
+            message_id: Gmail message ID
+            payload: the message's already fetched Gmail payload
+            claim_number: folder the files are stored under
+            known_blobs: called with content hashes, returns {hash: {"storage", "ocr_result"}} for
+                content seen before; those attachments skip the upload and/or OCR
+        
+        Returns:
+            One dict per downloaded attachment, in message order: filename, mime_type, size,
+            sha256, storage (upload_bytes result or None) and ocr_result (or None)
+        """
+        parts = self.gmail_service.list_attachment_parts(payload)
+        if not parts:
+            return []
+        
+        started = time.perf_counter()
+        store_queue = queue.Queue(maxsize=self.queue_size)
+        ocr_queue = queue.Queue(maxsize=self.queue_size)
+        done_queue = queue.Queue()
+        
+        duplicates = []
+        threads = [threading.Thread(target=self._fetch, args=(message_id, parts, store_queue, known_blobs, duplicates),
+                                    name="attachments-fetch", daemon=True)]
+        threads += self._start_stage("attachments-store", self.storage_concurrency, store_queue, ocr_queue,
+                                     self.ocr_concurrency, lambda item: self._store(item, claim_number))
+        threads += self._start_stage("attachments-ocr", self.ocr_concurrency, ocr_queue, done_queue,
+                                     1, self._ocr)
+        threads[0].start()
+        
+        results = []
+        while True:
+            item = done_queue.get()
+            if item is _DONE:
+                break
+            results.append(item)
+        
+        for thread in threads:
+            thread.join()
+        
+        # The same file attached twice was only processed once
+        by_index = {item["index"]: item for item in results}
+        for index, filename, original_index in duplicates:
+            if original_index in by_index:
+                results.append(dict(by_index[original_index], index=index, filename=filename))
+        
+        results.sort(key=lambda item: item["index"])
+        reused = sum(1 for item in results if item["reused"]) + len(duplicates)
+        print(f"📎 {len(results)}/{len(parts)} attachments processed in {time.perf_counter() - started:.2f}s ({reused} already known)")
+        return results
+    
+    def _start_stage(self, name: str, workers: int, inbox: queue.Queue, outbox: queue.Queue,
+                     downstream_workers: int, handle) -> List[threading.Thread]:
+        """Start workers that handle items from inbox and pass them on; the last one out closes outbox"""
+        remaining = [workers]
+        lock = threading.Lock()
+        
+        def work():
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                try:
+                    handle(item)
+                except Exception as e:
+                    print(f"❌ Error in {name} for {item['filename']}: {e}")
+                outbox.put(item)
+            
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(downstream_workers):
+                    outbox.put(_DONE)
+        
+        # Each worker runs in a copy of the caller's context, so the Gemini deadline carries over
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(work,), name=f"{name}-{i}", daemon=True)
+                   for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+    
+    def _fetch(self, message_id: str, parts: List[Dict], outbox: queue.Queue, known_blobs, duplicates: List):
+        """Download attachments a batch at a time and hand each one on as soon as its batch is in"""
+        seen = {}
+        try:
+            for start in range(0, len(parts), self.fetch_batch_size):
+                batch = parts[start:start + self.fetch_batch_size]
+                downloaded = self.gmail_service.get_attachments_batch(
+                    message_id, [part["attachment_id"] for part in batch if part["attachment_id"]]
+                )
+                
+                items = []
+                for index, part in enumerate(batch, start):
+                    if part["inline_data"]:
+                        data = base64.urlsafe_b64decode(part["inline_data"])
+                    else:
+                        data = downloaded.get(part["attachment_id"])
+                    if data is None:
+                        print(f"⚠️ Could not download attachment {part['filename']}")
+                        continue
+                    
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    if sha256 in seen:
+                        duplicates.append((index, part["filename"], seen[sha256]))
+                        continue
+                    seen[sha256] = index
+                    
+                    items.append({
+                        "index": index,
+                        "filename": part["filename"],
+                        "mime_type": part["mime_type"],
+                        "size": len(data),
+                        "sha256": sha256,
+                        "data": data,
+                        "storage": None,
+                        "ocr_result": None,
+                        "reused": False
+                    })
+                
+                known = known_blobs([item["sha256"] for item in items]) if known_blobs and items else {}
+                for item in items:
+                    blob = known.get(item["sha256"])
+                    if blob:
+                        item["storage"] = blob.get("storage")
+                        item["ocr_result"] = blob.get("ocr_result")
+                        item["reused"] = True
+                    outbox.put(item)
+        except Exception as e:
+            print(f"❌ Error fetching attachments of message {message_id}: {e}")
+        finally:
+            for _ in range(self.storage_concurrency):
+                outbox.put(_DONE)
+    
+    def _store(self, item: Dict[str, Any], claim_number: str):
+        if item["storage"] or not self.storage_service.client:
+            return
+        
+        try:
+            storage_service = self._storage_workers.get_nowait()
+        except queue.Empty:
+            storage_service = self.storage_service.for_worker()
+        try:
+            item["storage"] = storage_service.upload_bytes(
+                item["data"], claim_number, "email-attachments", item["filename"], item["mime_type"]
+            )
+        finally:
+            self._storage_workers.put(storage_service)
+    
+    def _ocr(self, item: Dict[str, Any]):
+        try:
+            if item["ocr_result"] is None and self.ocr_enabled and item["mime_type"].startswith(OCR_MIME_PREFIXES):
+                item["ocr_result"] = self._get_ocr_service().process_document_with_gemini(
+                    item["data"], item["filename"], "OTHER", item["mime_type"]
+                )
+        finally:
+            # The bytes are stored by now; only the metadata is persisted
+            item.pop("data", None)
+    
+    def _get_ocr_service(self) -> EnhancedOCRService:
+        with self._ocr_service_lock:
+            if self._ocr_service is None:
+                self._ocr_service = EnhancedOCRService()
+            return self._ocr_service
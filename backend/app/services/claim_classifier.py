@@ -0,0 +1,209 @@
+"""
+Keyword classifier for claim emails
+One keyword list shared by EmailScheduler and EmailProcessor, compiled once into a single
+regex (a trie of the keywords, so alternatives sharing a prefix are tried together) that
+matches whole words only, with their inflections ("delayed", "injuries", "lost"), and ignores
+HTML markup.
+
+CPython's re engine tries a pattern at every character, ~25x slower than str.find, so the
+text is not scanned with the regex: str.find locates the stems of the first words of the
+keywords (fewer than the keywords, phrases share them) and the regex is only matched there.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+# Phrases that on their own say the email is about a claim
+CLAIM_PHRASES = [
+    "claim", "insurance claim", "travel insurance claim", "travel claim", "medical claim",
+    "claim notification", "claim submission", "claim report",
+    "trip cancellation", "trip delay", "trip interruption",
+    "flight cancellation", "flight delay", "hotel cancellation", "hotel problem"
+]
+
+# Broad words: common in claims, but also in newsletters and receipts
+CLAIM_TERMS = [
+    "insurance", "travel insurance", "accident", "cancellation", "delay", "interruption",
+    "loss", "damage", "injury", "illness", "emergency", "compensation", "reimbursement",
+    "coverage", "policy"
+]
+
+PHRASE_WEIGHT = 3.0
+TERM_WEIGHT = 1.0
+
+# Inflections that do not follow from the spelling of the word
+IRREGULAR_FORMS = {"loss": ["lost"]}
+
+# Start and end of what of an HTML body is not text: tags, style and script blocks, comments
+_HTML_BLOCKS = [("<", ">"), ("<style", "</style"), ("<script", "</script"), ("<!--", "-->")]
+
+# An actual tag: a bare "<" in a plain-text body ("x < 5") does not make it HTML
+_HTML_TAG = re.compile(r"<(?:[a-z][a-z0-9]*[\s/>]|/[a-z]|!)")
+
+class _MarkupTracker:
+    """
+    Whether positions of a lowercased HTML body are inside a tag, style, script or comment
+    
+    Positions must be asked in increasing order: each call only searches the text since the
+    previous one, so a whole body is searched once however many keywords it contains.
+    """
+    
+    def __init__(self, html: str):
+        self.html = html
+        self.pos = 0
+        # Last position of each marker before self.pos
+        self.last = {marker: -1 for block in _HTML_BLOCKS for marker in block}
+    
+    def covers(self, pos: int) -> bool:
+        for marker in self.last:
+            # A marker that started before the previous position but ended after it is found too
+            found = self.html.rfind(marker, max(0, self.pos - len(marker) + 1), pos)
+            if found != -1:
+                self.last[marker] = found
+        self.pos = pos
+        return any(self.last[start] > self.last[end] for start, end in _HTML_BLOCKS)
+
+def _inflections(word: str) -> List[str]:
+    """The word with its plural, past and -ing forms: claims/claimed, damaged, injuries/injured"""
+    if word.endswith("y") and word[-2:-1] not in ("a", "e", "i", "o", "u"):
+        stem, endings = word[:-1], ["y", "ies", "ied", "ying", "ed", "ing"]
+    elif word.endswith("e"):
+        stem, endings = word[:-1], ["e", "es", "ed", "ing"]
+    else:
+        stem, endings = word, ["", "s", "es", "ed", "ing"]
+    return [stem + ending for ending in endings] + IRREGULAR_FORMS.get(word, [])
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Regex alternation of the keywords factored by common prefix; spaces match any whitespace"""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: Dict[str, dict]) -> str:
+        branches = [(r"\s+" if char == " " else re.escape(char)) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+    
+    return build(trie)
+
+class KeywordMatch(NamedTuple):
+    """Keywords found in an email and their summed weight"""
+    matched: List[str]
+    score: float
+    threshold: float
+    
+    @property
+    def is_claim(self) -> bool:
+        return self.score >= self.threshold
+
+class ClaimKeywordClassifier:
+    """Finds claim keywords in subject + body with one precompiled regex"""
+    
+    def __init__(self, weights: Dict[str, float] = None, threshold: float = None):
+        if weights is None:
+            weights = {**{term: TERM_WEIGHT for term in CLAIM_TERMS},
+                       **{phrase: PHRASE_WEIGHT for phrase in CLAIM_PHRASES}}
+        self.weights = {" ".join(keyword.lower().split()): weight for keyword, weight in weights.items()}
+        self.keywords = sorted(self.weights)
+        
+        # Every form a keyword is written in, inflecting its last word: "flight delayed" is "flight delay"
+        self.forms = {}
+        for keyword in self.keywords:
+            *head, last = keyword.split()
+            for form in _inflections(last):
+                self.forms.setdefault(" ".join(head + [form]), keyword)
+        
+        # Default: any keyword makes a candidate, as the keyword loops did
+        if threshold is None:
+            threshold = float(os.getenv("CLAIM_KEYWORD_MIN_SCORE", str(TERM_WEIGHT)))
+        self.threshold = threshold
+        
+        # Whole words only ("claim" is not in "disclaimer").
+        # The regex is greedy, so "travel insurance claim" is found rather than "travel insurance".
+        self.pattern = re.compile(r"\b" + _trie_pattern(self.forms) + r"\b")
+        
+        # Every match starts with the stem of one of these words ("injur" of injury/injured, "los"
+        # of loss/lost). Those of the heaviest keywords are looked for first, so is_claim usually
+        # stops after one str.find on a claim email.
+        stems = {}
+        for keyword, weight in self.weights.items():
+            words = keyword.split()
+            stem = words[0] if len(words) > 1 else os.path.commonprefix(_inflections(words[0]))
+            stems[stem] = max(weight, stems.get(stem, weight))
+        # A stem that starts with another is found by that one's str.find already
+        for stem in sorted(stems, key=len):
+            if stem in stems:
+                for longer in [other for other in stems if other != stem and other.startswith(stem)]:
+                    stems[stem] = max(stems[stem], stems.pop(longer))
+        self.first_words = sorted(stems, key=lambda word: (-stems[word], word))
+    
+    def classify(self, subject: str, body: str = "") -> KeywordMatch:
+        """Keywords in the subject and the body, in order of first appearance, and their score"""
+        return self._score([list(self._matches(text.lower())) for text in (subject or "", body or "")])
+    
+    def is_claim(self, subject: str, body: str = "") -> bool:
+        """Whether subject + body score at least the threshold; stops at a keyword that does alone"""
+        hits = []
+        for text in (subject or "", body or ""):
+            text_hits = []
+            for hit in self._matches(text.lower()):
+                if self.weights[self._keyword(hit[1].group())] >= self.threshold:
+                    return True
+                text_hits.append(hit)
+            hits.append(text_hits)
+        if not any(hits):
+            return self.threshold <= 0
+        return self._score(hits).is_claim
+    
+    def _score(self, hits_per_text: List[List]) -> KeywordMatch:
+        """KeywordMatch of the (position, match) hits found in each text"""
+        matched = {}
+        for hits in hits_per_text:
+            end = 0
+            # Left to right, so a keyword inside a longer match ("claim" in "insurance claim") is skipped
+            for pos, match in sorted(hits, key=lambda hit: hit[0]):
+                if pos < end:
+                    continue
+                end = match.end()
+                keyword = self._keyword(match.group())
+                matched.setdefault(keyword, self.weights[keyword])
+        return KeywordMatch(list(matched), sum(matched.values(), 0.0), self.threshold)
+    
+    def _matches(self, text: str) -> Iterator:
+        """
+        (position, match) of the keywords in a lowercased text, first word by first word
+        
+        In an HTML text they are all found first and checked against the markup in order of
+        position, so the markup is searched in a single pass.
+        """
+        if "<" in text and _HTML_TAG.search(text):
+            markup = _MarkupTracker(text)
+            hits = sorted(self._find(text), key=lambda hit: hit[0])
+            yield from (hit for hit in hits if not markup.covers(hit[0]))
+        else:
+            yield from self._find(text)
+    
+    def _find(self, text: str) -> Iterator:
+        for word in self.first_words:
+            pos = text.find(word)
+            while pos != -1:
+                match = self.pattern.match(text, pos)
+                if match is not None:
+                    yield pos, match
+                pos = text.find(word, pos + 1)
+    
+    def _keyword(self, text: str) -> str:
+        """The keyword a match stands for: whitespace normalized, inflection removed"""
+        text = " ".join(text.split())
+        return self.forms.get(text, text)
+
+# Global classifier instance
+claim_classifier = ClaimKeywordClassifier()
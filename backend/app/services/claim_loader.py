@@ -0,0 +1,66 @@
+"""
+Eager loading of the claim aggregate (claim, initial email, documents, status history)
+"""
+
+from typing import List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session, Query, joinedload, selectinload, defer, with_expression
+
+from app.models.email_models import ClaimSubmission, DocumentAgentOCR
+
+# Characters of OCR text shown in claim detail
+OCR_PREVIEW_CHARS = 500
+
+def document_load_options(include_ocr: bool = False) -> list:
+    """
+    Loader options for DocumentAgentOCR: the big OCR columns only when asked for
+    
+    Without them, ocr_text_preview holds the first OCR_PREVIEW_CHARS + 1 characters
+    (the extra one tells whether the text was cut).
+    """
+    if include_ocr:
+        return []
+    return [
+        defer(DocumentAgentOCR.ocr_text),
+        defer(DocumentAgentOCR.structured_data),
+        defer(DocumentAgentOCR.image_description),
+        with_expression(
+            DocumentAgentOCR.ocr_text_preview,
+            func.substr(DocumentAgentOCR.ocr_text, 1, OCR_PREVIEW_CHARS + 1)
+        )
+    ]
+
+def load_claim_aggregate(db: Session, claim_id: int, include_ocr: bool = False) -> Optional[ClaimSubmission]:
+    """
+    Load a claim with its email, documents and status updates in two round-trips
+    
+    The email and status history are joined to the claim row; documents come from one
+    SELECT ... WHERE claim_submission_id IN (...).
+    """
+    return db.query(ClaimSubmission).options(
+        joinedload(ClaimSubmission.initial_email),
+        joinedload(ClaimSubmission.status_updates),
+        selectinload(ClaimSubmission.documents).options(*document_load_options(include_ocr))
+    ).filter(ClaimSubmission.id == claim_id).first()
+
+def document_query(db: Session, include_ocr: bool = True) -> Query:
+    """Base query for documents with the same column loading rules as the claim aggregate"""
+    return db.query(DocumentAgentOCR).options(*document_load_options(include_ocr))
+
+def load_claim_documents(db: Session, claim_id: int, include_ocr: bool = True) -> List[DocumentAgentOCR]:
+    """All documents of a claim, newest first, in one query"""
+    return document_query(db, include_ocr).filter(
+        DocumentAgentOCR.claim_submission_id == claim_id
+    ).order_by(DocumentAgentOCR.uploaded_at.desc()).all()
+
+def load_document(db: Session, document_id: int, include_ocr: bool = True) -> Optional[DocumentAgentOCR]:
+    """One document by ID"""
+    return document_query(db, include_ocr).filter(DocumentAgentOCR.id == document_id).first()
+
+def ocr_preview(document: DocumentAgentOCR) -> Optional[str]:
+    """First OCR_PREVIEW_CHARS characters of the OCR text, with "..." when it was longer"""
+    # Read a loaded ocr_text from __dict__ so a deferred one is not fetched row by row
+    text = document.ocr_text_preview if document.ocr_text_preview is not None else document.__dict__.get("ocr_text")
+    if text and len(text) > OCR_PREVIEW_CHARS:
+        return text[:OCR_PREVIEW_CHARS] + "..."
+    return text
@@ -0,0 +1,308 @@
+"""
+Local claim triage model
+Scores emails that passed the keyword check before they reach Gemini: TF-IDF features of the
+subject and the start of the body and a logistic regression, in pure Python (the model is a
+JSON file of feature weights). Emails it is confident are not claims (newsletters, receipts)
+are stored but not sent to the LLM; uncertain and likely claims go on as before.
+Train and evaluate it with train_claim_triage.py.
+"""
+
+import os
+import re
+import json
+import math
+import random
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.email_models import Email, ClaimSubmission
+
+DEFAULT_MODEL_PATH = str(Path(__file__).resolve().parents[1] / "data" / "claim_triage_model.json")
+MODEL_VERSION = 1
+
+# (subject, body, label) with label 1 for a claim, 0 for anything else
+Example = Tuple[str, str, int]
+
+_MARKUP = re.compile(r"<(style|script)\b.*?</\1\s*>|<[^>]*>|&#?\w+;", re.IGNORECASE | re.DOTALL)
+_WORD = re.compile(r"[^\W\d_]{2,}")
+
+def tokenize(subject: str, body: str, max_chars: int = 2000) -> Counter:
+    """Feature counts: subject words (prefixed), words and word pairs of the first max_chars of the body"""
+    body = (body or "")[:max_chars]
+    if "<" in body:
+        body = _MARKUP.sub(" ", body)
+    subject_words = _WORD.findall((subject or "").lower())
+    words = _WORD.findall(body.lower())
+    
+    features = Counter("s:" + word for word in subject_words)
+    features.update(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return features
+
+def _sigmoid(value: float) -> float:
+    if value < 0:
+        exp = math.exp(value)
+        return exp / (1.0 + exp)
+    return 1.0 / (1.0 + math.exp(-value))
+
+class ClaimTriageModel:
+    """TF-IDF + logistic regression over sparse feature dicts"""
+    
+    def __init__(self, idf: Dict[str, float], weights: Dict[str, float], bias: float = 0.0,
+                 max_chars: int = 2000, metadata: Optional[Dict[str, Any]] = None):
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.max_chars = max_chars
+        self.metadata = metadata or {}
+    
+    def vectorize(self, subject: str, body: str) -> Dict[str, float]:
+        """L2-normalized sublinear TF-IDF vector; features outside the vocabulary are dropped"""
+        vector = {}
+        for feature, count in tokenize(subject, body, self.max_chars).items():
+            idf = self.idf.get(feature)
+            if idf is not None:
+                vector[feature] = (1.0 + math.log(count)) * idf
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            for feature in vector:
+                vector[feature] /= norm
+        return vector
+    
+    def score(self, subject: str, body: str) -> float:
+        """Probability that the email is a claim"""
+        return self._score_vector(self.vectorize(subject, body))
+    
+    def _score_vector(self, vector: Dict[str, float]) -> float:
+        weights = self.weights
+        return _sigmoid(self.bias + sum(value * weights.get(feature, 0.0) for feature, value in vector.items()))
+    
+    @classmethod
+    def train(cls, examples: Sequence[Example], epochs: int = 30, learning_rate: float = 0.5,
+              l2: float = 1e-4, min_df: int = 2, max_features: int = 20000, max_chars: int = 2000,
+              seed: int = 13) -> "ClaimTriageModel":
+        """
+        Fit the vocabulary, IDF and weights
+        
+        Args:
+            examples: (subject, body, label) with label 1 for claims
+            epochs: passes of stochastic gradient descent over the examples
+            learning_rate: initial step, decayed per epoch
+            l2: L2 regularization of the weights
+            min_df: features in fewer documents are dropped
+            max_features: most frequent features kept
+            max_chars: body characters read per email
+        
+        Returns:
+            The trained model
+        """
+        if not examples:
+            raise ValueError("No training examples")
+        
+        token_counts = [tokenize(subject, body, max_chars) for subject, body, _ in examples]
+        labels = [1 if label else 0 for _, _, label in examples]
+        
+        document_frequency = Counter()
+        for counts in token_counts:
+            document_frequency.update(counts.keys())
+        vocabulary = [feature for feature, df in document_frequency.most_common(max_features) if df >= min_df]
+        documents = len(examples)
+        idf = {feature: math.log((1 + documents) / (1 + document_frequency[feature])) + 1.0 for feature in vocabulary}
+        
+        model = cls(idf, {}, 0.0, max_chars)
+        vectors = []
+        for counts in token_counts:
+            vector = {feature: (1.0 + math.log(count)) * idf[feature] for feature, count in counts.items() if feature in idf}
+            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+            vectors.append({feature: value / norm for feature, value in vector.items()})
+        
+        # Balanced class weights: claims are usually the minority of what the keywords let through
+        positives = sum(labels)
+        negatives = documents - positives
+        class_weight = {
+            1: documents / (2.0 * positives) if positives else 1.0,
+            0: documents / (2.0 * negatives) if negatives else 1.0,
+        }
+        
+        weights = model.weights
+        order = list(range(documents))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            step = learning_rate / (1.0 + epoch * 0.2)
+            for i in order:
+                vector, label = vectors[i], labels[i]
+                error = (model._score_vector(vector) - label) * class_weight[label]
+                model.bias -= step * error
+                for feature, value in vector.items():
+                    weight = weights.get(feature, 0.0)
+                    weights[feature] = weight - step * (error * value + l2 * weight)
+        
+        model.metadata = {
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "examples": documents,
+            "claims": positives,
+        }
+        return model
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": MODEL_VERSION,
+            "bias": self.bias,
+            "max_chars": self.max_chars,
+            "metadata": self.metadata,
+            # feature: [idf, weight]
+            "features": {feature: [round(idf, 6), round(self.weights.get(feature, 0.0), 6)]
+                         for feature, idf in self.idf.items()},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClaimTriageModel":
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"Unsupported claim triage model version: {data.get('version')}")
+        features = data["features"]
+        return cls(
+            idf={feature: values[0] for feature, values in features.items()},
+            weights={feature: values[1] for feature, values in features.items() if values[1]},
+            bias=data["bias"],
+            max_chars=data.get("max_chars", 2000),
+            metadata=data.get("metadata", {}),
+        )
+    
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "ClaimTriageModel":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def evaluate(model: ClaimTriageModel, examples: Sequence[Example], skip_below: float) -> Dict[str, Any]:
+    """How many emails the triage keeps from the LLM at a threshold, and how many claims it loses"""
+    scored = [(model.score(subject, body), label) for subject, body, label in examples]
+    claims = [score for score, label in scored if label]
+    others = [score for score, label in scored if not label]
+    scores = claims + others
+    
+    claims_skipped = sum(1 for score in claims if score < skip_below)
+    others_skipped = sum(1 for score in others if score < skip_below)
+    predicted = [score >= 0.5 for score in scores]
+    actual = [True] * len(claims) + [False] * len(others)
+    true_positives = sum(1 for p, a in zip(predicted, actual) if p and a)
+    
+    return {
+        "examples": len(scores),
+        "claims": len(claims),
+        "skip_below": skip_below,
+        "llm_calls": len(scores) - claims_skipped - others_skipped,
+        "non_claims_skipped": others_skipped,
+        "non_claims_skipped_rate": round(others_skipped / len(others), 4) if others else 0.0,
+        "claims_skipped": claims_skipped,
+        "claim_recall": round(1 - claims_skipped / len(claims), 4) if claims else 1.0,
+        "accuracy": round(sum(1 for p, a in zip(predicted, actual) if p == a) / len(scores), 4) if scores else 0.0,
+        "precision": round(true_positives / sum(predicted), 4) if any(predicted) else 0.0,
+    }
+
+def load_training_examples(db: Session) -> List[Example]:
+    """
+    Labeled emails from the EMAILS table
+    
+    An email is labeled by is_claim when the LLM (or an analyst) recorded it. Older emails that
+    went through claim processing (is_first_notification set) count as claims when their thread
+    has a claim an analyst moved past PENDING. Anything else is left out.
+    """
+    handled_threads = {
+        thread_id for (thread_id,) in db.query(Email.thread_id)
+        .join(ClaimSubmission, ClaimSubmission.email_id == Email.id)
+        .filter(ClaimSubmission.status.isnot(None), ClaimSubmission.status != "PENDING")
+        .distinct()
+    }
+    
+    examples = []
+    rows = db.query(Email.subject, Email.body_text, Email.body_html, Email.is_claim,
+                    Email.is_first_notification, Email.thread_id).yield_per(500)
+    for subject, body_text, body_html, is_claim, is_first_notification, thread_id in rows:
+        if is_claim is not None:
+            label = int(is_claim)
+        elif is_first_notification is not None and thread_id in handled_threads:
+            label = 1
+        else:
+            continue
+        examples.append((subject or "", body_text or body_html or "", label))
+    return examples
+
+class ClaimTriage:
+    """The triage gate: loads the model once and decides which emails go to the LLM"""
+    
+    def __init__(self, model_path: Optional[str] = None):
+        self.enabled = os.getenv("CLAIM_TRIAGE_ENABLED", "true").lower() == "true"
+        self.model_path = model_path or os.getenv("CLAIM_TRIAGE_MODEL_PATH") or DEFAULT_MODEL_PATH
+        # Only emails the model is this sure are not claims skip the LLM
+        self.skip_below = float(os.getenv("CLAIM_TRIAGE_SKIP_BELOW", "0.1"))
+        
+        self.model = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._counters = {"scored": 0, "skipped": 0}
+    
+    def get_model(self) -> Optional[ClaimTriageModel]:
+        """The trained model, or None when there is none (every email then goes to the LLM)"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self.model = ClaimTriageModel.load(self.model_path)
+                        print(f"✅ Claim triage model loaded: {self.model.metadata}")
+                    except FileNotFoundError:
+                        print(f"ℹ️ No claim triage model at {self.model_path}, all keyword matches go to the LLM")
+                    except Exception as e:
+                        print(f"⚠️ Could not load claim triage model: {e}")
+                    self._loaded = True
+        return self.model
+    
+    def reload(self):
+        """Pick up a newly trained model"""
+        with self._lock:
+            self.model = None
+            self._loaded = False
+    
+    def should_process(self, email_data: Dict) -> bool:
+        """
+        Whether an email that matched the claim keywords goes on to the LLM
+        
+        The score, if any, is stored in email_data['triage_score'] for the EMAILS row.
+        """
+        model = self.get_model() if self.enabled else None
+        if model is None:
+            return True
+        
+        score = model.score(email_data.get("subject", ""), email_data.get("body_text") or email_data.get("body_html", ""))
+        email_data["triage_score"] = score
+        skip = score < self.skip_below
+        with self._lock:
+            self._counters["scored"] += 1
+            self._counters["skipped"] += skip
+        
+        if skip:
+            print(f"🗑️ Triage: not a claim ({score:.2f}), skipping LLM: {email_data.get('subject', 'No subject')}")
+        return not skip
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["enabled"] = self.enabled
+        stats["model_loaded"] = self.model is not None
+        stats["skip_below"] = self.skip_below
+        return stats
+
+# Global triage instance
+claim_triage = ClaimTriage()
@@ -0,0 +1,212 @@
+"""
+Materialized dashboard statistics
+Full recompute with aggregate SQL, incremental deltas applied after each write commits, bounded staleness
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from sqlalchemy import func, case, event, update
+from sqlalchemy.orm import Session
+
+from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, DashboardStats
+
+# Claim status -> DASHBOARD_STATS counter column
+STATUS_COLUMNS = {
+    "PENDING": "pending_claims",
+    "UNDER_REVIEW": "under_review_claims",
+    "APPROVED": "approved_claims",
+    "REJECTED": "rejected_claims",
+    "CLOSED": "closed_claims"
+}
+
+# Session.info key of the deltas waiting for their transaction to commit
+PENDING_DELTAS_KEY = "dashboard_stats_deltas"
+
+class DashboardStatsService:
+    """Keeps the single DASHBOARD_STATS row in sync with claims, emails and documents"""
+    
+    def __init__(self):
+        # Deltas keep the row current; a periodic full recompute bounds any drift
+        self.max_age_seconds = int(os.getenv("DASHBOARD_STATS_MAX_AGE_SECONDS", "300"))
+    
+    def get_snapshot(self, db: Session) -> Dict[str, Any]:
+        """Dashboard payload from the materialized row, recomputed first if missing or too old"""
+        stats = db.query(DashboardStats).order_by(DashboardStats.id).first()
+        
+        computed_at = stats.computed_at if stats else None
+        if computed_at is not None and computed_at.tzinfo is not None:
+            computed_at = computed_at.replace(tzinfo=None)
+        if computed_at is None or datetime.now() - computed_at > timedelta(seconds=self.max_age_seconds):
+            stats = self.recompute(db)
+        
+        return self.to_dict(stats)
+    
+    def recompute(self, db: Session) -> DashboardStats:
+        """Rebuild the row from the source tables with aggregate queries"""
+        status_rows = db.query(
+            ClaimSubmission.status,
+            func.count(ClaimSubmission.id),
+            func.coalesce(func.sum(ClaimSubmission.estimated_amount), 0.0)
+        ).group_by(ClaimSubmission.status).all()
+        
+        total_emails, processed_emails = db.query(
+            func.count(Email.id),
+            func.coalesce(func.sum(case((Email.is_processed == True, 1), else_=0)), 0)
+        ).one()
+        
+        total_documents = db.query(func.count(DocumentAgentOCR.id)).scalar()
+        
+        stats = db.query(DashboardStats).order_by(DashboardStats.id).first()
+        if not stats:
+            stats = DashboardStats()
+            db.add(stats)
+        else:
+            # Older code could leave several rows behind; keep only this one
+            db.query(DashboardStats).filter(DashboardStats.id != stats.id).delete(synchronize_session=False)
+        
+        for column in STATUS_COLUMNS.values():
+            setattr(stats, column, 0)
+        stats.total_claims = 0
+        stats.total_amount_requested = 0.0
+        stats.total_amount_approved = 0.0
+        
+        for status, count, amount in status_rows:
+            stats.total_claims += count
+            stats.total_amount_requested += float(amount)
+            column = STATUS_COLUMNS.get(status)
+            if column:
+                setattr(stats, column, count)
+            if status == "APPROVED":
+                stats.total_amount_approved = float(amount)
+        
+        stats.total_emails = total_emails
+        stats.processed_emails = int(processed_emails)
+        stats.total_documents = total_documents
+        
+        now = datetime.now()
+        stats.last_updated = now
+        stats.computed_at = now
+        db.commit()
+        db.refresh(stats)
+        
+        print(f"📊 Dashboard stats recomputed: {stats.total_claims} claims, {total_emails} emails, {total_documents} documents")
+        return stats
+    
+    def on_claim_created(self, db: Session, status: str = "PENDING", amount: Optional[float] = None):
+        """Count a new claim (call before the commit that inserts it)"""
+        deltas = {"total_claims": 1, "total_amount_requested": amount or 0.0}
+        if status in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[status]] = 1
+        if status == "APPROVED":
+            deltas["total_amount_approved"] = amount or 0.0
+        self._apply(db, deltas)
+    
+    def on_claim_status_changed(self, db: Session, old_status: Optional[str], new_status: str,
+                                amount: Optional[float] = None):
+        """Move a claim between status counters"""
+        if old_status == new_status:
+            return
+        
+        deltas = {}
+        if old_status in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[old_status]] = -1
+        if new_status in STATUS_COLUMNS:
+            deltas[STATUS_COLUMNS[new_status]] = 1
+        if old_status == "APPROVED":
+            deltas["total_amount_approved"] = -(amount or 0.0)
+        if new_status == "APPROVED":
+            deltas["total_amount_approved"] = amount or 0.0
+        self._apply(db, deltas)
+    
+    def on_email_created(self, db: Session, processed: bool = False):
+        """Count a newly stored email"""
+        self._apply(db, {"total_emails": 1, "processed_emails": 1 if processed else 0})
+    
+    def on_email_processed(self, db: Session):
+        """Count an email that moved to processed"""
+        self._apply(db, {"processed_emails": 1})
+    
+    def on_document_created(self, db: Session, count: int = 1):
+        """Count newly stored documents"""
+        self._apply(db, {"total_documents": count})
+    
+    def to_dict(self, stats: DashboardStats) -> Dict[str, Any]:
+        """Shape of GET /api/analyst/dashboard/stats"""
+        breakdown = {status: getattr(stats, column) or 0 for status, column in STATUS_COLUMNS.items()}
+        total_claims = stats.total_claims or 0
+        total_emails = stats.total_emails or 0
+        processed_emails = stats.processed_emails or 0
+        
+        return {
+            "claims_summary": {
+                "total_claims": total_claims,
+                "pending_claims": breakdown["PENDING"],
+                "approved_claims": breakdown["APPROVED"],
+                "rejected_claims": breakdown["REJECTED"],
+                "closed_claims": breakdown["CLOSED"],
+                "status_breakdown": breakdown
+            },
+            "financial_summary": {
+                "total_amount_requested": float(stats.total_amount_requested or 0),
+                "total_amount_approved": float(stats.total_amount_approved or 0),
+                "approval_rate": round(breakdown["APPROVED"] / total_claims * 100, 1) if total_claims else 0
+            },
+            "processing_summary": {
+                "total_emails": total_emails,
+                "processed_emails": processed_emails,
+                "unprocessed_emails": total_emails - processed_emails,
+                "total_documents": stats.total_documents or 0
+            },
+            "last_updated": stats.last_updated.isoformat() if stats.last_updated else datetime.now().isoformat(),
+            "computed_at": stats.computed_at.isoformat() if stats.computed_at else None
+        }
+    
+    def _apply(self, db: Session, deltas: Dict[str, float]):
+        """
+        Queue deltas on the caller's session; they are added to the counters once it commits
+        
+        Every write path would otherwise UPDATE the single row inside its own transaction and
+        hold that row's lock until it commits, serializing the workers. Deltas of a
+        transaction that rolls back are dropped.
+        """
+        pending = db.info.setdefault(PENDING_DELTAS_KEY, {})
+        for column, delta in deltas.items():
+            if delta:
+                pending[column] = pending.get(column, 0) + delta
+    
+    def flush_pending(self, db: Session):
+        """
+        Add a committed transaction's deltas to the counters with a single short UPDATE
+        
+        Nothing is written if the row does not exist yet; the next read recomputes it.
+        Failures are logged and swallowed so stats never break the write they belong to.
+        """
+        deltas = db.info.pop(PENDING_DELTAS_KEY, None)
+        if not deltas:
+            return
+        
+        values = {
+            getattr(DashboardStats, column): func.coalesce(getattr(DashboardStats, column), 0) + delta
+            for column, delta in deltas.items()
+        }
+        values[DashboardStats.last_updated] = datetime.now()
+        
+        try:
+            # The session's transaction is over; the UPDATE gets a transaction of its own
+            with db.get_bind().begin() as conn:
+                conn.execute(update(DashboardStats).values(values))
+        except Exception as e:
+            print(f"⚠️ Error updating dashboard stats: {e}")
+
+# Global dashboard stats instance
+dashboard_stats = DashboardStatsService()
+
+def _drop_pending_deltas(session: Session, transaction):
+    # Whatever is still queued when the outermost transaction ends was rolled back
+    if transaction.parent is None:
+        session.info.pop(PENDING_DELTAS_KEY, None)
+
+# On the Session class, so sessions of every sessionmaker (API, workers, scripts) apply their deltas
+event.listen(Session, "after_commit", dashboard_stats.flush_pending)
+event.listen(Session, "after_transaction_end", _drop_pending_deltas)
\ No newline at end of file
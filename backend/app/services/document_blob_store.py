@@ -0,0 +1,92 @@
+"""
+Content-addressed store of document blobs
+Identical files (same SHA-256) share one DOCUMENT_BLOBS row: the first copy is uploaded and
+read by Gemini, later copies link to it and reuse its storage location and OCR result
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.email_models import DocumentBlob, DocumentAgentOCR
+
+def find_blobs(db: Session, hashes: List[str]) -> Dict[str, DocumentBlob]:
+    """Existing blobs by content hash"""
+    hashes = [h for h in set(hashes) if h]
+    if not hashes:
+        return {}
+    blobs = db.query(DocumentBlob).filter(DocumentBlob.content_sha256.in_(hashes)).all()
+    return {blob.content_sha256: blob for blob in blobs}
+
+def find_blob(db: Session, sha256: Optional[str]) -> Optional[DocumentBlob]:
+    """The blob for a content hash, if that content was seen before"""
+    return find_blobs(db, [sha256]).get(sha256) if sha256 else None
+
+def get_or_create_blob(db: Session, sha256: str, file_size: int, mime_type: Optional[str] = None) -> DocumentBlob:
+    """The blob for a content hash, created if needed (safe against a concurrent insert of the same hash)"""
+    blob = find_blob(db, sha256)
+    if blob:
+        return blob
+    
+    blob = DocumentBlob(content_sha256=sha256, file_size=file_size, mime_type=mime_type)
+    savepoint = db.begin_nested()
+    try:
+        db.add(blob)
+        db.flush()
+        savepoint.commit()
+        return blob
+    except IntegrityError:
+        savepoint.rollback()
+        return find_blob(db, sha256)
+
+def record_storage(blob: DocumentBlob, storage: Optional[Dict[str, Any]]):
+    """Remember where the first copy was uploaded"""
+    if storage and not blob.storage_path:
+        blob.storage_url = storage.get("storage_url")
+        blob.storage_path = storage.get("storage_path")
+
+def ocr_failed(ocr_result: Optional[Dict[str, Any]]) -> bool:
+    """Whether an OCR result is missing or EnhancedOCRService's placeholder for a failed call"""
+    if not ocr_result:
+        return True
+    if ocr_result.get("processing_failed"):
+        return True
+    # Placeholders stored before they were flagged
+    return ocr_result.get("extracted_text") == "Processing failed" and not ocr_result.get("confidence")
+
+def reusable_ocr(blob: Optional[DocumentBlob]) -> Optional[Dict[str, Any]]:
+    """The blob's OCR result if it can replace another Gemini call; None when the content must be read"""
+    if blob is None or ocr_failed(blob.ocr_result):
+        return None
+    return blob.ocr_result
+
+def record_ocr(blob: DocumentBlob, ocr_result: Optional[Dict[str, Any]], document_type: Optional[str] = None):
+    """
+    Remember the first successful OCR result of the content
+    
+    A failed result is never stored (and one stored earlier is replaced), so the next copy of
+    the file is read again instead of reusing the failure.
+    """
+    if not ocr_failed(ocr_result) and ocr_failed(blob.ocr_result):
+        blob.ocr_result = ocr_result
+        blob.ocr_document_type = document_type
+        blob.ocr_processed_at = datetime.now()
+
+def ocr_fields(ocr_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """DocumentAgentOCR columns filled from an EnhancedOCRService result"""
+    if ocr_failed(ocr_result):
+        return {"is_processed": False}
+    return {
+        "is_processed": True,
+        "processed_at": datetime.now(),
+        "ocr_text": ocr_result.get("extracted_text", ""),
+        "structured_data": json.dumps(ocr_result.get("structured_data", {})),
+        "inferred_costs": ocr_result.get("key_information", {}).get("total_amount", "")
+    }
+
+def link_document(document: DocumentAgentOCR, blob: DocumentBlob):
+    """Point a document record at its blob"""
+    document.content_sha256 = blob.content_sha256
+    document.blob = blob
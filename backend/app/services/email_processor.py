@@ -13,101 +13,92 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 import sqlalchemy.orm as orm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR
 from app.services.llm_service import LLMService
 from app.services.gmail_service import GmailService
+from app.services.gmail_sync_service import GmailSyncService
 from app.services.storage_service import StorageService
+from app.services.attachment_pipeline import AttachmentPipeline
+from app.services.document_blob_store import find_blobs, get_or_create_blob, record_storage, reusable_ocr, record_ocr, ocr_fields, link_document
+from app.services.dashboard_stats_service import dashboard_stats
+from app.services.claim_classifier import claim_classifier
+from app.services.claim_triage import claim_triage
+
+# Allowed values for the enum-like fields of the single-pass claim extraction
+NOTIFICATION_TYPES = ["FIRST", "FOLLOW_UP"]
+CLAIM_PRIORITIES = ["LOW", "NORMAL", "HIGH", "URGENT"]
+SENTIMENT_LABELS = ["POSITIVE", "NEGATIVE", "NEUTRAL"]
+CLAIM_RECOMMENDATIONS = ["CLOSE_CASE", "REQUEST_MORE_DOCS", "APPROVE", "REJECT"]
+
+def _parse_llm_json(response: str) -> Dict:
+    """Parse a JSON object from an LLM response, tolerating markdown fences and surrounding text"""
+    start = response.find('{')
+    end = response.rfind('}') + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON object in LLM response")
+    return json.loads(response[start:end])
 
 class EmailProcessor:
     """Service for processing claim notification emails"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, llm_service: Optional[LLMService] = None,
+                 gmail_service: Optional[GmailService] = None,
+                 storage_service: Optional[StorageService] = None,
+                 single_pass: Optional[bool] = None):
         self.db = db
-        self.llm_service = LLMService()
-        self.gmail_service = GmailService()
-        self.storage_service = StorageService()
+        self.llm_service = llm_service or LLMService()
+        self.gmail_service = gmail_service or GmailService()
+        self.gmail_sync = GmailSyncService(self.gmail_service)
+        self.storage_service = storage_service or StorageService()
+        self.attachment_pipeline = AttachmentPipeline(self.gmail_service, self.storage_service)
+        
+        # One LLM round-trip per email (classification + extraction + summary) instead of three
+        if single_pass is None:
+            single_pass = os.getenv("LLM_SINGLE_PASS_EXTRACTION", "true").lower() == "true"
+        self.single_pass = single_pass
         
-        # Keywords for claim notification subjects
-        self.claim_keywords = [
-            "claim notification",
-            "claim submission", 
-            "claim report",
-            "insurance claim",
-            "trip cancellation",
-            "trip delay",
-            "trip interruption",
-            "travel claim",
-            "flight cancellation",
-            "hotel cancellation",
-            "travel insurance claim"
-        ]
+        # Keywords for claim notifications (shared with EmailScheduler)
+        self.classifier = claim_classifier
+        self.claim_keywords = self.classifier.keywords
     
     def is_claim_notification(self, subject: str, body: str) -> bool:
         """Check if email is a claim notification"""
-        subject_lower = subject.lower()
-        body_lower = body.lower()
-        
-        # Check subject keywords
-        for keyword in self.claim_keywords:
-            if keyword in subject_lower:
-                return True
-        
-        # Check body keywords
-        for keyword in self.claim_keywords:
-            if keyword in body_lower:
-                return True
-        
-        return False
+        return self.classifier.is_claim(subject, body)
     
     def check_new_emails(self) -> List[Dict]:
         """Check for new emails and process claim notifications"""
         try:
             print("📧 Checking for new emails...")
             
-            # Get recent emails from Gmail
-            emails = self.gmail_service.get_recent_emails(max_results=20)
+            # Get only the emails added since the last checkpoint (already-stored ones are filtered out)
+            emails, history_id = self.gmail_sync.fetch_new_emails(self.db, is_candidate=self.is_claim_notification)
             processed_emails = []
             
             for email_data in emails:
-                gmail_id = email_data['id']
-                thread_id = email_data['threadId']
-                
-                # Check if email already processed
-                existing_email = self.db.query(Email).filter(Email.gmail_id == gmail_id).first()
-                if existing_email:
-                    continue
-                
                 # Extract email content
                 subject = email_data.get('subject', '')
                 from_email = email_data.get('from', '')
-                to_email = email_data.get('to', '')
                 body_text = email_data.get('body_text', '')
-                body_html = email_data.get('body_html', '')
                 
                 # Check if it's a claim notification
                 if self.is_claim_notification(subject, body_text):
-                    print(f"📋 Found claim notification: {subject}")
+                    # Obvious non-claims are stored, but not sent to the LLM
+                    if not claim_triage.should_process(email_data):
+                        self.claim_email(email_data, mark_processed=True)
+                        continue
                     
-                    # Save email to database
-                    email_record = Email(
-                        gmail_id=gmail_id,
-                        thread_id=thread_id,
-                        from_email=from_email,
-                        to_email=to_email,
-                        subject=subject,
-                        body_text=body_text,
-                        body_html=body_html,
-                        received_at=datetime.now()
-                    )
+                    print(f"📋 Found claim notification: {subject}")
                     
-                    self.db.add(email_record)
-                    self.db.commit()
-                    self.db.refresh(email_record)
+                    # Save email to database (skipped if another worker already claimed it)
+                    email_record = self.claim_email(email_data)
+                    if not email_record:
+                        continue
                     
                     # Process the email
-                    self.process_claim_email(email_record)
+                    self.process_claim_email(email_record, payload=email_data.get('payload'))
                     
                     processed_emails.append({
                         'id': email_record.id,
@@ -116,6 +107,8 @@ class EmailProcessor:
                         'processed': True
                     })
             
+            self.gmail_sync.save_checkpoint(self.db, history_id)
+            
             print(f"✅ Processed {len(processed_emails)} claim notifications")
             return processed_emails
             
@@ -123,34 +116,87 @@ class EmailProcessor:
             print(f"❌ Error checking emails: {e}")
             return []
     
-    def process_claim_email(self, email_record: Email):
-        """Process a claim notification email"""
+    def claim_email(self, email_data: Dict, mark_processed: bool = False) -> Optional[Email]:
+        """
+        Insert the email row for a Gmail message, using the unique gmail_id as a lock
+        
+        Returns:
+            The new Email record, or None if the message was already claimed
+        """
+        now = datetime.now()
+        email_record = Email(
+            gmail_id=email_data['id'],
+            thread_id=email_data['threadId'],
+            from_email=email_data.get('from', ''),
+            to_email=email_data.get('to', ''),
+            subject=email_data.get('subject', ''),
+            body_text=email_data.get('body_text', ''),
+            body_html=email_data.get('body_html', ''),
+            received_at=now,
+            is_processed=mark_processed,
+            processed_at=now if mark_processed else None,
+            triage_score=email_data.get('triage_score')
+        )
+        
+        try:
+            self.db.add(email_record)
+            self.db.flush()
+        except IntegrityError:
+            self.db.rollback()
+            return None
+        
+        dashboard_stats.on_email_created(self.db, processed=mark_processed)
+        self.db.commit()
+        self.db.refresh(email_record)
+        return email_record
+    
+    def process_claim_email(self, email_record: Email, payload: Optional[Dict] = None):
+        """Process a claim notification email (payload: already fetched Gmail payload, if any)"""
         try:
             print(f"🔍 Processing email ID: {email_record.id}")
             
-            # Check if this is the first notification in the thread
-            is_first = self.check_if_first_notification(email_record)
+            analysis = None
+            if self.single_pass:
+                # Classification, extraction and summary in a single LLM call
+                analysis = self.analyze_claim_email(email_record)
+                is_first = analysis['notification_type'] == 'FIRST'
+            else:
+                # Check if this is the first notification in the thread
+                is_first = self.check_if_first_notification(email_record)
+            if analysis is not None:
+                # The LLM's verdict is also the triage model's training label
+                email_record.is_claim = analysis['is_claim']
+                if analysis['is_claim'] is False:
+                    # Got past the keywords and the triage but is no claim (newsletter, receipt,
+                    # marketing): no claim, no reply to the sender, no attachments
+                    print(f"🗑️ Not a claim according to the LLM: {email_record.subject}")
+                    self._mark_processed(email_record)
+                    return
             email_record.is_first_notification = is_first
             
             if is_first:
                 print("🆕 First notification detected - creating new claim")
-                self.create_claim_submission(email_record)
+                self.create_claim_submission(email_record, analysis)
                 self.send_initial_response(email_record)
             else:
                 print("📝 Follow-up email - updating existing claim")
                 self.process_follow_up_email(email_record)
             
             # Process attachments
-            self.process_email_attachments(email_record)
+            self.process_email_attachments(email_record, payload)
             
-            # Mark as processed
-            email_record.is_processed = True
-            email_record.processed_at = datetime.now()
-            self.db.commit()
+            self._mark_processed(email_record)
             
         except Exception as e:
             print(f"❌ Error processing email {email_record.id}: {e}")
     
+    def _mark_processed(self, email_record: Email):
+        if not email_record.is_processed:
+            dashboard_stats.on_email_processed(self.db)
+        email_record.is_processed = True
+        email_record.processed_at = datetime.now()
+        self.db.commit()
+    
     def check_if_first_notification(self, email_record: Email) -> bool:
         """Use LLM to determine if this is the first notification"""
         try:
@@ -186,11 +232,113 @@ class EmailProcessor:
             print(f"❌ Error checking if first notification: {e}")
             return True  # Default to first notification
     
-    def create_claim_submission(self, email_record: Email):
-        """Create a new claim submission from email"""
+    def analyze_claim_email(self, email_record: Email) -> Dict:
+        """
+        Classify, extract and summarize a claim email with one LLM call
+        
+        The response is validated field by field; anything missing or malformed falls back
+        to the same defaults the separate calls use, so a partial answer is still usable.
+        """
+        # Without earlier emails in the thread it can only be a first notification
+        has_previous = self.db.query(Email).filter(
+            Email.thread_id == email_record.thread_id,
+            Email.received_at < email_record.received_at
+        ).count() > 0
+        
+        prompt = f"""
+        Analyze this insurance claim email and return ONE JSON object.
+        
+        Email Subject: {email_record.subject}
+        Email Body: {email_record.body_text}
+        
+        Return JSON with these fields:
+        - is_claim: true if the email reports or follows up on an insurance claim, false for newsletters, receipts, marketing or other mail
+        - notification_type: "FIRST" if it reports a new incident/claim, "FOLLOW_UP" if it references or answers an existing claim
+        - customer_name: Full name of the claimant
+        - policy_number: Insurance policy number (if mentioned, else null)
+        - claim_type: Type of claim (Trip Cancellation, Trip Delay, Trip Interruption, etc.)
+        - incident_date: Date of the incident (YYYY-MM-DD format, else null)
+        - incident_description: Description of what happened
+        - estimated_amount: Estimated claim amount (number only, else null)
+        - priority: LOW, NORMAL, HIGH, or URGENT based on content
+        - sentiment_analysis: POSITIVE, NEGATIVE, or NEUTRAL based on customer tone
+        - risk_score: Number between 0.0 and 1.0 indicating claim risk (0=low risk, 1=high risk)
+        - summary: Brief summary of the claim
+        - recommendation: CLOSE_CASE, REQUEST_MORE_DOCS, APPROVE, or REJECT
+        
+        Return ONLY valid JSON, no additional text.
+        """
+        
+        raw = {}
+        try:
+            raw = _parse_llm_json(self.llm_service.analyze_text(prompt))
+            if not isinstance(raw, dict):
+                raw = {}
+        except Exception as e:
+            print(f"❌ Error in single-pass claim analysis, using fallbacks: {e}")
+        
+        analysis = self._validate_claim_analysis(raw, email_record)
+        if not has_previous:
+            analysis['notification_type'] = 'FIRST'
+        return analysis
+    
+    def _validate_claim_analysis(self, raw: Dict, email_record: Email) -> Dict:
+        """Validate the single-pass response against its schema with per-field fallbacks"""
+        def text_field(name, default):
+            value = raw.get(name)
+            return value.strip() if isinstance(value, str) and value.strip() else default
+        
+        def enum_field(name, allowed, default):
+            value = raw.get(name)
+            value = value.strip().upper() if isinstance(value, str) else None
+            return value if value in allowed else default
+        
+        def float_field(name, default, low=None, high=None):
+            try:
+                value = float(str(raw.get(name)).replace('$', '').replace(',', ''))
+            except (TypeError, ValueError):
+                return default
+            if low is not None:
+                value = max(low, min(high, value))
+            return value
+        
+        def bool_field(name):
+            value = raw.get(name)
+            if isinstance(value, str):
+                value = {"true": True, "false": False}.get(value.strip().lower())
+            return value if isinstance(value, bool) else None
+        
+        def date_field(name):
+            try:
+                return datetime.strptime(str(raw.get(name))[:10], "%Y-%m-%d")
+            except (TypeError, ValueError):
+                return None
+        
+        body = email_record.body_text or ''
+        
+        return {
+            'is_claim': bool_field('is_claim'),
+            'notification_type': enum_field('notification_type', NOTIFICATION_TYPES, 'FIRST'),
+            'customer_name': text_field('customer_name', 'Unknown'),
+            'policy_number': text_field('policy_number', None),
+            'claim_type': text_field('claim_type', 'General'),
+            'incident_date': date_field('incident_date'),
+            'incident_description': text_field('incident_description', body[:500]),
+            'estimated_amount': float_field('estimated_amount', None),
+            'priority': enum_field('priority', CLAIM_PRIORITIES, 'NORMAL'),
+            'sentiment_analysis': enum_field('sentiment_analysis', SENTIMENT_LABELS, 'NEUTRAL'),
+            'risk_score': float_field('risk_score', 0.5, 0.0, 1.0),
+            'summary': text_field('summary', 'Claim requires review'),
+            'recommendation': enum_field('recommendation', CLAIM_RECOMMENDATIONS, 'REQUEST_MORE_DOCS')
+        }
+    
+    def create_claim_submission(self, email_record: Email, analysis: Optional[Dict] = None):
+        """Create a new claim submission from email (analysis: single-pass result, if already available)"""
         try:
             # Extract claim details using LLM
-            claim_data = self.extract_claim_details(email_record)
+            claim_data = analysis or self._validate_claim_analysis(
+                self.extract_claim_details(email_record), email_record
+            )
             
             # Create claim submission
             claim_submission = ClaimSubmission(
@@ -206,17 +354,25 @@ class EmailProcessor:
                 priority=claim_data.get('priority', 'NORMAL'),
                 sentiment_analysis=claim_data.get('sentiment_analysis', 'NEUTRAL'),
                 risk_score=claim_data.get('risk_score', 0.5),
-                priority_level=claim_data.get('priority', 'NORMAL').lower()
+                priority_level=claim_data['priority'].lower()
             )
             
             self.db.add(claim_submission)
+            self.db.flush()
+            dashboard_stats.on_claim_created(self.db, claim_submission.status, claim_submission.estimated_amount)
             self.db.commit()
             self.db.refresh(claim_submission)
             
             print(f"✅ Created claim submission: {claim_submission.claim_number}")
             
-            # Generate LLM summary
-            self.generate_claim_summary(claim_submission)
+            if analysis:
+                # Summary and recommendation came with the single-pass analysis
+                claim_submission.llm_summary = analysis['summary']
+                claim_submission.llm_recommendation = analysis['recommendation']
+                self.db.commit()
+            else:
+                # Generate LLM summary
+                self.generate_claim_summary(claim_submission)
             
         except Exception as e:
             print(f"❌ Error creating claim submission: {e}")
@@ -375,37 +531,81 @@ class EmailProcessor:
         except Exception as e:
             print(f"❌ Error processing follow-up email: {e}")
     
-    def process_email_attachments(self, email_record: Email):
-        """Process attachments from email"""
+    def process_email_attachments(self, email_record: Email, payload: Optional[Dict] = None):
+        """Store and OCR the attachments of an email, committing its documents in one batch"""
         try:
-            # Get attachments from Gmail
-            attachments = self.gmail_service.get_email_attachments(email_record.gmail_id)
-            
-            for attachment in attachments:
-                # Upload to storage
-                storage_url = self.storage_service.upload_file(
-                    attachment['data'],
-                    attachment['filename'],
-                    f"email-{email_record.id}",
-                    "email-attachments",
-                    attachment['mime_type']
-                )
+            claim_submission = self.get_claim_for_email(email_record)
+            if not claim_submission:
+                print(f"⚠️ No claim found for email {email_record.id}, skipping attachments")
+                return
+            
+            if payload is None:
+                message = self.gmail_service.get_email_details(email_record.gmail_id)
+                payload = message['payload'] if message else {}
+            
+            results = self.attachment_pipeline.process(
+                email_record.gmail_id, payload, claim_submission.claim_number, self._known_blobs
+            )
+            if not results:
+                return
+            
+            blobs = {}
+            documents = []
+            for result in results:
+                blob = blobs.get(result['sha256'])
+                if blob is None:
+                    blob = get_or_create_blob(self.db, result['sha256'], result['size'], result['mime_type'])
+                    record_storage(blob, result['storage'])
+                    record_ocr(blob, result['ocr_result'], "OTHER")
+                    blobs[result['sha256']] = blob
                 
-                if storage_url:
-                    # Create document record
-                    doc_record = DocumentAgentOCR(
-                        email_id=email_record.id,
-                        original_filename=attachment['filename'],
-                        file_type=attachment['mime_type'],
-                        file_size=len(attachment['data']),
-                        storage_url=storage_url,
-                        storage_path=f"documentos/email-{email_record.id}/email-attachments/{attachment['filename']}"
-                    )
-                    
-                    self.db.add(doc_record)
-                    self.db.commit()
-                    
-                    print(f"✅ Processed attachment: {attachment['filename']}")
-                    
+                # Not uploaded (storage disabled or failed): keep the OCR output under a Gmail path
+                storage_path = blob.storage_path or f"gmail/{email_record.gmail_id}/{result['filename']}"
+                document = DocumentAgentOCR(
+                    claim_submission_id=claim_submission.id,
+                    email_id=email_record.id,
+                    original_filename=result['filename'],
+                    file_type=result['mime_type'],
+                    file_size=result['size'],
+                    storage_url=blob.storage_url or storage_path,
+                    storage_path=storage_path,
+                    **ocr_fields(blob.ocr_result)
+                )
+                link_document(document, blob)
+                documents.append(document)
+            
+            self.db.add_all(documents)
+            self.db.flush()
+            dashboard_stats.on_document_created(self.db, len(documents))
+            self.db.commit()
+            
+            print(f"✅ Stored {len(documents)} attachments for claim {claim_submission.claim_number}")
+            
         except Exception as e:
-            print(f"❌ Error processing attachments: {e}") 
\ No newline at end of file
+            self.db.rollback()
+            print(f"❌ Error processing attachments: {e}")
+    
+    def _known_blobs(self, hashes: List[str]) -> Dict[str, Dict]:
+        """Storage and OCR result of contents seen before (runs on the pipeline's fetch thread)"""
+        with Session(bind=self.db.get_bind()) as db:
+            return {
+                sha256: {
+                    "storage": {"storage_url": blob.storage_url, "storage_path": blob.storage_path} if blob.storage_path else None,
+                    "ocr_result": reusable_ocr(blob)
+                }
+                for sha256, blob in find_blobs(db, hashes).items()
+            }
+    
+    def get_claim_for_email(self, email_record: Email) -> Optional[ClaimSubmission]:
+        """The claim an email created or, for a follow-up, the first claim of its thread"""
+        claim_submission = self.db.query(ClaimSubmission).filter(
+            ClaimSubmission.email_id == email_record.id
+        ).first()
+        if claim_submission:
+            return claim_submission
+        
+        return self.db.query(ClaimSubmission).join(
+            Email, ClaimSubmission.email_id == Email.id
+        ).filter(
+            Email.thread_id == email_record.thread_id
+        ).order_by(ClaimSubmission.created_at).first() 
\ No newline at end of file
@@ -3,17 +3,25 @@ Email Scheduler Service - Automatically processes emails every minute
 """
 
 import asyncio
+import os
 import schedule
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
 from app.services.email_processor import EmailProcessor
 from app.services.gmail_service import GmailService
-from app.models.email_models import Email, ClaimSubmission, DashboardStats
+from app.services.gmail_sync_service import GmailSyncService
+from app.services.llm_service import LLMService
+from app.services.gemini_client import deadline as gemini_deadline
+from app.services.storage_service import StorageService
+from app.services.claim_classifier import claim_classifier
+from app.services.claim_triage import claim_triage
+from app.models.email_models import Email, ClaimSubmission
 
 class EmailScheduler:
     """Service to automatically process emails every minute"""
@@ -22,14 +30,20 @@ class EmailScheduler:
         self.is_running = False
         self.thread = None
         self.gmail_service = GmailService()
+        self.gmail_sync = GmailSyncService(self.gmail_service)
         
-        # Keywords to detect claim emails
-        self.claim_keywords = [
-            "claim", "insurance", "trip cancellation", "flight delay", "hotel problem",
-            "travel insurance", "medical claim", "accident", "cancellation", "delay", 
-            "interruption", "loss", "damage", "injury", "illness", "emergency",
-            "compensation", "reimbursement", "coverage", "policy"
-        ]
+        # Worker pool for claim emails
+        self.max_workers = int(os.getenv("EMAIL_WORKER_CONCURRENCY", "4"))
+        self.executor = None
+        self._tick_lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._llm_service = None
+        # Time budget for all Gemini calls of one email, retries and rate-limit waits included
+        self.email_deadline = float(os.getenv("EMAIL_PROCESSING_DEADLINE_SECONDS", "300"))
+        
+        # Keywords to detect claim emails (shared with EmailProcessor)
+        self.classifier = claim_classifier
+        self.claim_keywords = self.classifier.keywords
     
     def start_scheduler(self):
         """Start automatic email processing"""
@@ -61,6 +75,10 @@ class EmailScheduler:
         if self.thread:
             self.thread.join(timeout=5)
         
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        
         print("✅ Email Scheduler stopped")
     
     def _run_scheduler(self):
@@ -71,89 +89,133 @@ class EmailScheduler:
     
     def process_new_emails(self):
         """Process new claim emails"""
+        # A slow tick must not overlap with the next one
+        if not self._tick_lock.acquire(blocking=False):
+            print("⏭️ Previous email check still running - skipping this tick")
+            return
+        
+        db = None
         try:
             print(f"📧 [{datetime.now().strftime('%H:%M:%S')}] Checking for new emails...")
             
             db = SessionLocal()
-            processor = EmailProcessor(db)
             
-            # Get recent emails from Gmail
-            recent_emails = self.gmail_service.get_recent_emails(max_results=10)
+            # Get only the emails added since the last checkpoint (already-stored ones are filtered out)
+            new_emails, history_id = self.gmail_sync.fetch_new_emails(db, is_candidate=self._is_claim_email)
             
             processed_count = 0
             claims_created = 0
             
-            for email_data in recent_emails:
-                gmail_id = email_data['id']
+            claim_emails = []
+            skipped_emails = []
+            for email_data in new_emails:
                 subject = email_data.get('subject', '').lower()
                 body = email_data.get('body_text', '').lower()
                 
-                # Check if already processed - CRITICAL: Prevent duplicate processing
-                existing_email = db.query(Email).filter(Email.gmail_id == gmail_id).first()
-                if existing_email:
-                    print(f"⏭️ Skipping already processed email: {gmail_id} - {email_data.get('subject', 'No subject')}")
-                    continue
-                
                 # Check if it's a claim email
                 if self._is_claim_email(subject, body):
+                    # The local triage model keeps obvious non-claims away from the LLM
+                    if not claim_triage.should_process(email_data):
+                        skipped_emails.append(email_data)
+                        continue
                     print(f"📋 Claim email detected: {email_data.get('subject', 'No subject')}")
-                    
-                    try:
-                        # Process the email
-                        result = self._process_claim_email(email_data, db, processor)
-                        if result:
-                            processed_count += 1
-                            if result.get('claim_created'):
-                                claims_created += 1
-                    except Exception as e:
-                        print(f"❌ Error processing email {gmail_id}: {e}")
+                    claim_emails.append(email_data)
+            
+            # Skipped emails are still stored (with their triage score) for review and retraining
+            if skipped_emails:
+                processor = self._get_processor(db)
+                for email_data in skipped_emails:
+                    processor.claim_email(email_data, mark_processed=True)
+            
+            # Process claim emails concurrently, each task with its own session
+            executor = self._get_executor()
+            futures = {
+                executor.submit(self._process_claim_email_task, email_data): email_data['id']
+                for email_data in claim_emails
+            }
             
-            # Update statistics
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                    if result:
+                        processed_count += 1
+                        if result.get('claim_created'):
+                            claims_created += 1
+                except Exception as e:
+                    print(f"❌ Error processing email {futures[future]}: {e}")
+            
+            # Dashboard stats are updated by the processor as emails and claims are written
             if processed_count > 0:
-                self._update_dashboard_stats(db, processed_count, claims_created)
                 print(f"✅ Processed {processed_count} emails, {claims_created} claims created")
             
-            db.close()
+            # Advance the Gmail checkpoint only after this batch has been handled
+            self.gmail_sync.save_checkpoint(db, history_id)
             
         except Exception as e:
             print(f"❌ Error in automatic processing: {e}")
+        finally:
+            if db is not None:
+                db.close()
+            self._tick_lock.release()
     
-    def _is_claim_email(self, subject: str, body: str) -> bool:
-        """Determine if an email is a claim based on keywords"""
-        text = f"{subject} {body}".lower()
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Worker pool for claim emails, created on first use"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="email-worker"
+            )
+        return self.executor
+    
+    def _get_processor(self, db: Session) -> EmailProcessor:
+        """Build an EmailProcessor for a worker thread
+        
+        The LLM client is shared; Gmail and storage clients are not thread-safe, so each
+        worker thread keeps its own.
+        """
+        if self._llm_service is None:
+            self._llm_service = LLMService()
         
-        # Check keywords
-        for keyword in self.claim_keywords:
-            if keyword in text:
-                return True
+        local = self._thread_local
+        if not hasattr(local, 'gmail_service'):
+            local.gmail_service = GmailService()
+            local.storage_service = StorageService()
         
-        return False
+        return EmailProcessor(
+            db,
+            llm_service=self._llm_service,
+            gmail_service=local.gmail_service,
+            storage_service=local.storage_service
+        )
+    
+    def _process_claim_email_task(self, email_data: Dict) -> Optional[Dict]:
+        """Worker entry point: process one claim email in its own database session"""
+        db = SessionLocal()
+        try:
+            processor = self._get_processor(db)
+            with gemini_deadline(self.email_deadline):
+                return self._process_claim_email(email_data, db, processor)
+        finally:
+            db.close()
     
-    def _process_claim_email(self, email_data: Dict, db: Session, processor: EmailProcessor) -> Dict:
+    def _is_claim_email(self, subject: str, body: str) -> bool:
+        """Determine if an email is a claim based on keywords"""
+        return self.classifier.is_claim(subject, body)
+    
+    def _process_claim_email(self, email_data: Dict, db: Session, processor: EmailProcessor) -> Optional[Dict]:
         """Process a specific claim email"""
         try:
-            # Create email record and mark as processed immediately to prevent duplicates
-            email_record = Email(
-                gmail_id=email_data['id'],
-                thread_id=email_data['threadId'],
-                from_email=email_data.get('from', ''),
-                to_email=email_data.get('to', ''),
-                subject=email_data.get('subject', ''),
-                body_text=email_data.get('body_text', ''),
-                body_html=email_data.get('body_html', ''),
-                received_at=datetime.now(),
-                is_processed=True,  # Mark as processed immediately
-                processed_at=datetime.now()
-            )
-            
-            db.add(email_record)
-            db.commit()
-            db.refresh(email_record)
+            # Claim the gmail_id by inserting the email row; the unique constraint
+            # guarantees only one worker (or process) ever gets to process it
+            email_record = processor.claim_email(email_data, mark_processed=True)
+            if not email_record:
+                print(f"⏭️ Skipping already processed email: {email_data['id']} - {email_data.get('subject', 'No subject')}")
+                return None
             
             print(f"📝 Email marked as processed: {email_data['id']}")
             
-            # Process with the processor
-            processor.process_claim_email(email_record)
+            # Process with the processor (reusing the fetched payload for attachments)
+            processor.process_claim_email(email_record, payload=email_data.get('payload'))
             
             # Check if a claim was created
             claim_created = db.query(ClaimSubmission).filter(
@@ -169,41 +231,6 @@ class EmailScheduler:
             print(f"❌ Error processing email: {e}")
             db.rollback()
             return None
-    
-    def _update_dashboard_stats(self, db: Session, emails_processed: int, claims_created: int):
-        """Update dashboard statistics - only unique claims"""
-        try:
-            stats = db.query(DashboardStats).first()
-            if not stats:
-                stats = DashboardStats(
-                    total_claims=0,
-                    pending_claims=0,
-                    approved_claims=0,
-                    rejected_claims=0,
-                    closed_claims=0,
-                    total_amount_requested=0.0,
-                    total_amount_approved=0.0,
-                    last_updated=datetime.now()
-                )
-                db.add(stats)
-            
-            # Only update if new claims were created (not just emails processed)
-            if claims_created > 0:
-                # Handle None values safely
-                current_total = stats.total_claims or 0
-                current_pending = stats.pending_claims or 0
-                
-                stats.total_claims = current_total + claims_created
-                stats.pending_claims = current_pending + claims_created
-                stats.last_updated = datetime.now()
-                
-                print(f"📊 Updated dashboard stats: {claims_created} new unique claims")
-            
-            db.commit()
-            
-        except Exception as e:
-            print(f"❌ Error updating statistics: {e}")
-            db.rollback()
 
 # Global scheduler instance
 email_scheduler = EmailScheduler() 
\ No newline at end of file
@@ -6,15 +6,16 @@ Processes documents and extracts structured information
 
 import os
 import json
-import base64
 from typing import Dict, Any, List, Optional
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, guess_mime_type
+from app.services.pdf_ocr_service import pdf_ocr_service
 
 class EnhancedOCRService:
     """Service for enhanced document processing with Gemini AI"""
     
     def __init__(self):
         self.gemini_service = LLMService()
+        self.pdf_service = pdf_ocr_service
         
         # Supported document types
         self.supported_types = [
@@ -33,7 +34,8 @@ class EnhancedOCRService:
             "OTHER"
         ]
     
-    def process_document_with_gemini(self, image_data: bytes, filename: str, document_type: str = "OTHER") -> Dict[str, Any]:
+    def process_document_with_gemini(self, image_data: bytes, filename: str, document_type: str = "OTHER",
+                                     mime_type: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a document image using Gemini Vision API
         
@@ -41,20 +43,24 @@ class EnhancedOCRService:
             image_data: Raw image bytes
             filename: Original filename
             document_type: Type of document for context
+            mime_type: MIME type of the bytes (sniffed from their content if not given)
             
         Returns:
             Dictionary with extracted information
         """
         
         try:
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+            # PDFs: text layer read directly, only scanned pages go to Vision
+            if (mime_type or guess_mime_type(image_data)) == "application/pdf":
+                result = self._process_pdf(image_data, filename, document_type)
+                if result is not None:
+                    return result
             
             # Create prompt based on document type
             prompt = self._create_document_prompt(filename, document_type)
             
-            # Process with Gemini Vision
-            response = self.gemini_service.generate_text_with_image(prompt, image_base64)
+            # Process with Gemini Vision (raw bytes, no base64 copy)
+            response = self.gemini_service.generate_text_with_image_data(prompt, image_data, mime_type)
             
             # Parse the response
             extracted_data = self._parse_ocr_response(response, document_type)
@@ -65,11 +71,79 @@ class EnhancedOCRService:
             print(f"❌ Error in enhanced OCR processing: {e}")
             return self._get_default_ocr_result(filename, document_type)
     
-    def _create_document_prompt(self, filename: str, document_type: str) -> str:
+    def process_document_file(self, file_path: str, filename: str, document_type: str = "OTHER",
+                              mime_type: Optional[str] = None, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process a document stored on disk using Gemini Vision API
+        
+        Args:
+            file_path: Path of the spooled upload
+            filename: Original filename
+            document_type: Type of document for context
+            mime_type: MIME type of the file (sniffed from its content if not given)
+            sha256: Content hash computed while spooling, used as cache key
+            
+        Returns:
+            Dictionary with extracted information
+        """
+        
+        try:
+            if mime_type == "application/pdf" or (mime_type is None and self._is_pdf_file(file_path)):
+                with open(file_path, "rb") as f:
+                    result = self._process_pdf(f.read(), filename, document_type)
+                if result is not None:
+                    return result
+            
+            prompt = self._create_document_prompt(filename, document_type)
+            response = self.gemini_service.generate_text_with_image_file(prompt, file_path, mime_type, sha256)
+            return self._parse_ocr_response(response, document_type)
+            
+        except Exception as e:
+            print(f"❌ Error in enhanced OCR processing: {e}")
+            return self._get_default_ocr_result(filename, document_type)
+    
+    def process_document_text(self, text: str, filename: str, document_type: str = "OTHER") -> Dict[str, Any]:
+        """Extract the same structured result from already extracted text (one text call, no Vision)"""
+        try:
+            prompt = self._create_document_prompt(filename, document_type, source="document text")
+            prompt += f"\n        DOCUMENT TEXT:\n{text}\n"
+            response = self.gemini_service.analyze_text(prompt)
+            result = self._parse_ocr_response(response, document_type)
+            # The text layer is exact; keep it rather than the model's copy
+            result["extracted_text"] = text
+            return result
+        except Exception as e:
+            print(f"❌ Error in document text analysis: {e}")
+            return self._get_default_ocr_result(filename, document_type)
+    
+    def _process_pdf(self, pdf_data: bytes, filename: str, document_type: str) -> Optional[Dict[str, Any]]:
+        """Page-wise PDF OCR; None when PDFs cannot be split here (then the whole PDF goes to Vision)"""
+        result = self.pdf_service.process(
+            pdf_data,
+            analyze_text=lambda text: self.process_document_text(text, filename, document_type),
+            analyze_image=lambda image, mime: self._process_image(image, filename, document_type, mime)
+        )
+        return self._validate_ocr_data(result, document_type) if result is not None else None
+    
+    def _process_image(self, image_data: bytes, filename: str, document_type: str, mime_type: str) -> Dict[str, Any]:
+        """One Vision call for one image (a rendered PDF page)"""
+        try:
+            prompt = self._create_document_prompt(filename, document_type)
+            response = self.gemini_service.generate_text_with_image_data(prompt, image_data, mime_type)
+            return self._parse_ocr_response(response, document_type)
+        except Exception as e:
+            print(f"❌ Error in enhanced OCR processing: {e}")
+            return self._get_default_ocr_result(filename, document_type)
+    
+    def _is_pdf_file(self, file_path: str) -> bool:
+        with open(file_path, "rb") as f:
+            return f.read(4) == b"%PDF"
+    
+    def _create_document_prompt(self, filename: str, document_type: str, source: str = "document image") -> str:
         """Create a specific prompt based on document type"""
         
         base_prompt = f"""
-        Analyze this document image and extract all relevant information.
+        Analyze this {source} and extract all relevant information.
         
         FILENAME: {filename}
         DOCUMENT TYPE: {document_type}
@@ -254,7 +328,9 @@ class EnhancedOCRService:
                 "purpose": ""
             },
             "ocr_quality": "poor",
-            "processing_notes": f"Failed to process {filename}"
+            "processing_notes": f"Failed to process {filename}",
+            # Never stored as the content's OCR result (see document_blob_store.record_ocr)
+            "processing_failed": True
         }
     
     def get_document_summary(self, ocr_data: Dict[str, Any]) -> str:
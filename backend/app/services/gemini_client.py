@@ -0,0 +1,329 @@
+"""
+Shared, rate-limit-aware access to Gemini
+Every Gemini call in the process goes through one GeminiClient: token buckets keep requests and
+tokens per minute under the quota, semaphores cap calls in flight, 429/5xx answers are retried
+with jittered exponential backoff, and a deadline bounds the whole call including the waits
+
+This module only depends on the standard library so the legacy scripts can import it too.
+"""
+
+import os
+import time
+import random
+import asyncio
+import inspect
+import weakref
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# HTTP statuses worth retrying: quota exhausted, transient server errors and timeouts
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Gemini bills an inline image or PDF page at a fixed number of tokens
+IMAGE_TOKENS = 258
+
+# Absolute time.monotonic() by which the current call chain must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("gemini_deadline", default=None)
+
+class LLMServiceError(Exception):
+    """A Gemini call failed for good (after retries, on a non-retryable error, or past its deadline)"""
+    
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Bound every Gemini call made inside the block (on this thread/task) to finish within `seconds`
+    
+    Nested deadlines can only shorten the outer one.
+    """
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(current, new_deadline) if current is not None else new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one"""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+def estimate_tokens(contents: Any) -> int:
+    """Rough input size of a request: ~4 characters per token, fixed cost per image/blob"""
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) for part in contents) or 1
+    return IMAGE_TOKENS
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of an SDK (google.api_core) or httpx error, if it has one"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, LLMServiceError):
+        return error.retryable
+    return error_status(error) in RETRYABLE_STATUS or isinstance(error, (TimeoutError, ConnectionError))
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Delay the server asked for (Retry-After header), if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After")) if headers.get("Retry-After") else None
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Allows `rate_per_minute` units per minute with bursts up to one minute's worth"""
+    
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now and return how long to wait before using it (0 when available)"""
+        if self.capacity <= 0:
+            return 0.0
+        with self.lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    def refund(self, amount: float):
+        """Give back a reservation that was not used"""
+        if self.capacity <= 0:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+    
+    def debit(self, amount: float):
+        """Charge usage beyond the estimate (may leave the bucket in debt)"""
+        if self.capacity <= 0 or amount <= 0:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+
+class GeminiClient:
+    """Process-wide limiter and retry policy for Gemini calls"""
+    
+    def __init__(self):
+        # Per-minute quotas of the Gemini project; 0 disables a limit
+        self.requests_per_minute = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+        self.tokens_per_minute = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+        # Coroutines cost no thread while they wait, so async callers get a much higher cap
+        self.async_max_concurrency = int(os.getenv("GEMINI_ASYNC_MAX_CONCURRENCY", "256"))
+        self.max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+        self.backoff_base = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "1"))
+        self.backoff_max = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "32"))
+        # One attempt / one call including retries and waits, when no outer deadline is set
+        self.request_timeout = float(os.getenv("GEMINI_REQUEST_TIMEOUT_SECONDS", "60"))
+        self.call_deadline = float(os.getenv("GEMINI_DEADLINE_SECONDS", "180"))
+        
+        self.request_bucket = TokenBucket(self.requests_per_minute)
+        self.token_bucket = TokenBucket(self.tokens_per_minute)
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._loop_slots = weakref.WeakKeyDictionary()
+        
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "in_flight": 0, "throttled_seconds": 0.0}
+    
+    def generate_content(self, model, contents: Any, **kwargs) -> Any:
+        """model.generate_content(contents) under the shared limits; raises LLMServiceError"""
+        accepts_options = "request_options" in inspect.signature(model.generate_content).parameters
+        
+        def send(timeout: float):
+            if accepts_options:
+                return model.generate_content(contents, request_options={"timeout": timeout}, **kwargs)
+            return model.generate_content(contents, **kwargs)
+        
+        response = self.call(send, estimate_tokens(contents))
+        usage = getattr(response, "usage_metadata", None)
+        total_tokens = getattr(usage, "total_token_count", 0) if usage is not None else 0
+        if total_tokens:
+            self.token_bucket.debit(total_tokens - estimate_tokens(contents))
+        return response
+    
+    def wrap(self, model) -> "RateLimitedModel":
+        """A drop-in for a genai.GenerativeModel whose generate_content goes through this client"""
+        return RateLimitedModel(self, model)
+    
+    def call(self, send: Callable[[float], Any], tokens: int = 1) -> Any:
+        """
+        Run send(timeout) with rate limiting, retries and the current deadline
+        
+        Args:
+            send: makes one attempt; gets the seconds it may take
+            tokens: estimated tokens of the request, for the tokens-per-minute bucket
+        
+        Returns:
+            Whatever send returned
+        """
+        call_deadline = self._call_deadline()
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens, call_deadline)
+            started = time.monotonic()
+            if wait:
+                time.sleep(wait)
+            acquired = self.slots.acquire(timeout=max(0.0, call_deadline - time.monotonic()))
+            self._waited(started, acquired)
+            try:
+                with self._count("requests"):
+                    return send(self._attempt_timeout(call_deadline))
+            except Exception as e:
+                error = e
+            finally:
+                self.slots.release()
+            
+            delay = self._backoff(error, attempt, call_deadline)
+            attempt += 1
+            time.sleep(delay)
+    
+    async def acall(self, send: Callable[[float], Awaitable[Any]], tokens: int = 1) -> Any:
+        """
+        Async version of call() for coroutines: same quota, retries and deadline, but waiting
+        never blocks the event loop and up to GEMINI_ASYNC_MAX_CONCURRENCY calls can be in flight
+        """
+        slots = self._async_slots()
+        call_deadline = self._call_deadline()
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens, call_deadline)
+            started = time.monotonic()
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=max(0.001, call_deadline - time.monotonic()))
+                acquired = True
+            except asyncio.TimeoutError:
+                acquired = False
+            self._waited(started, acquired)
+            try:
+                with self._count("requests"):
+                    return await send(self._attempt_timeout(call_deadline))
+            except Exception as e:
+                error = e
+            finally:
+                slots.release()
+            
+            delay = self._backoff(error, attempt, call_deadline)
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    def _call_deadline(self) -> float:
+        call_deadline = _deadline.get()
+        return call_deadline if call_deadline is not None else time.monotonic() + self.call_deadline
+    
+    def _attempt_timeout(self, call_deadline: float) -> float:
+        return max(0.1, min(self.request_timeout, call_deadline - time.monotonic()))
+    
+    def _reserve(self, tokens: int, call_deadline: float) -> float:
+        """Reserve quota and return the wait before it can be used; gives it back if past the deadline"""
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(tokens))
+        if time.monotonic() + wait >= call_deadline:
+            self.request_bucket.refund(1)
+            self.token_bucket.refund(tokens)
+            self._bump("failures")
+            raise LLMServiceError("Gemini deadline exceeded waiting for rate limit quota", status=429, retryable=True)
+        return wait
+    
+    def _waited(self, started: float, acquired: bool):
+        self._bump("throttled_seconds", time.monotonic() - started)
+        if not acquired:
+            self._bump("failures")
+            raise LLMServiceError("Gemini deadline exceeded waiting for a free slot", retryable=True)
+    
+    def _backoff(self, error: Exception, attempt: int, call_deadline: float) -> float:
+        """Delay before retrying a failed attempt; raises LLMServiceError when it should not be retried"""
+        status = error_status(error)
+        if not is_retryable(error) or attempt >= self.max_retries:
+            self._bump("failures")
+            if isinstance(error, LLMServiceError):
+                raise error
+            raise LLMServiceError(f"Gemini call failed: {error}", status=status,
+                                  retryable=is_retryable(error)) from error
+        
+        # Full jitter: a random wait up to the exponential cap spreads out synchronized retries
+        delay = retry_after(error) or random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= call_deadline:
+            self._bump("failures")
+            raise LLMServiceError(f"Gemini deadline exceeded while retrying: {error}", status=status,
+                                  retryable=True) from error
+        
+        self._bump("retries")
+        print(f"🔄 Gemini returned {status or type(error).__name__}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+    
+    def _async_slots(self) -> asyncio.Semaphore:
+        """The async concurrency limit of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._stats_lock:
+            slots = self._loop_slots.get(loop)
+            if slots is None:
+                slots = self._loop_slots[loop] = asyncio.Semaphore(self.async_max_concurrency)
+            return slots
+    
+    @contextmanager
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+            self._stats["in_flight"] += 1
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._stats["in_flight"] -= 1
+    
+    def _bump(self, name: str, amount: float = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        stats.update({
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "max_concurrency": self.max_concurrency,
+            "async_max_concurrency": self.async_max_concurrency
+        })
+        return stats
+
+class RateLimitedModel:
+    """genai.GenerativeModel look-alike that routes generate_content through a GeminiClient"""
+    
+    def __init__(self, client: GeminiClient, model):
+        self.client = client
+        self.model = model
+    
+    def generate_content(self, contents, **kwargs):
+        return self.client.generate_content(self.model, contents, **kwargs)
+    
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+# Global Gemini client instance
+gemini_client = GeminiClient()
@@ -3,26 +3,60 @@ Gmail Service for reading and sending emails
 """
 
 import os
+import time
 import base64
+import random
 import email.message
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.errors import HttpError
 import json
 
+class GmailHistoryExpiredError(Exception):
+    """Raised when a stored Gmail historyId is too old to list changes from"""
+
+class GmailFetchError(Exception):
+    """Raised when some messages could not be fetched, even after retries"""
+    
+    def __init__(self, failed_ids: List[str], fetched):
+        super().__init__(f"{len(failed_ids)} Gmail messages could not be fetched")
+        self.failed_ids = failed_ids
+        # What was fetched anyway: messages by ID (get_messages_batch) or emails (get_candidate_emails)
+        self.fetched = fetched
+
 class GmailService:
     """Service for Gmail operations"""
     
-    def __init__(self):
+    def __init__(self, http=None, api_endpoint: Optional[str] = None):
         self.creds = None
         self.service = None
         # Don't setup immediately - do lazy loading
+        
+        # Pluggable transport: an httplib2.Http-compatible object and/or a base URL
+        # (e.g. a local fake Gmail server). Defaults to Google's endpoint with OAuth.
+        self.http = http
+        self.api_endpoint = api_endpoint or os.getenv("GMAIL_API_ENDPOINT")
+        
+        # Gmail accepts up to 100 calls per batch but recommends 50
+        self.batch_size = min(100, int(os.getenv("GMAIL_BATCH_SIZE", "50")))
+        # Messages that failed inside a batch (429, 5xx) are fetched again, with exponential backoff
+        self.batch_max_retries = int(os.getenv("GMAIL_BATCH_MAX_RETRIES", "3"))
+        self.batch_retry_delay = float(os.getenv("GMAIL_BATCH_RETRY_DELAY", "1.0"))
     
     def setup_gmail_service(self):
         """Setup Gmail API service"""
         try:
+            client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+            
+            # Injected transport: no OAuth token needed
+            if self.http is not None:
+                self.service = build('gmail', 'v1', http=self.http, client_options=client_options)
+                return
+            
             # Load token from environment variable
             token_json = os.getenv("GMAIL_TOKEN_JSON")
             if not token_json:
@@ -51,7 +85,7 @@ class GmailService:
                 creds.refresh(Request())
             
             self.creds = creds
-            self.service = build('gmail', 'v1', credentials=creds)
+            self.service = build('gmail', 'v1', credentials=creds, client_options=client_options)
             print("✅ Gmail service initialized successfully")
             
         except Exception as e:
@@ -86,6 +120,98 @@ class GmailService:
             print(f"❌ Error getting recent emails: {e}")
             return []
     
+    def get_current_history_id(self) -> Optional[str]:
+        """Get the mailbox's current historyId (starting point for incremental sync)"""
+        try:
+            if not self.service:
+                self.setup_gmail_service()
+            if not self.service:
+                return None
+            
+            profile = self.service.users().getProfile(userId='me').execute()
+            return str(profile['historyId'])
+        
+        except Exception as e:
+            print(f"❌ Error getting Gmail history ID: {e}")
+            return None
+    
+    def list_message_ids(self, max_results: int = 100) -> List[str]:
+        """List the IDs of the most recent messages, following pagination up to max_results"""
+        try:
+            if not self.service:
+                self.setup_gmail_service()
+            if not self.service:
+                return []
+            
+            message_ids = []
+            page_token = None
+            
+            while len(message_ids) < max_results:
+                results = self.service.users().messages().list(
+                    userId='me',
+                    maxResults=min(500, max_results - len(message_ids)),
+                    pageToken=page_token
+                ).execute()
+                
+                message_ids.extend(m['id'] for m in results.get('messages', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+            
+            return message_ids
+        
+        except Exception as e:
+            print(f"❌ Error listing messages: {e}")
+            return []
+    
+    def get_message_ids_since(self, start_history_id: str) -> Tuple[List[str], str]:
+        """
+        List IDs of messages added to the mailbox after start_history_id
+        
+        Returns:
+            (message_ids in arrival order without duplicates, latest historyId)
+        
+        Raises:
+            GmailHistoryExpiredError: if Gmail no longer keeps history that old
+        """
+        if not self.service:
+            self.setup_gmail_service()
+        if not self.service:
+            return [], start_history_id
+        
+        message_ids = []
+        seen = set()
+        latest_history_id = start_history_id
+        page_token = None
+        
+        while True:
+            try:
+                results = self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token
+                ).execute()
+            except HttpError as e:
+                # Gmail answers 404 when startHistoryId is outside the retained window
+                if e.resp.status == 404:
+                    raise GmailHistoryExpiredError(start_history_id) from e
+                raise
+            
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_id = added['message']['id']
+                    if message_id not in seen:
+                        seen.add(message_id)
+                        message_ids.append(message_id)
+            
+            latest_history_id = str(results.get('historyId', latest_history_id))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return message_ids, latest_history_id
+    
     def get_email_details(self, message_id: str) -> Optional[Dict]:
         """Get detailed email information"""
         try:
@@ -100,30 +226,167 @@ class GmailService:
                 format='full'
             ).execute()
             
-            headers = message['payload']['headers']
-            
-            # Extract headers
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-            from_email = next((h['value'] for h in headers if h['name'] == 'From'), '')
-            to_email = next((h['value'] for h in headers if h['name'] == 'To'), '')
-            
-            # Extract body
-            body_text = self.extract_email_body(message['payload'])
-            
-            return {
-                'id': message_id,
-                'threadId': message['threadId'],
-                'subject': subject,
-                'from': from_email,
-                'to': to_email,
-                'body_text': body_text,
-                'body_html': body_text  # Simplified for now
-            }
+            return self.parse_message(message)
             
         except Exception as e:
             print(f"❌ Error getting email details: {e}")
             return None
     
+    def parse_message(self, message: Dict) -> Dict:
+        """Convert a format='full' Gmail message resource into our email dict"""
+        headers = message['payload']['headers']
+        
+        # Extract headers
+        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+        from_email = next((h['value'] for h in headers if h['name'] == 'From'), '')
+        to_email = next((h['value'] for h in headers if h['name'] == 'To'), '')
+        
+        # Extract body
+        body_text = self.extract_email_body(message['payload'])
+        
+        return {
+            'id': message['id'],
+            'threadId': message['threadId'],
+            'subject': subject,
+            'from': from_email,
+            'to': to_email,
+            'body_text': body_text,
+            'body_html': body_text,  # Simplified for now
+            'snippet': message.get('snippet', ''),
+            'payload': message['payload']  # Kept so attachments don't need another fetch
+        }
+    
+    def get_messages_batch(self, message_ids: List[str], format: str = 'full',
+                           metadata_headers: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Fetch many messages with batched HTTP requests instead of one round-trip each
+        
+        Messages that fail (rate limits, server errors, a failed batch) are retried with backoff;
+        messages deleted since they were listed (404) are left out.
+        
+        Returns:
+            Dict of message_id -> Gmail message resource
+        
+        Raises:
+            GmailFetchError: if some messages still failed after the retries
+        """
+        if not message_ids:
+            return {}
+        if not self.service:
+            self.setup_gmail_service()
+        if not self.service:
+            raise GmailFetchError(list(message_ids), {})
+        
+        messages = {}
+        failed = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is None:
+                messages[request_id] = response
+            elif getattr(getattr(exception, 'resp', None), 'status', None) == 404:
+                print(f"⚠️ Message {request_id} no longer exists, skipping")
+            else:
+                failed[request_id] = exception
+        
+        pending = list(message_ids)
+        for attempt in range(self.batch_max_retries + 1):
+            if attempt:
+                delay = self.batch_retry_delay * 2 ** (attempt - 1) * random.uniform(1, 1.5)
+                print(f"🔄 Retrying {len(pending)} Gmail messages in {delay:.1f}s ({attempt}/{self.batch_max_retries})")
+                time.sleep(delay)
+            
+            failed.clear()
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                batch = self._new_batch(on_response)
+                for message_id in chunk:
+                    kwargs = {'userId': 'me', 'id': message_id, 'format': format}
+                    if metadata_headers:
+                        kwargs['metadataHeaders'] = metadata_headers
+                    batch.add(self.service.users().messages().get(**kwargs), request_id=message_id)
+                
+                try:
+                    batch.execute(http=self.http)
+                except Exception as e:
+                    print(f"❌ Error executing Gmail batch: {e}")
+                    for message_id in chunk:
+                        if message_id not in messages:
+                            failed.setdefault(message_id, e)
+            
+            pending = [message_id for message_id in pending if message_id in failed]
+            if not pending:
+                return messages
+        
+        for message_id in pending:
+            print(f"❌ Error fetching message {message_id}: {failed[message_id]}")
+        raise GmailFetchError(pending, messages)
+    
+    def get_candidate_emails(self, message_ids: List[str],
+                             is_candidate: Callable[[str, str], bool]) -> List[Dict]:
+        """
+        Fetch headers first and download full messages only for likely claims
+        
+        Args:
+            message_ids: Gmail message IDs, in the order results should be returned
+            is_candidate: filter called with (subject, snippet)
+        
+        Raises:
+            GmailFetchError: if some messages could not be fetched; the candidates that
+                were fetched are in its `fetched` list
+        """
+        failed_ids = []
+        try:
+            metadata = self.get_messages_batch(
+                message_ids,
+                format='metadata',
+                metadata_headers=['Subject', 'From', 'To']
+            )
+        except GmailFetchError as e:
+            metadata = e.fetched
+            failed_ids.extend(e.failed_ids)
+        
+        candidate_ids = []
+        for message_id in message_ids:
+            message = metadata.get(message_id)
+            if not message:
+                continue
+            
+            headers = message.get('payload', {}).get('headers', [])
+            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+            if is_candidate(subject, message.get('snippet', '')):
+                candidate_ids.append(message_id)
+        
+        print(f"📨 {len(candidate_ids)}/{len(message_ids)} messages passed the metadata filter")
+        
+        try:
+            full_messages = self.get_messages_batch(candidate_ids, format='full')
+        except GmailFetchError as e:
+            full_messages = e.fetched
+            failed_ids.extend(e.failed_ids)
+        
+        emails = []
+        for message_id in candidate_ids:
+            message = full_messages.get(message_id)
+            if not message:
+                continue
+            try:
+                emails.append(self.parse_message(message))
+            except Exception as e:
+                print(f"❌ Error parsing message {message_id}: {e}")
+        
+        if failed_ids:
+            raise GmailFetchError(failed_ids, emails)
+        return emails
+    
+    def _new_batch(self, callback) -> BatchHttpRequest:
+        """Create a batch request pointed at the configured endpoint"""
+        if self.api_endpoint:
+            return BatchHttpRequest(
+                callback=callback,
+                batch_uri=f"{self.api_endpoint.rstrip('/')}/batch/gmail/v1"
+            )
+        return self.service.new_batch_http_request(callback=callback)
+    
     def extract_email_body(self, payload: Dict) -> str:
         """Extract email body text"""
         try:
@@ -146,17 +409,21 @@ class GmailService:
             print(f"❌ Error extracting email body: {e}")
             return ""
     
-    def get_email_attachments(self, message_id: str) -> List[Dict]:
-        """Get attachments from email"""
+    def get_email_attachments(self, message_id: str, payload: Optional[Dict] = None) -> List[Dict]:
+        """Get attachments from email, reusing an already fetched payload when given"""
         try:
+            if not self.service:
+                self.setup_gmail_service()
             if not self.service:
                 return []
             
-            message = self.service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'
-            ).execute()
+            if payload is None:
+                message = self.service.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='full'
+                ).execute()
+                payload = message['payload']
             
             attachments = []
             
@@ -182,8 +449,8 @@ class GmailService:
                     if 'parts' in part:
                         process_parts(part['parts'])
             
-            if 'parts' in message['payload']:
-                process_parts(message['payload']['parts'])
+            if 'parts' in payload:
+                process_parts(payload['parts'])
             
             return attachments
             
@@ -191,6 +458,63 @@ class GmailService:
             print(f"❌ Error getting attachments: {e}")
             return []
     
+    def list_attachment_parts(self, payload: Dict) -> List[Dict]:
+        """Attachment parts of a message payload, without downloading anything"""
+        parts = []
+        
+        def walk(part_list):
+            for part in part_list:
+                body = part.get('body', {})
+                if part.get('filename') and (body.get('attachmentId') or body.get('data')):
+                    parts.append({
+                        'filename': part['filename'],
+                        'mime_type': part.get('mimeType', 'application/octet-stream'),
+                        'attachment_id': body.get('attachmentId'),
+                        'inline_data': body.get('data'),
+                        'size': body.get('size', 0)
+                    })
+                if 'parts' in part:
+                    walk(part['parts'])
+        
+        walk(payload.get('parts', []))
+        return parts
+    
+    def get_attachments_batch(self, message_id: str, attachment_ids: List[str]) -> Dict[str, bytes]:
+        """
+        Download several attachments of a message with batched HTTP requests
+        
+        Returns:
+            Dict of attachment_id -> decoded bytes (failed downloads are left out)
+        """
+        if not attachment_ids:
+            return {}
+        if not self.service:
+            self.setup_gmail_service()
+        if not self.service:
+            return {}
+        
+        data = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                print(f"❌ Error fetching attachment of message {message_id}: {exception}")
+                return
+            data[attachment_ids[int(request_id)]] = base64.urlsafe_b64decode(response['data'])
+        
+        for start in range(0, len(attachment_ids), self.batch_size):
+            batch = self._new_batch(on_response)
+            for index in range(start, min(start + self.batch_size, len(attachment_ids))):
+                # Attachment IDs are long; the batch only needs a short unique request ID
+                batch.add(self.service.users().messages().attachments().get(
+                    userId='me', messageId=message_id, id=attachment_ids[index]
+                ), request_id=str(index))
+            try:
+                batch.execute(http=self.http)
+            except Exception as e:
+                print(f"❌ Error executing Gmail attachment batch: {e}")
+        
+        return data
+    
     def send_email(self, to_email: str, subject: str, body: str) -> bool:
         """Send email via Gmail"""
         try:
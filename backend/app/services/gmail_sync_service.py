@@ -0,0 +1,126 @@
+"""
+Incremental Gmail sync based on history IDs
+"""
+
+import os
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Callable
+from sqlalchemy.orm import Session
+
+from app.models.email_models import Email, GmailSyncState
+from app.services.gmail_service import GmailService, GmailHistoryExpiredError, GmailFetchError
+
+class GmailSyncService:
+    """Fetches only the Gmail messages added since the last processed historyId"""
+    
+    def __init__(self, gmail_service: Optional[GmailService] = None, account: str = "me"):
+        self.gmail_service = gmail_service or GmailService()
+        self.account = account
+        self._full_sync_pending = False
+        
+        # How far back a full resync looks when there is no usable checkpoint
+        self.full_sync_max_results = int(os.getenv("GMAIL_FULL_SYNC_MAX_RESULTS", "100"))
+    
+    def fetch_new_emails(self, db: Session,
+                         is_candidate: Optional[Callable[[str, str], bool]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get the emails that arrived since the stored checkpoint and are not yet in the database
+        
+        Args:
+            db: Database session
+            is_candidate: optional (subject, snippet) filter; when given, only messages that
+                pass it on their metadata are downloaded in full
+        
+        Returns:
+            (email dicts in the same shape as GmailService.get_email_details,
+             historyId to pass to save_checkpoint once they have been processed; None when
+             some messages could not be fetched, so they are listed again next time)
+        """
+        state = self._get_state(db)
+        
+        message_ids = None
+        history_id = None
+        
+        if state and state.history_id:
+            try:
+                message_ids, history_id = self.gmail_service.get_message_ids_since(state.history_id)
+                print(f"📬 Incremental sync: {len(message_ids)} new messages since history {state.history_id}")
+            except GmailHistoryExpiredError:
+                print(f"⚠️ Gmail history {state.history_id} expired - running full resync")
+            except Exception as e:
+                print(f"❌ Error listing Gmail history: {e}")
+                return [], None
+        
+        if message_ids is None:
+            message_ids, history_id = self._full_resync_ids()
+        
+        new_ids = self._filter_known_ids(db, message_ids)
+        
+        try:
+            if is_candidate is not None:
+                emails = self.gmail_service.get_candidate_emails(new_ids, is_candidate)
+            else:
+                messages = self.gmail_service.get_messages_batch(new_ids, format='full')
+                emails = [self.gmail_service.parse_message(messages[i]) for i in new_ids if i in messages]
+        except GmailFetchError as e:
+            # Process what was fetched, but keep the checkpoint: the failed messages are listed
+            # again next time (the processed ones are then skipped as known)
+            print(f"⚠️ {len(e.failed_ids)} messages could not be fetched, Gmail checkpoint not advanced")
+            if is_candidate is not None:
+                emails = e.fetched
+            else:
+                emails = [self.gmail_service.parse_message(e.fetched[i]) for i in new_ids if i in e.fetched]
+            history_id = None
+        
+        return emails, history_id
+    
+    def save_checkpoint(self, db: Session, history_id: Optional[str]):
+        """Persist the historyId up to which the mailbox has been processed"""
+        if not history_id:
+            return
+        
+        try:
+            state = self._get_state(db)
+            if not state:
+                state = GmailSyncState(account=self.account)
+                db.add(state)
+            
+            state.history_id = history_id
+            if self._full_sync_pending:
+                state.last_full_sync_at = datetime.now()
+                self._full_sync_pending = False
+            
+            db.commit()
+        
+        except Exception as e:
+            print(f"❌ Error saving Gmail sync checkpoint: {e}")
+            db.rollback()
+    
+    def _full_resync_ids(self) -> Tuple[List[str], Optional[str]]:
+        """List recent message IDs, taking the historyId first so nothing falls between the two calls"""
+        history_id = self.gmail_service.get_current_history_id()
+        message_ids = self.gmail_service.list_message_ids(max_results=self.full_sync_max_results)
+        
+        # Oldest first, like the history API returns them
+        message_ids.reverse()
+        self._full_sync_pending = True
+        
+        print(f"🔄 Full resync: {len(message_ids)} recent messages, history {history_id}")
+        return message_ids, history_id
+    
+    def _filter_known_ids(self, db: Session, message_ids: List[str]) -> List[str]:
+        """Drop IDs that already have an Email row, using one query instead of one per message"""
+        if not message_ids:
+            return []
+        
+        known_ids = set()
+        for start in range(0, len(message_ids), 500):
+            chunk = message_ids[start:start + 500]
+            rows = db.query(Email.gmail_id).filter(Email.gmail_id.in_(chunk)).all()
+            known_ids.update(row[0] for row in rows)
+        
+        return [message_id for message_id in message_ids if message_id not in known_ids]
+    
+    def _get_state(self, db: Session) -> Optional[GmailSyncState]:
+        """Load the checkpoint row for this account"""
+        return db.query(GmailSyncState).filter(GmailSyncState.account == self.account).first()
@@ -0,0 +1,185 @@
+"""
+Content-addressed cache for LLM responses
+Two tiers: an in-process LRU and a persistent SQLite table, both with TTL
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "llm_cache.db")
+
+def make_cache_key(model_name: str, prompt: str, image_bytes: Optional[bytes] = None,
+                   image_sha256: Optional[str] = None) -> str:
+    """Hash of model name, prompt and (optional) image, given as bytes or as their sha256 hex digest"""
+    if image_sha256 is None and image_bytes is not None:
+        image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+    image_part = bytes.fromhex(image_sha256) if image_sha256 else b""
+    
+    digest = hashlib.sha256()
+    for part in (model_name.encode(), prompt.encode(), image_part):
+        # Length prefixes keep ("ab", "c") and ("a", "bc") apart
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+class LLMResponseCache:
+    """LRU in memory in front of a SQLite table, with TTL and size-based eviction"""
+    
+    def __init__(self, memory_entries: Optional[int] = None, db_path: Optional[str] = None,
+                 ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None):
+        self.memory_entries = memory_entries if memory_entries is not None else int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+        self.db_path = db_path if db_path is not None else os.getenv("LLM_CACHE_DB_PATH", DEFAULT_CACHE_DB_PATH)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        
+        if self.db_path:
+            self._init_db()
+    
+    @contextmanager
+    def _connect(self):
+        """A connection for one operation, committed (or rolled back) and always closed"""
+        # sqlite3's own context manager only ends the transaction; the connection stays open
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _init_db(self):
+        """Create the cache table, disabling the persistent tier if that fails"""
+        try:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used_at)")
+        except Exception as e:
+            print(f"⚠️ LLM cache persistent tier disabled: {e}")
+            self.db_path = None
+    
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for key, or None"""
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+        
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                    if row and row[1] > now:
+                        conn.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (now, key))
+                        with self._lock:
+                            self._counters["disk_hits"] += 1
+                            self._remember(key, row[0], row[1])
+                        return row[0]
+                    if row:
+                        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            except Exception as e:
+                print(f"⚠️ LLM cache read failed: {e}")
+        
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+    
+    def set(self, key: str, value: str):
+        """Store a response; empty responses are errors and are never cached"""
+        if not value:
+            return
+        
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._counters["writes"] += 1
+        
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used_at) VALUES (?, ?, ?, ?)",
+                        (key, value, expires_at, now)
+                    )
+                    self._evict_disk(conn, now)
+            except Exception as e:
+                print(f"⚠️ LLM cache write failed: {e}")
+    
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_cache")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        stats["persistent"] = bool(self.db_path)
+        return stats
+    
+    def _remember(self, key: str, value: str, expires_at: float):
+        """Put an entry in the LRU tier (caller holds the lock)"""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def _evict_disk(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then the least recently used ones above max_entries"""
+        evicted = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        
+        overflow = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            evicted += conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used_at LIMIT ?)",
+                (overflow,)
+            ).rowcount
+        
+        if evicted:
+            with self._lock:
+                self._counters["evictions"] += evicted
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide cache shared by every LLMService, or None when LLM_CACHE_ENABLED=false"""
+    global _llm_cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+        return _llm_cache
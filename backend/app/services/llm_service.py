@@ -4,52 +4,171 @@ LLM Service using Google Gemini API
 
 import os
 import json
+import hashlib
 import google.generativeai as genai
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from app.services.llm_cache import LLMResponseCache, get_llm_cache, make_cache_key
+from app.services.image_preprocessing import image_preprocessor
+from app.services.gemini_client import gemini_client, LLMServiceError
+from app.services.single_flight import llm_single_flight
+
+def sha256_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def guess_mime_type(data: bytes) -> str:
+    """MIME type of an image/PDF from its magic bytes (JPEG if unknown)"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"%PDF":
+        return "application/pdf"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+def response_text(response) -> str:
+    """Text of a Gemini response; a blocked or empty answer is an error, not an empty string"""
+    try:
+        return response.text.strip()
+    except ValueError as e:
+        raise LLMServiceError(f"Gemini returned no text: {e}") from e
 
 class LLMService:
-    """Service for LLM operations using Gemini"""
+    """
+    Service for LLM operations using Gemini
     
-    def __init__(self):
+    Calls go through the shared GeminiClient (rate limits, retries, deadline) and raise
+    LLMServiceError when Gemini cannot answer, instead of returning an empty string.
+    """
+    
+    _DEFAULT_CACHE = object()
+    
+    def __init__(self, cache: Optional[LLMResponseCache] = _DEFAULT_CACHE):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model_name = 'gemini-1.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        self.client = gemini_client
+        # Identical requests in flight at the same time share one Gemini call
+        self.flight = llm_single_flight
+        
+        # Any object with get(key)/set(key, value); None disables caching
+        self.cache = get_llm_cache() if cache is LLMService._DEFAULT_CACHE else cache
     
-    def analyze_text(self, prompt: str) -> str:
-        """Analyze text using Gemini"""
+    def analyze_text(self, prompt: str, use_cache: bool = True) -> str:
+        """Analyze text using Gemini; use_cache=False always calls Gemini and caches the new answer"""
+        cache_key = make_cache_key(self.model_name, prompt)
+        read_cache = self.cache if use_cache else None
+        if read_cache:
+            cached = read_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        def call():
+            # A call that just finished may have cached the answer while this one waited to lead
+            if read_cache:
+                cached = read_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            result = response_text(self.client.generate_content(self.model, prompt))
+            if self.cache:
+                self.cache.set(cache_key, result)
+            return result
+        
+        # A bypassing call must not join one that may answer from the cache
+        flight_key = cache_key if use_cache else f"{cache_key}:nocache"
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
+            return self.flight.do(flight_key, call)
+        except LLMServiceError as e:
             print(f"❌ Error in LLM analysis: {e}")
-            return ""
+            raise
     
-    def generate_text(self, prompt: str) -> str:
+    def generate_text(self, prompt: str, use_cache: bool = True) -> str:
         """Generate text using Gemini (alias for analyze_text)"""
-        return self.analyze_text(prompt)
+        return self.analyze_text(prompt, use_cache)
     
     def generate_text_with_image(self, prompt: str, image_base64: str) -> str:
         """Generate text from image using Gemini Vision API"""
         try:
             import base64
-            from PIL import Image
-            import io
             
-            # Decode base64 image
-            image_data = base64.b64decode(image_base64)
-            image = Image.open(io.BytesIO(image_data))
+            return self.generate_text_with_image_data(prompt, base64.b64decode(image_base64))
+        except LLMServiceError as e:
+            print(f"❌ Error in image analysis: {e}")
+            raise
+        except Exception as e:
+            print(f"❌ Error in image analysis: {e}")
+            raise LLMServiceError(f"Image analysis failed: {e}") from e
+    
+    def generate_text_with_image_file(self, prompt: str, file_path: str, mime_type: Optional[str] = None,
+                                      image_sha256: Optional[str] = None) -> str:
+        """Generate text from an image/PDF on disk; the file is read once, only on a cache miss"""
+        try:
+            if image_sha256 is None:
+                image_sha256 = sha256_file(file_path)
+            
+            cache_key = make_cache_key(self.model_name, prompt, image_sha256=image_sha256)
+            if self.cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            with open(file_path, "rb") as f:
+                image_data = f.read()
             
-            # Use Gemini Vision model
-            vision_model = genai.GenerativeModel('gemini-1.5-flash')
-            response = vision_model.generate_content([prompt, image])
+            return self._generate_with_blob(prompt, image_data, mime_type, cache_key)
+        except LLMServiceError as e:
+            print(f"❌ Error in image analysis: {e}")
+            raise
+        except Exception as e:
+            print(f"❌ Error in image analysis: {e}")
+            raise LLMServiceError(f"Image analysis failed: {e}") from e
+    
+    def generate_text_with_image_data(self, prompt: str, image_data: bytes, mime_type: Optional[str] = None) -> str:
+        """Generate text from raw image/PDF bytes using Gemini Vision API"""
+        try:
+            cache_key = make_cache_key(self.model_name, prompt, image_data)
+            if self.cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
-            return response.text.strip()
+            return self._generate_with_blob(prompt, image_data, mime_type, cache_key)
+        except LLMServiceError as e:
+            print(f"❌ Error in image analysis: {e}")
+            raise
         except Exception as e:
             print(f"❌ Error in image analysis: {e}")
-            return ""
+            raise LLMServiceError(f"Image analysis failed: {e}") from e
+    
+    def _generate_with_blob(self, prompt: str, image_data: bytes, mime_type: Optional[str], cache_key: str) -> str:
+        """Send the bytes as an inline blob and cache the answer; images are shrunk first, PDFs go as they are"""
+        def call():
+            if self.cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            blob_data, blob_mime_type = image_preprocessor.preprocess(image_data, mime_type or guess_mime_type(image_data))
+            blob = {"mime_type": blob_mime_type, "data": blob_data}
+            
+            result = response_text(self.client.generate_content(self.model, [prompt, blob]))
+            if self.cache:
+                self.cache.set(cache_key, result)
+            return result
+        
+        return self.flight.do(cache_key, call)
     
     def extract_structured_data(self, text: str, fields: list) -> Dict[str, Any]:
         """Extract structured data from text"""
@@ -0,0 +1,265 @@
+"""
+Background OCR job queue for uploaded documents
+Jobs live in the OCR_JOBS table; a worker pool runs them with a cap on concurrent Gemini calls
+"""
+
+import os
+import uuid
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, NamedTuple
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.email_models import DocumentAgentOCR, DocumentBlob, OCRJob
+from app.services.enhanced_ocr_service import EnhancedOCRService
+from app.services.dashboard_stats_service import dashboard_stats
+from app.services.document_blob_store import find_blob, get_or_create_blob, reusable_ocr, record_ocr, ocr_failed, ocr_fields, link_document
+
+DEFAULT_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "uploads")
+
+class UploadTooLargeError(Exception):
+    """Raised while spooling an upload bigger than the configured limit"""
+
+class SpooledUpload(NamedTuple):
+    """An upload copied to local disk"""
+    job_id: str
+    file_path: str
+    size: int
+    sha256: str
+
+class OCRJobQueue:
+    """Runs document OCR off the request path"""
+    
+    def __init__(self, ocr_service: Optional[EnhancedOCRService] = None):
+        self._ocr_service = ocr_service
+        self._ocr_service_lock = threading.Lock()
+        
+        # Uploaded files wait here until their job has run
+        self.upload_dir = os.getenv("OCR_UPLOAD_DIR", DEFAULT_UPLOAD_DIR)
+        self.max_upload_bytes = int(float(os.getenv("MAX_UPLOAD_SIZE_MB", "20")) * 1024 * 1024)
+        self.chunk_size = 1024 * 1024
+        
+        self.max_workers = int(os.getenv("OCR_WORKER_CONCURRENCY", "4"))
+        self.executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Workers can also wait on the database; only this many talk to Gemini at once
+        self.gemini_semaphore = threading.BoundedSemaphore(int(os.getenv("OCR_MAX_CONCURRENT_GEMINI_CALLS", "2")))
+    
+    async def spool_upload(self, upload, max_bytes: Optional[int] = None) -> SpooledUpload:
+        """
+        Copy an upload to the upload directory chunk by chunk, hashing it on the way
+        
+        Args:
+            upload: Starlette/FastAPI UploadFile (anything with an async read(size))
+            max_bytes: size limit, defaults to MAX_UPLOAD_SIZE_MB
+            
+        Raises:
+            UploadTooLargeError: as soon as the limit is exceeded (the partial file is removed)
+        """
+        if max_bytes is None:
+            max_bytes = self.max_upload_bytes
+        
+        os.makedirs(self.upload_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.upload_dir, job_id)
+        digest = hashlib.sha256()
+        size = 0
+        
+        try:
+            with open(file_path, "wb") as f:
+                while True:
+                    chunk = await upload.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLargeError(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+                    
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            os.remove(file_path)
+            raise
+        
+        return SpooledUpload(job_id=job_id, file_path=file_path, size=size, sha256=digest.hexdigest())
+    
+    def submit(self, db: Session, spooled: SpooledUpload, filename: str, content_type: str,
+               claim_id: int, document_type: str = "OTHER") -> OCRJob:
+        """Create a pending job for a spooled upload and schedule it"""
+        job_id = spooled.job_id
+        file_path = spooled.file_path
+        
+        job = OCRJob(
+            job_id=job_id,
+            claim_submission_id=claim_id,
+            original_filename=filename,
+            file_type=content_type or "application/octet-stream",
+            file_size=spooled.size,
+            content_sha256=spooled.sha256,
+            document_type=document_type,
+            file_path=file_path,
+            status="pending"
+        )
+        try:
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+        except Exception:
+            db.rollback()
+            os.remove(file_path)
+            raise
+        
+        self._get_executor().submit(self._run_job, job_id)
+        print(f"📥 Queued OCR job {job_id} for {filename}")
+        return job
+    
+    def requeue_unfinished(self) -> int:
+        """Reschedule jobs left pending or running by a previous process"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(OCRJob).filter(OCRJob.status.in_(["pending", "running"])).all()
+            for job in jobs:
+                job.status = "pending"
+            db.commit()
+            
+            for job in jobs:
+                self._get_executor().submit(self._run_job, job.job_id)
+            
+            if jobs:
+                print(f"🔄 Requeued {len(jobs)} unfinished OCR jobs")
+            return len(jobs)
+        
+        except Exception as e:
+            print(f"❌ Error requeuing OCR jobs: {e}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+    
+    def get_job(self, db: Session, job_id: str) -> Optional[OCRJob]:
+        """Look up a job by its public ID"""
+        return db.query(OCRJob).filter(OCRJob.job_id == job_id).first()
+    
+    def shutdown(self):
+        """Stop the worker pool; queued jobs stay pending and are requeued on next start"""
+        with self._executor_lock:
+            if self.executor:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Worker pool, created on first use"""
+        with self._executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="ocr-worker"
+                )
+            return self.executor
+    
+    def _get_ocr_service(self) -> EnhancedOCRService:
+        with self._ocr_service_lock:
+            if self._ocr_service is None:
+                self._ocr_service = EnhancedOCRService()
+            return self._ocr_service
+    
+    def _run_job(self, job_id: str):
+        """Worker entry point: run one job in its own database session"""
+        db = SessionLocal()
+        try:
+            # Claim the job; another worker (or a requeue) may already have it
+            claimed = db.query(OCRJob).filter(
+                OCRJob.job_id == job_id,
+                OCRJob.status == "pending"
+            ).update({"status": "running", "started_at": datetime.now()}, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return
+            
+            job = self.get_job(db, job_id)
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+            
+            try:
+                ocr_service = self._get_ocr_service()
+                
+                # The same file was read before (another upload or an email attachment)
+                blob = find_blob(db, job.content_sha256)
+                ocr_result = reusable_ocr(blob)
+                if ocr_result is not None:
+                    print(f"♻️ OCR job {job_id}: reusing the OCR result of identical content")
+                else:
+                    with self.gemini_semaphore:
+                        ocr_result = ocr_service.process_document_file(
+                            file_path=job.file_path,
+                            filename=job.original_filename,
+                            document_type=job.document_type,
+                            mime_type=job.file_type if job.file_type != "application/octet-stream" else None,
+                            sha256=job.content_sha256
+                        )
+                    # The OCR service answers a failed Gemini call with a placeholder instead of raising
+                    if ocr_failed(ocr_result):
+                        raise RuntimeError("OCR failed: the document could not be read")
+                    if job.content_sha256:
+                        blob = get_or_create_blob(db, job.content_sha256, job.file_size, job.file_type)
+                        record_ocr(blob, ocr_result, job.document_type)
+                
+                document = self._save_document(db, job, ocr_result, blob)
+                
+                job.document_id = document.id
+                job.result = {
+                    "ocr_result": ocr_result,
+                    "summary": ocr_service.get_document_summary(ocr_result)
+                }
+                job.status = "done"
+                job.finished_at = datetime.now()
+                db.commit()
+                
+                os.remove(job.file_path)
+                print(f"✅ OCR job {job_id} done (document {document.id})")
+            
+            except Exception as e:
+                db.rollback()
+                job = self.get_job(db, job_id)
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = datetime.now()
+                db.commit()
+                print(f"❌ OCR job {job_id} failed: {e}")
+        
+        except Exception as e:
+            print(f"❌ Error running OCR job {job_id}: {e}")
+        finally:
+            db.close()
+    
+    def _save_document(self, db: Session, job: OCRJob, ocr_result: Dict[str, Any],
+                       blob: Optional[DocumentBlob] = None) -> DocumentAgentOCR:
+        """Create the document record for a finished job"""
+        # Uploads are not sent to storage; an identical file already there is linked instead
+        storage_path = blob.storage_path if blob and blob.storage_path else f"uploaded/{job.original_filename}"
+        document = DocumentAgentOCR(
+            claim_submission_id=job.claim_submission_id,
+            original_filename=job.original_filename,
+            file_type=job.file_type,
+            file_size=job.file_size,
+            document_type=job.document_type,
+            storage_url=blob.storage_url if blob and blob.storage_url else storage_path,
+            storage_path=storage_path,
+            uploaded_at=job.created_at,
+            **ocr_fields(ocr_result)
+        )
+        if blob:
+            link_document(document, blob)
+        db.add(document)
+        db.flush()
+        dashboard_stats.on_document_created(db)
+        return document
+
+# Global OCR job queue instance
+ocr_job_queue = OCRJobQueue()
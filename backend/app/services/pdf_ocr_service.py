@@ -0,0 +1,145 @@
+"""
+PDF handling for document OCR
+Pages with an embedded text layer are read directly; only image-only pages are rasterized
+and sent to Gemini Vision, a few at a time, and the page results are merged into one
+"""
+
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+STRUCTURED_FIELDS = ["dates", "amounts", "names", "addresses", "phone_numbers",
+                     "email_addresses", "policy_numbers", "reference_numbers"]
+KEY_INFORMATION_FIELDS = ["total_amount", "date", "issuer", "recipient", "purpose"]
+QUALITY_ORDER = ["poor", "fair", "good"]
+
+class PdfOCRService:
+    """Splits a PDF into text-layer pages and scanned pages and OCRs only the latter"""
+    
+    def __init__(self):
+        # Fewer characters than this on a page means it is a scan (or a photo in a PDF)
+        self.min_text_chars = int(os.getenv("PDF_MIN_TEXT_CHARS", "40"))
+        self.raster_dpi = int(os.getenv("PDF_RASTER_DPI", "150"))
+        self.max_concurrency = int(os.getenv("PDF_OCR_MAX_CONCURRENCY", "3"))
+        self.max_ocr_pages = int(os.getenv("PDF_MAX_OCR_PAGES", "20"))
+    
+    @property
+    def available(self) -> bool:
+        """PyMuPDF is optional; without it PDFs go to Gemini whole"""
+        return pymupdf is not None
+    
+    def process(self, pdf_data: bytes, analyze_text: Callable[[str], Dict[str, Any]],
+                analyze_image: Callable[[bytes, str], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        OCR a PDF page by page
+        
+        Args:
+            pdf_data: the PDF file
+            analyze_text: turns text-layer text into an OCR result (one call for all text pages)
+            analyze_image: turns a rendered page (bytes, MIME type) into an OCR result
+        
+        Returns:
+            The merged OCR result, or None when the PDF cannot be split here
+        """
+        if not self.available:
+            return None
+        
+        try:
+            document = pymupdf.open(stream=pdf_data, filetype="pdf")
+        except Exception as e:
+            print(f"⚠️ Could not open PDF for page splitting: {e}")
+            return None
+        
+        with document:
+            page_texts = [page.get_text().strip() for page in document]
+            text_pages = [i for i, text in enumerate(page_texts) if len(text) >= self.min_text_chars]
+            scanned_pages = [i for i in range(len(page_texts)) if i not in text_pages]
+            skipped_pages = scanned_pages[self.max_ocr_pages:]
+            scanned_pages = scanned_pages[:self.max_ocr_pages]
+            
+            results: List[Tuple[List[int], Dict[str, Any]]] = []
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="pdf-ocr") as executor:
+                futures = []
+                if text_pages:
+                    text = "\n\n".join(page_texts[i] for i in text_pages)
+                    futures.append((text_pages, executor.submit(contextvars.copy_context().run, analyze_text, text)))
+                
+                # Rendering is not thread-safe: pages are rendered here, one by one, while
+                # earlier pages are already being read by Gemini (under the caller's deadline)
+                for i in scanned_pages:
+                    image = document[i].get_pixmap(dpi=self.raster_dpi).tobytes("png")
+                    futures.append(([i], executor.submit(contextvars.copy_context().run, analyze_image, image, "image/png")))
+                
+                for pages, future in futures:
+                    results.append((pages, future.result()))
+        
+        merged = merge_page_results(results, page_texts, scanned_pages)
+        merged["page_count"] = len(page_texts)
+        merged["vision_pages"] = len(scanned_pages)
+        merged["processing_notes"] = (
+            f"PDF with {len(page_texts)} pages: {len(text_pages)} read from the text layer, "
+            f"{len(scanned_pages)} with Gemini Vision"
+            + (f", {len(skipped_pages)} scanned pages over the limit skipped" if skipped_pages else "")
+        )
+        print(f"📄 PDF OCR: {len(page_texts)} pages, {len(scanned_pages)} Vision calls")
+        return merged
+
+def merge_page_results(results: List[Tuple[List[int], Dict[str, Any]]], page_texts: List[str],
+                       vision_pages: List[int]) -> Dict[str, Any]:
+    """
+    Merge per-page OCR results into one, in page order
+    
+    Text-layer pages keep their exact text and pages read with Vision take Vision's text, even
+    when their text layer had a few characters (a stamp or a header); lists in structured_data
+    are concatenated without duplicates, and the first page that has a key_information value wins.
+    """
+    results = sorted(results, key=lambda item: item[0][0] if item[0] else 0)
+    page_text = dict(enumerate(page_texts))
+    vision_pages = set(vision_pages)
+    for pages, result in results:
+        if len(pages) == 1 and pages[0] in vision_pages:
+            page_text[pages[0]] = result.get("extracted_text", "")
+    
+    structured_data = {field: [] for field in STRUCTURED_FIELDS}
+    key_information = {field: "" for field in KEY_INFORMATION_FIELDS}
+    document_type = None
+    confidences = []
+    qualities = []
+    
+    for pages, result in results:
+        for field, values in (result.get("structured_data") or {}).items():
+            if not isinstance(values, list):
+                values = [values]
+            merged_values = structured_data.setdefault(field, [])
+            merged_values.extend(v for v in values if v and v not in merged_values)
+        
+        for field, value in (result.get("key_information") or {}).items():
+            if value and not key_information.get(field):
+                key_information[field] = value
+        
+        if not document_type and result.get("document_type") not in (None, "", "OTHER", "unknown"):
+            document_type = result["document_type"]
+        confidences += [float(result.get("confidence", 0.0))] * len(pages)
+        qualities.append(result.get("ocr_quality", "fair"))
+    
+    merged = {
+        "document_type": document_type or (results[0][1].get("document_type") if results else "OTHER"),
+        "confidence": round(sum(confidences) / len(confidences), 3) if confidences else 0.0,
+        "extracted_text": "\n\n".join(page_text[i] for i in sorted(page_text) if page_text[i]),
+        "structured_data": structured_data,
+        "key_information": key_information,
+        "ocr_quality": min(qualities, key=lambda q: QUALITY_ORDER.index(q) if q in QUALITY_ORDER else 0) if qualities else "poor"
+    }
+    # A page that could not be read makes the document incomplete: it is read again next time
+    if any(result.get("processing_failed") for _, result in results):
+        merged["processing_failed"] = True
+    return merged
+
+# Global PDF OCR service instance
+pdf_ocr_service = PdfOCRService()
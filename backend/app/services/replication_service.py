@@ -0,0 +1,364 @@
+"""
+Render PostgreSQL -> SQLite replication for the local fallback database
+Incremental by per-table watermarks, streamed from the source, applied as chunked upserts
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, NamedTuple, Tuple
+
+from sqlalchemy import create_engine, select, func, inspect as sa_inspect, Table
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+
+from app.core.database import Base, RENDER_DATABASE_URL, SQLITE_DATABASE_PATH
+
+class TableSpec(NamedTuple):
+    """A replicated table and the columns that tell when a row last changed"""
+    name: str
+    # Coalesced into the change timestamp; empty for insert-only tables (replicated by id)
+    change_columns: Tuple[str, ...]
+
+# Parents before children
+REPLICATED_TABLES = [
+    TableSpec("EMAILS", ("processed_at", "received_at")),
+    TableSpec("CLAIM_SUBMISSIONS", ("updated_at", "created_at")),
+    TableSpec("DOCUMENT_BLOBS", ("ocr_processed_at", "created_at")),
+    TableSpec("DOCUMENTS_AGENT_OCR", ("processed_at", "uploaded_at")),
+    TableSpec("CLAIM_STATUS_UPDATES", ()),
+    TableSpec("CLAIM_ANALYSES", ("updated_at", "created_at")),
+    TableSpec("OCR_JOBS", ("finished_at", "started_at", "created_at")),
+    TableSpec("GMAIL_SYNC_STATE", ("updated_at",)),
+    TableSpec("DASHBOARD_STATS", ("last_updated",)),
+    TableSpec("CLAIM_FORM", ("updated_at", "created_at")),
+    TableSpec("DOCUMENTS", ("updated_at", "uploaded_at")),
+]
+
+DEFAULT_METADATA_PATH = os.path.join(os.path.dirname(SQLITE_DATABASE_PATH), "sync_metadata.json")
+
+def create_render_engine() -> Engine:
+    """Create Render PostgreSQL engine"""
+    if not RENDER_DATABASE_URL:
+        raise ValueError("RENDER_DATABASE_URL not found in environment")
+    
+    render_url = RENDER_DATABASE_URL
+    if render_url.startswith("postgres://"):
+        render_url = render_url.replace("postgres://", "postgresql://", 1)
+    
+    return create_engine(
+        render_url,
+        pool_pre_ping=True,
+        connect_args={"connect_timeout": 30}
+    )
+
+def create_sqlite_engine(path: str = SQLITE_DATABASE_PATH) -> Engine:
+    """Create SQLite engine (writers wait for each other instead of failing with 'database is locked')"""
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60})
+
+class ReplicationService:
+    """Copies the primary's tables into the SQLite replica"""
+    
+    def __init__(self, source_engine: Optional[Engine] = None, target_engine: Optional[Engine] = None,
+                 metadata_path: Optional[str] = None, chunk_size: Optional[int] = None):
+        self._source_engine = source_engine
+        self.target_engine = target_engine or create_sqlite_engine()
+        self.metadata_path = metadata_path or DEFAULT_METADATA_PATH
+        self.chunk_size = chunk_size or int(os.getenv("REPLICATION_CHUNK_SIZE", "1000"))
+        # Re-read this far behind the watermark: a transaction can commit after rows
+        # with a later timestamp were already copied
+        self.overlap = timedelta(seconds=int(os.getenv("REPLICATION_OVERLAP_SECONDS", "60")))
+        # The same for insert-only tables, in ids: a sequence hands out ids before commit, so a
+        # lower id can become visible after a higher one was copied
+        self.id_overlap = int(os.getenv("REPLICATION_ID_OVERLAP", "100"))
+        
+        self._state_lock = threading.Lock()
+        self._schema_ready = False
+    
+    @property
+    def source_engine(self) -> Engine:
+        if self._source_engine is None:
+            self._source_engine = create_render_engine()
+        return self._source_engine
+    
+    def load_state(self) -> Dict[str, Any]:
+        """Contents of sync_metadata.json (empty on first run)"""
+        try:
+            with open(self.metadata_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def save_state(self, state: Dict[str, Any]):
+        """Write sync_metadata.json atomically"""
+        os.makedirs(os.path.dirname(self.metadata_path) or ".", exist_ok=True)
+        tmp_path = f"{self.metadata_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.metadata_path)
+    
+    def ensure_schema(self):
+        """Bring the replica's schema to head before copying into it"""
+        if self._schema_ready:
+            return
+        from app.core.migrations import run_migrations
+        run_migrations(self.target_engine)
+        self._schema_ready = True
+    
+    def replicate(self, full: bool = False, parallel: int = 1, tables: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Copy every replicated table (or only tables) and record the new watermarks
+        
+        Args:
+            full: replace each table's contents instead of copying changes since the watermark
+            parallel: number of tables copied at once
+            tables: table names to limit the run to
+        
+        Returns:
+            Per-table row counts and timings plus totals
+        """
+        self.ensure_schema()
+        import app.models.email_models  # noqa: F401 - register tables on Base.metadata
+        import app.models.claim_models  # noqa: F401
+        
+        specs = [spec for spec in REPLICATED_TABLES if not tables or spec.name in tables]
+        state = self.load_state()
+        watermarks = state.get("tables", {})
+        started = time.perf_counter()
+        
+        def run(spec: TableSpec) -> Dict[str, Any]:
+            return self.replicate_table(spec, None if full else watermarks.get(spec.name))
+        
+        if parallel > 1:
+            with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="replication") as executor:
+                results = list(executor.map(run, specs))
+        else:
+            results = [run(spec) for spec in specs]
+        
+        for result in results:
+            watermarks[result["table"]] = result["watermark"]
+        
+        total = sum(result["rows"] for result in results)
+        state.update({
+            "last_sync": datetime.now().isoformat(),
+            "mode": "full" if full else "incremental",
+            "total_records": total,
+            "sqlite_path": self.target_engine.url.database,
+            "render_url": RENDER_DATABASE_URL[:50] + "..." if RENDER_DATABASE_URL else None,
+            "tables": watermarks
+        })
+        with self._state_lock:
+            self.save_state(state)
+        
+        return {
+            "rows": total,
+            "seconds": round(time.perf_counter() - started, 3),
+            "tables": {result["table"]: {"rows": result["rows"], "seconds": result["seconds"]} for result in results}
+        }
+    
+    def replicate_table(self, spec: TableSpec, watermark: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Stream one table from the source and upsert it into the replica in one transaction
+        
+        Without a watermark the replica's copy is replaced; with one, only rows changed since
+        (minus the overlap) are read, or rows above the highest id seen (minus the id overlap)
+        for insert-only tables.
+        """
+        started = time.perf_counter()
+        table = Base.metadata.tables[spec.name]
+        pk = table.primary_key.columns[0]
+        
+        # Only columns the source has too (it may be on an older schema)
+        source_columns = {c["name"] for c in sa_inspect(self.source_engine).get_columns(spec.name)}
+        columns = [c for c in table.c if c.name in source_columns]
+        change_columns = [table.c[name] for name in spec.change_columns if name in source_columns]
+        
+        query = select(*columns)
+        if change_columns:
+            changed_at = func.coalesce(*change_columns) if len(change_columns) > 1 else change_columns[0]
+            query = query.add_columns(changed_at.label("_changed_at")).order_by(changed_at, pk)
+            if watermark and watermark.get("changed_at"):
+                since = datetime.fromisoformat(watermark["changed_at"]) - self.overlap
+                query = query.where(changed_at >= since)
+        else:
+            query = query.order_by(pk)
+            if watermark and watermark.get("last_id") is not None:
+                query = query.where(pk > watermark["last_id"] - self.id_overlap)
+        
+        full = watermark is None
+        new_watermark = dict(watermark or {})
+        rows = 0
+        
+        with self.source_engine.connect() as source, self.target_engine.begin() as target:
+            if full:
+                target.execute(table.delete())
+            
+            # Server-side cursor: rows arrive chunk by chunk instead of all at once
+            result = source.execution_options(stream_results=True, yield_per=self.chunk_size).execute(query)
+            for chunk in result.mappings().partitions(self.chunk_size):
+                batch = []
+                for row in chunk:
+                    values = {c.name: row[c.name] for c in columns}
+                    batch.append(values)
+                    if change_columns and row["_changed_at"] is not None:
+                        new_watermark["changed_at"] = row["_changed_at"].isoformat()
+                    new_watermark["last_id"] = max(new_watermark.get("last_id") or 0, values[pk.name])
+                
+                self._apply_chunk(target, table, columns, batch, upsert=not full)
+                rows += len(batch)
+        
+        seconds = round(time.perf_counter() - started, 3)
+        new_watermark["synced_at"] = datetime.now().isoformat()
+        print(f"   ✅ {spec.name}: {rows} rows {'copied' if full else 'upserted'} in {seconds}s")
+        return {"table": spec.name, "rows": rows, "seconds": seconds, "watermark": new_watermark}
+    
+    def _apply_chunk(self, target, table: Table, columns, batch: List[Dict[str, Any]], upsert: bool):
+        """executemany one chunk into the replica"""
+        if not batch:
+            return
+        pk = table.primary_key.columns[0]
+        
+        if not upsert:
+            target.execute(table.insert(), batch)
+            return
+        
+        # Rows written locally during a failover can hold a unique value (e.g. a gmail_id)
+        # under a different id than the primary gave it; the primary's row wins
+        ids = [row[pk.name] for row in batch]
+        names = {c.name for c in columns}
+        unique_columns = [c for c in columns if c.unique and c is not pk]
+        unique_columns += [list(index.columns)[0] for index in table.indexes
+                           if index.unique and len(index.columns) == 1 and list(index.columns)[0].name in names]
+        for column in unique_columns:
+            values = [row[column.name] for row in batch if row[column.name] is not None]
+            if values:
+                target.execute(table.delete().where(column.in_(values), pk.notin_(ids)))
+        
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[pk],
+            set_={c.name: stmt.excluded[c.name] for c in columns if c is not pk}
+        )
+        target.execute(stmt, batch)
+
+class BackgroundReplicator:
+    """
+    Keeps the SQLite fallback a few seconds behind the primary while the app runs
+
+    Every interval the primary's changes since the last pass are upserted into the replica.
+    Passes are skipped while sessions are on SQLite or journaled writes are waiting for
+    replay, so the replica's local changes are never overwritten; after a failback the
+    next pass copies every table again to drop rows the primary renumbered on replay.
+    """
+
+    def __init__(self, manager=None, interval: Optional[int] = None, metadata_path: Optional[str] = None):
+        from app.core.database import db_manager
+        self.manager = manager or db_manager
+        self.metadata_path = metadata_path
+        self.enabled = os.getenv("REPLICATION_ENABLED", "true").lower() == "true"
+        self.interval = interval or int(os.getenv("REPLICATION_INTERVAL_SECONDS", "15"))
+        self.replication = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.passes = 0
+        self.failures = 0
+        self.last_success_at = None
+        # Start of the first pass, or of the last full copy: no failback since means no renumbered rows
+        self.baseline_at = None
+        self.last_rows = 0
+        self.last_duration_seconds = None
+        self.last_error = None
+        self.skipped_reason = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start replicating in a background thread (no-op without a primary or when disabled)"""
+        if not self.enabled or not self.manager.primary_url or self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replication", daemon=True)
+        self._thread.start()
+        print(f"🔄 Replicating Render PostgreSQL into SQLite every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def replicate_once(self) -> bool:
+        """One pass; returns True when the replica was brought up to date"""
+        if self.manager.role != "primary":
+            self.skipped_reason = f"database role is {self.manager.role}"
+            return False
+
+        from app.core.write_journal import journal_stats
+        fallback_engine = self.manager._get_fallback_engine()
+        if journal_stats(fallback_engine, self.manager._metadata())["pending_writes"]:
+            self.skipped_reason = "journaled writes are waiting for replay"
+            return False
+
+        if self.replication is None:
+            self.replication = ReplicationService(source_engine=self.manager._get_primary_engine(),
+                                                  target_engine=fallback_engine, metadata_path=self.metadata_path)
+
+        # Otherwise per-table watermarks decide: tables without one are copied in full
+        failback_at = self.manager.last_failback_at
+        full = failback_at is not None and (self.baseline_at is None or failback_at > self.baseline_at)
+        if full:
+            print("📥 Primary is back, re-copying every table into SQLite")
+
+        started = time.time()
+        try:
+            result = self.replication.replicate(full=full)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"⚠️ Replication pass failed: {e}")
+            return False
+
+        self.passes += 1
+        self.last_success_at = started
+        if full or self.baseline_at is None:
+            self.baseline_at = started
+        self.last_rows = result["rows"]
+        self.last_duration_seconds = result["seconds"]
+        self.last_error = None
+        self.skipped_reason = None
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Replication health for /health; lag is how old the replica's newest data can be"""
+        lag = round(time.time() - self.last_success_at, 1) if self.last_success_at else None
+        return {
+            "enabled": self.enabled,
+            "running": self.is_running,
+            "interval_seconds": self.interval,
+            "lag_seconds": lag,
+            "passes": self.passes,
+            "failures": self.failures,
+            "last_rows": self.last_rows,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_error": self.last_error,
+            "skipped_reason": self.skipped_reason
+        }
+
+    def _run(self):
+        """Background thread: wait for the backend decision, then replicate every interval"""
+        self.manager.wait_until_resolved()
+        while not self._stop.is_set():
+            try:
+                self.replicate_once()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"⚠️ Replication pass failed: {e}")
+            self._stop.wait(self.interval)
+
+# Global background replicator instance
+background_replicator = BackgroundReplicator()
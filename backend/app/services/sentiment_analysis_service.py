@@ -6,14 +6,28 @@ Analyzes claim descriptions and provides detailed recommendations
 
 import os
 import json
-from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.email_models import ClaimSubmission, ClaimAnalysis
 from app.services.llm_service import LLMService
+from app.services.async_llm_service import AsyncLLMService, get_async_llm_service
+from app.services.single_flight import SingleFlight
+
+# Bump when the prompt or the response schema changes so stored analyses are recomputed
+PROMPT_VERSION = "1"
 
 class SentimentAnalysisService:
     """Service for analyzing claim sentiment and generating recommendations"""
     
     def __init__(self):
         self.gemini_service = LLMService()
+        # Created on first use by the async request handlers
+        self.async_gemini_service = None
+        # Concurrent analyses of the same claim inputs share one Gemini call and one write;
+        # two inserts would collide on ClaimAnalysis.claim_submission_id
+        self.analysis_flight = SingleFlight()
         
         # Available coverage types in the system
         self.coverage_types = [
@@ -40,6 +54,129 @@ class SentimentAnalysisService:
             Dictionary with sentiment analysis results
         """
         
+        try:
+            return self._request_analysis(claim_description, customer_name, claim_type)
+            
+        except Exception as e:
+            print(f"❌ Error in sentiment analysis: {e}")
+            # Return default analysis
+            return self._get_default_analysis()
+    
+    def get_claim_analysis(self, db: Session, claim: ClaimSubmission, refresh: bool = False) -> Tuple[Dict[str, Any], bool]:
+        """
+        Get the analysis of a claim, calling Gemini only if its inputs changed since the stored one
+        
+        Args:
+            db: Database session
+            claim: Claim to analyze
+            refresh: recompute even if the stored analysis is current
+            
+        Returns:
+            (analysis dict, True if it came from the database)
+        """
+        stored, inputs, input_hash = self._load_stored_analysis(db, claim)
+        if stored and not refresh and stored.input_hash == input_hash:
+            return stored.analysis, True
+        
+        def analyze():
+            try:
+                # An explicit refresh must not get the same answer back from the LLM cache
+                analysis = self._request_analysis(*inputs, use_cache=not refresh)
+            except Exception as e:
+                # Defaults are returned but never stored, so the next read tries again
+                print(f"❌ Error in sentiment analysis for claim {claim.id}: {e}")
+                return self._get_default_analysis()
+            
+            self._store_analysis(db, claim, stored, input_hash, analysis)
+            return analysis
+        
+        return self.analysis_flight.do(f"{claim.id}:{input_hash}", analyze), False
+    
+    async def get_claim_analysis_async(self, db: Session, claim: ClaimSubmission,
+                                       refresh: bool = False) -> Tuple[Dict[str, Any], bool]:
+        """get_claim_analysis for async handlers: database work on a thread, the Gemini call awaited"""
+        stored, inputs, input_hash = await asyncio.to_thread(self._load_stored_analysis, db, claim)
+        if stored and not refresh and stored.input_hash == input_hash:
+            return stored.analysis, True
+        
+        async def analyze():
+            try:
+                analysis = await self._request_analysis_async(*inputs, use_cache=not refresh)
+            except Exception as e:
+                print(f"❌ Error in sentiment analysis for claim {claim.id}: {e}")
+                return self._get_default_analysis()
+            
+            await asyncio.to_thread(self._store_analysis, db, claim, stored, input_hash, analysis)
+            return analysis
+        
+        return await self.analysis_flight.ado(f"{claim.id}:{input_hash}", analyze), False
+    
+    async def analyze_claim_sentiment_async(self, claim_description: str, customer_name: str = "",
+                                            claim_type: str = "") -> Dict[str, Any]:
+        """analyze_claim_sentiment for async handlers"""
+        try:
+            return await self._request_analysis_async(claim_description, customer_name, claim_type)
+        except Exception as e:
+            print(f"❌ Error in sentiment analysis: {e}")
+            return self._get_default_analysis()
+    
+    def _load_stored_analysis(self, db: Session, claim: ClaimSubmission):
+        """(stored ClaimAnalysis or None, prompt inputs, hash of the inputs)"""
+        description = claim.incident_description or "No description provided"
+        customer_name = claim.customer_name or "Unknown"
+        claim_type = claim.claim_type or "OTHER"
+        input_hash = self.compute_input_hash(description, customer_name, claim_type)
+        
+        stored = db.query(ClaimAnalysis).filter(ClaimAnalysis.claim_submission_id == claim.id).first()
+        return stored, (description, customer_name, claim_type), input_hash
+    
+    def _store_analysis(self, db: Session, claim: ClaimSubmission, stored: Optional[ClaimAnalysis],
+                        input_hash: str, analysis: Dict[str, Any]):
+        if not stored:
+            stored = ClaimAnalysis(claim_submission_id=claim.id)
+            db.add(stored)
+        
+        stored.input_hash = input_hash
+        stored.prompt_version = PROMPT_VERSION
+        stored.sentiment_label = analysis["sentiment_label"]
+        stored.sentiment_score = analysis["sentiment_score"]
+        stored.risk_score = analysis["risk_score"]
+        stored.priority_level = analysis["priority_level"]
+        stored.traffic_light = analysis["traffic_light"]
+        stored.analysis = analysis
+        
+        # Keep the claim columns the list views read in sync
+        claim.sentiment_analysis = str(analysis["sentiment_label"]).upper()
+        claim.risk_score = analysis["risk_score"]
+        claim.priority_level = analysis["priority_level"]
+        
+        db.commit()
+    
+    def compute_input_hash(self, claim_description: str, customer_name: str, claim_type: str) -> str:
+        """Hash of everything that goes into the prompt, including the prompt version"""
+        if claim_type not in self.coverage_types:
+            claim_type = "OTHER"
+        payload = json.dumps([PROMPT_VERSION, self.gemini_service.model_name, claim_description, customer_name, claim_type])
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _request_analysis(self, claim_description: str, customer_name: str, claim_type: str,
+                          use_cache: bool = True) -> Dict[str, Any]:
+        """Call Gemini and validate the response; raises if there is no usable answer"""
+        prompt = self._build_prompt(claim_description, customer_name, claim_type)
+        return self._parse_analysis(self.gemini_service.generate_text(prompt, use_cache))
+    
+    async def _request_analysis_async(self, claim_description: str, customer_name: str, claim_type: str,
+                                      use_cache: bool = True) -> Dict[str, Any]:
+        """Async _request_analysis: the Gemini call is awaited instead of holding a thread"""
+        prompt = self._build_prompt(claim_description, customer_name, claim_type)
+        return self._parse_analysis(await self._get_async_service().generate_text(prompt, use_cache))
+    
+    def _get_async_service(self) -> AsyncLLMService:
+        if self.async_gemini_service is None:
+            self.async_gemini_service = get_async_llm_service()
+        return self.async_gemini_service
+    
+    def _build_prompt(self, claim_description: str, customer_name: str, claim_type: str) -> str:
         # Validate claim type
         if claim_type and claim_type not in self.coverage_types:
             claim_type = "OTHER"
@@ -81,21 +218,18 @@ class SentimentAnalysisService:
         - Coverage type specific considerations
         """
 
-        try:
-            response = self.gemini_service.generate_text(prompt)
-            
-            # Parse the JSON response
-            analysis = json.loads(response)
-            
-            # Validate and normalize the response
-            analysis = self._validate_analysis(analysis)
-            
-            return analysis
-            
-        except Exception as e:
-            print(f"❌ Error in sentiment analysis: {e}")
-            # Return default analysis
-            return self._get_default_analysis()
+        return prompt
+    
+    def _parse_analysis(self, response: str) -> Dict[str, Any]:
+        # Parse the JSON response (Gemini often wraps it in a ```json fence)
+        start = response.find('{')
+        end = response.rfind('}') + 1
+        if start == -1 or end == 0:
+            raise ValueError("No JSON object in sentiment analysis response")
+        analysis = json.loads(response[start:end])
+        
+        # Validate and normalize the response
+        return self._validate_analysis(analysis)
     
     def _validate_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and normalize the analysis response"""
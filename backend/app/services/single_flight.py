@@ -0,0 +1,94 @@
+"""
+Single-flight coalescing of identical in-flight LLM requests
+While a request for a key is running, identical requests (same cache key) wait for it and get
+its result (or its exception) instead of calling Gemini again. Threads and coroutines share the
+same registry, so a sync caller and an async caller of the same prompt also share one call.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict
+
+from app.services.gemini_client import LLMServiceError, remaining_time
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers of that key share its result"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._counters = {"calls": 0, "coalesced": 0}
+    
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Return fn(), or the result of the identical call already in flight"""
+        future, leader = self._join(key)
+        if not leader:
+            # A follower waits no longer than its own deadline, whatever the leader's is
+            try:
+                return future.result(timeout=self._wait_timeout())
+            except FutureTimeoutError:
+                raise LLMServiceError("Gemini deadline exceeded waiting for an identical request", retryable=True)
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+    
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async do(): await fn(), or the identical call already in flight (sync or async)"""
+        future, leader = self._join(key)
+        if not leader:
+            # shield: a cancelled or timed out follower must not cancel the shared call
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self._wait_timeout())
+            except asyncio.TimeoutError:
+                raise LLMServiceError("Gemini deadline exceeded waiting for an identical request", retryable=True)
+        
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+    
+    def _wait_timeout(self):
+        remaining = remaining_time()
+        return None if remaining is None else max(0.0, remaining)
+    
+    def _join(self, key: str):
+        """(future of the call for key, True if the caller must run it)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._counters["calls"] += 1
+            return future, True
+    
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+            # Nobody may be waiting; don't let the future log "exception never retrieved"
+            future.exception()
+        else:
+            future.set_result(result)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Upstream calls made, requests that joined one instead, and calls in flight"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+        requests = stats["calls"] + stats["coalesced"]
+        stats["coalesced_rate"] = round(stats["coalesced"] / requests, 3) if requests else 0.0
+        return stats
+
+# Global single-flight instance shared by the LLM services
+llm_single_flight = SingleFlight()
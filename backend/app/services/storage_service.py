@@ -3,6 +3,7 @@ Google Cloud Storage service for document management
 """
 
 import os
+import copy
 import uuid
 from datetime import datetime
 from typing import Optional, BinaryIO
@@ -22,6 +23,8 @@ class StorageService:
         self.folder = os.getenv("GOOGLE_CLOUD_STORAGE_FOLDER", "documents")
         self.client = None
         self.bucket = None
+        # Builds another client with the same credentials (see for_worker)
+        self._client_factory = None
         
         # Initialize Google Cloud Storage client (optional)
         try:
@@ -32,12 +35,14 @@ class StorageService:
                 # Check if it's a valid JSON string
                 try:
                     credentials_info = json.loads(credentials_value)
-                    self.client = storage.Client.from_service_account_info(credentials_info)
+                    self._client_factory = lambda: storage.Client.from_service_account_info(credentials_info)
+                    self.client = self._client_factory()
                     print("✅ Google Cloud Storage initialized with service account credentials (JSON)")
                 except json.JSONDecodeError:
                     # If not JSON, treat as file path
                     if os.path.exists(credentials_value):
-                        self.client = storage.Client.from_service_account_json(credentials_value)
+                        self._client_factory = lambda: storage.Client.from_service_account_json(credentials_value)
+                        self.client = self._client_factory()
                         print(f"✅ Google Cloud Storage initialized with service account credentials (file: {credentials_value})")
                     else:
                         print(f"⚠️  Credentials file not found: {credentials_value}")
@@ -56,6 +61,20 @@ class StorageService:
             self.client = None
             self.bucket = None
     
+    def for_worker(self) -> "StorageService":
+        """
+        A copy with its own GCS client, for a worker thread
+        
+        A client's HTTP session is not thread-safe, so threads uploading at the same time
+        must not share one.
+        """
+        if not self.client or not self._client_factory:
+            return self
+        worker = copy.copy(self)
+        worker.client = self._client_factory()
+        worker.bucket = worker.client.bucket(self.bucket_name)
+        return worker
+    
     def generate_file_path(self, claim_id: str, document_type: str, original_filename: str) -> str:
         """Generate a unique file path for storage"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -118,6 +137,38 @@ class StorageService:
         except Exception as e:
             raise Exception(f"File upload failed: {str(e)}")
     
+    def upload_bytes(
+        self,
+        data: bytes,
+        claim_id: str,
+        document_type: str,
+        original_filename: str,
+        content_type: Optional[str] = None
+    ) -> dict:
+        """
+        Upload in-memory content (e.g. an email attachment) from a worker thread
+        
+        Same result as upload_file, without the extra metadata round-trip: the size is
+        known and the upload response already carries the object's link.
+        """
+        if not self.client or not self.bucket:
+            raise Exception("Google Cloud Storage is not configured. Please set GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable.")
+        
+        try:
+            storage_path = self.generate_file_path(claim_id, document_type, original_filename)
+            blob = self.bucket.blob(storage_path)
+            blob.upload_from_string(data, content_type=content_type or self._get_content_type(original_filename))
+            
+            return {
+                "storage_url": blob.self_link,
+                "storage_path": storage_path,
+                "filename": os.path.basename(storage_path),
+                "file_size": len(data)
+            }
+        
+        except GoogleCloudError as e:
+            raise Exception(f"Google Cloud Storage error: {str(e)}")
+    
     def delete_file(self, storage_path: str) -> bool:
         """Delete a file from Google Cloud Storage"""
         if not self.client or not self.bucket:
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark LLM round-trips per claim email: legacy three-call flow vs single-pass extraction
+Uses a stubbed LLMService with a fixed latency, so no Gemini key is needed
+"""
+
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.core.database import Base
+from app.models.email_models import Email, ClaimSubmission
+from app.services.email_processor import EmailProcessor
+
+CLAIM_FIELDS = {
+    "customer_name": "John Smith",
+    "policy_number": "POL-2024-001",
+    "claim_type": "Trip Cancellation",
+    "incident_date": "2024-01-15",
+    "incident_description": "Flight cancelled by the airline",
+    "estimated_amount": 1250.0,
+    "priority": "HIGH",
+    "sentiment_analysis": "NEGATIVE",
+    "risk_score": 0.3
+}
+
+class StubLLMService:
+    """Answers each prompt type with a canned response after a fixed delay"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.prompt_chars = 0
+    
+    def analyze_text(self, prompt: str) -> str:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        time.sleep(self.latency)
+        
+        if "Return JSON with these fields" in prompt:
+            return "```json\n" + json.dumps({
+                "notification_type": "FIRST",
+                **CLAIM_FIELDS,
+                "summary": "Flight cancellation claim",
+                "recommendation": "REQUEST_MORE_DOCS"
+            }) + "\n```"
+        if '"FIRST" or "FOLLOW_UP"' in prompt:
+            return "FIRST"
+        if "Extract insurance claim details" in prompt:
+            return json.dumps({**CLAIM_FIELDS, "incident_date": None})
+        return json.dumps({"summary": "Flight cancellation claim", "recommendation": "REQUEST_MORE_DOCS"})
+
+class StubGmailService:
+    """Sends nothing and has no attachments"""
+    
+    def send_email(self, to_email, subject, body):
+        return True
+    
+    def get_email_details(self, message_id):
+        return {"id": message_id, "payload": {}}
+    
+    def list_attachment_parts(self, payload):
+        return []
+
+def run(single_pass: bool, emails: int, latency: float, body: str):
+    """Process `emails` first notifications (each with an earlier email in its thread) and time it"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    
+    llm = StubLLMService(latency)
+    processor = EmailProcessor(db, llm_service=llm, gmail_service=StubGmailService(),
+                               storage_service=object(), single_pass=single_pass)
+    
+    records = []
+    for i in range(emails):
+        # An earlier message in the thread forces the legacy flow to ask the LLM
+        db.add(Email(gmail_id=f"prev-{i}", thread_id=f"thread-{i}", from_email="customer@example.com",
+                     to_email="claims@example.com", subject="Booking", body_text="Booking confirmation",
+                     received_at=datetime(2024, 1, 1)))
+        record = Email(gmail_id=f"msg-{i}", thread_id=f"thread-{i}", from_email="customer@example.com",
+                       to_email="claims@example.com", subject="Travel insurance claim", body_text=body,
+                       received_at=datetime(2024, 1, 2))
+        db.add(record)
+        records.append(record)
+    db.commit()
+    
+    start = time.perf_counter()
+    for record in records:
+        processor.process_claim_email(record)
+    elapsed = time.perf_counter() - start
+    
+    claims = db.query(ClaimSubmission).count()
+    db.close()
+    return elapsed, llm.calls, llm.prompt_chars, claims
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM latency per call in seconds")
+    parser.add_argument("--body-chars", type=int, default=2000)
+    args = parser.parse_args()
+    
+    body = ("My flight to Madrid was cancelled and I need to file a claim for the hotel and tickets. "
+            * (args.body_chars // 88 + 1))[:args.body_chars]
+    
+    print("🧪 CLAIM EXTRACTION BENCHMARK")
+    print("=" * 50)
+    print(f"{args.emails} emails, {args.latency * 1000:.0f} ms per LLM call, {len(body)} body chars\n")
+    
+    results = {}
+    for label, single_pass in (("legacy", False), ("single-pass", True)):
+        elapsed, calls, chars, claims = run(single_pass, args.emails, args.latency, body)
+        results[label] = (elapsed, calls, chars)
+        print(f"{label:12s} {elapsed:7.2f}s  {calls / args.emails:.1f} calls/email  "
+              f"{chars / args.emails:8.0f} prompt chars/email  {claims} claims")
+    
+    legacy, single = results["legacy"], results["single-pass"]
+    print(f"\n✅ Latency x{legacy[0] / single[0]:.1f} lower, prompt chars x{legacy[2] / single[2]:.1f} lower")
+
+if __name__ == "__main__":
+    main()
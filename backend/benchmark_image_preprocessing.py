@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark image preprocessing before Gemini Vision: bytes sent, time spent and, with --live,
+Gemini latency and how much of the extracted text survives compared with the original image
+Without arguments a synthetic 4000x3000 phone photo of a receipt and the sample claim form are used
+"""
+
+import io
+import sys
+import time
+import difflib
+import argparse
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.image_preprocessing import image_preprocessor
+from app.services.llm_service import guess_mime_type
+
+SAMPLE_PDF = current_dir.parent / "Redacted Customer ClaimForm.pdf"
+OCR_PROMPT = "Transcribe all the text in this document image exactly, line by line. Return only the text."
+
+def synthetic_phone_photo() -> bytes:
+    """A receipt photographed sideways by a phone: 4000x3000, noisy, high-quality JPEG, EXIF-rotated"""
+    image = Image.new("RGB", (4000, 3000), (236, 232, 220))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=64)
+    lines = ["HOTEL PLAZA MADRID", "Invoice INV-2291   Date 2024-03-02", "Guest: Ana Lopez",
+             "Room 3 nights x EUR 140.00   420.00", "City tax   9.90", "TOTAL EUR 429.90",
+             "Policy POL-2024-001  Ref CLM-7731"]
+    for i, line in enumerate(lines):
+        draw.text((300, 300 + i * 180), line, fill=(30, 30, 40), font=font)
+    # Uneven lighting and sensor noise
+    shade = Image.linear_gradient("L").resize((4000, 3000)).convert("RGB")
+    image = Image.blend(image, shade, 0.15)
+    noise = Image.effect_noise((4000, 3000), 12).convert("RGB")
+    image = Image.blend(image, noise, 0.05)
+    
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+def sample_images(paths):
+    if paths:
+        return [(Path(path).name, Path(path).read_bytes()) for path in paths]
+    
+    images = [("synthetic-phone-photo.jpg", synthetic_phone_photo())]
+    try:
+        import pymupdf
+        with pymupdf.open(SAMPLE_PDF) as document:
+            for i, page in enumerate(document):
+                images.append((f"claim-form-page-{i + 1}@300dpi.png", page.get_pixmap(dpi=300).tobytes("png")))
+    except ImportError:
+        print("⚠️ PyMuPDF not installed, sample claim form pages skipped")
+    return images
+
+def ask_gemini(llm, data: bytes, mime_type: str):
+    start = time.perf_counter()
+    text = llm._generate_with_blob(OCR_PROMPT, data, mime_type, cache_key="")
+    return text, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", help="Image files (default: synthetic photo + sample claim form)")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="Upload bandwidth for the estimated transfer time")
+    parser.add_argument("--live", action="store_true", help="Also send both versions to Gemini (needs GEMINI_API_KEY)")
+    args = parser.parse_args()
+    
+    print("🧪 IMAGE PREPROCESSING BENCHMARK")
+    print("=" * 50)
+    print(f"max {image_preprocessor.max_dimension}px, grayscale={image_preprocessor.grayscale}, "
+          f"{image_preprocessor.output_format} q{image_preprocessor.quality}, uplink {args.uplink_mbps} Mbps\n")
+    
+    llm = None
+    if args.live:
+        from app.services.llm_service import LLMService
+        llm = LLMService(cache=None)
+    
+    total_before = total_after = 0
+    for name, data in sample_images(args.images):
+        mime_type = guess_mime_type(data)
+        start = time.perf_counter()
+        processed, processed_mime = image_preprocessor.preprocess(data, mime_type)
+        elapsed = time.perf_counter() - start
+        total_before += len(data)
+        total_after += len(processed)
+        
+        upload_before = len(data) * 8 / (args.uplink_mbps * 1e6)
+        upload_after = len(processed) * 8 / (args.uplink_mbps * 1e6)
+        print(f"📄 {name}")
+        print(f"   {len(data) / 1024:9.0f} KB -> {len(processed) / 1024:7.0f} KB ({processed_mime}), "
+              f"x{len(data) / len(processed):.1f} smaller, preprocessing {elapsed * 1000:.0f} ms, "
+              f"upload ~{upload_before:.2f}s -> ~{upload_after:.2f}s")
+        
+        if llm:
+            # The preprocessor is bypassed for the reference call
+            image_preprocessor.enabled = False
+            original_text, original_latency = ask_gemini(llm, data, mime_type)
+            image_preprocessor.enabled = True
+            processed_text, processed_latency = ask_gemini(llm, data, mime_type)
+            similarity = difflib.SequenceMatcher(None, original_text, processed_text).ratio()
+            print(f"   Gemini {original_latency:.2f}s -> {processed_latency:.2f}s, "
+                  f"{len(original_text)} -> {len(processed_text)} chars, text similarity {similarity:.0%}")
+    
+    print(f"\n✅ {total_before / 1024:.0f} KB -> {total_after / 1024:.0f} KB sent "
+          f"(x{total_before / max(total_after, 1):.1f} smaller)")
+    if not llm:
+        print("ℹ️ Run with --live to compare Gemini latency and extracted text")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold start: time to import the app and time until the first requests are served
+Starts uvicorn in a subprocess; pass --database-url with an unreachable host to see the
+cost of a Render database that does not answer
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import statistics
+import urllib.request
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_import(env) -> float:
+    """Seconds to import main in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=current_dir, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def wait_for(url: str, deadline: float) -> float:
+    """Poll url until it answers 200; returns the time it did"""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except Exception:
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not answer")
+
+def measure_first_requests(env, timeout: float):
+    """Seconds from process start to the first /health and first /api/analyst/claims response"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=current_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        health = wait_for(f"http://127.0.0.1:{port}/health", deadline) - started
+        claims = wait_for(f"http://127.0.0.1:{port}/api/analyst/claims?limit=1&count=none", deadline) - started
+        return health, claims
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--database-url", default=None,
+                        help="DATABASE_URL for the run (default: the environment's; '' for SQLite only)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    if args.database_url is not None:
+        env["DATABASE_URL"] = args.database_url
+    
+    print("🧪 STARTUP BENCHMARK")
+    print("=" * 50)
+    print(f"{args.runs} runs, DATABASE_URL={'set' if env.get('DATABASE_URL') else 'unset'}\n")
+    
+    imports, healths, claims = [], [], []
+    for run in range(args.runs):
+        imports.append(measure_import(env))
+        health, first_claims = measure_first_requests(env, args.timeout)
+        healths.append(health)
+        claims.append(first_claims)
+        print(f"run {run + 1}: import {imports[-1]:6.2f}s  first /health {health:6.2f}s  "
+              f"first /api/analyst/claims {first_claims:6.2f}s")
+    
+    print(f"\n✅ Median: import {statistics.median(imports):.2f}s, first /health {statistics.median(healths):.2f}s, "
+          f"first claims page {statistics.median(claims):.2f}s")
+
+if __name__ == "__main__":
+    main()
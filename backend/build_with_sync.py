@@ -6,7 +6,7 @@ This script is designed to run during deployment to ensure SQLite has latest dat
 
 import os
 import sys
-import time
+import threading
 from pathlib import Path
 
 # Add the backend directory to Python path
@@ -19,7 +19,7 @@ def run_sync():
     
     try:
         from sync_render_to_sqlite import main as sync_main
-        sync_main()
+        sync_main([])
         print("✅ Sync completed successfully")
         return True
     except Exception as e:
@@ -27,20 +27,6 @@ def run_sync():
         print("⚠️  Continuing without sync - will use existing SQLite data or simulated data")
         return False
 
-def check_database_connection():
-    """Check if we can connect to the database"""
-    try:
-        from app.core.database import engine
-        from sqlalchemy import text
-        
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-            print("✅ Database connection successful")
-            return True
-    except Exception as e:
-        print(f"⚠️  Database connection failed: {e}")
-        return False
-
 def start_server():
     """Start the FastAPI server"""
     print("🚀 Starting FastAPI server...")
@@ -68,24 +54,14 @@ def main():
     is_production = os.environ.get("ENVIRONMENT") == "production"
     print(f"Environment: {'Production' if is_production else 'Development'}")
     
-    # Check database connection first
-    db_available = check_database_connection()
-    
-    # Only try to sync if database is available
-    if is_production or os.environ.get("FORCE_SYNC") == "true":
-        print("\n📊 Production sync required...")
-        
-        if db_available:
-            try:
-                sync_success = run_sync()
-                if not sync_success:
-                    print("⚠️  Sync failed but continuing with server startup")
-            except Exception as e:
-                print(f"❌ Sync process failed completely: {e}")
-                print("⚠️  Continuing with server startup using fallback data")
-        else:
-            print("⚠️  Database not available - skipping sync")
-            print("🔄 Using SQLite fallback database")
+    # The server keeps the SQLite fallback replicated from Render while it runs; the one-off sync
+    # is only needed when that is turned off, and then runs next to the server instead of before it
+    if os.environ.get("REPLICATION_ENABLED", "true").lower() == "true":
+        print("\n📊 The server replicates Render into SQLite itself - skipping the one-off sync")
+    elif is_production or os.environ.get("FORCE_SYNC") == "true":
+        print("\n📊 Production sync required, running it in the background...")
+        sync_thread = threading.Thread(target=run_sync, name="render-sync", daemon=True)
+        sync_thread.start()
     else:
         print("\n📊 Development mode - skipping sync")
         print("Set FORCE_SYNC=true to enable sync in development")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Load test: in-flight Gemini requests per worker, threadpool handlers vs async handlers
+Starts a local fake Gemini server with a fixed latency and sends the same burst of requests
+the way a `def` endpoint does (blocking calls on Starlette's 40-thread pool) and the way an
+`async def` endpoint does (AsyncLLMService awaited on the event loop)
+
+    python load_test_llm.py --requests 400 --latency 0.5
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anyio
+import httpx
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+
+from app.services.async_llm_service import AsyncLLMService
+from app.services.gemini_client import GeminiClient, TokenBucket
+
+# Starlette runs `def` endpoints on anyio's default limiter
+THREADPOOL_SIZE = 40
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """generateContent look-alike: answers after `latency` seconds, optionally 429s first"""
+    
+    latency = 0.2
+    fail_first = 0
+    lock = threading.Lock()
+    requests_seen = []
+    in_flight = 0
+    max_in_flight = 0
+    
+    @classmethod
+    def reset(cls, latency=0.2, fail_first=0):
+        cls.latency = latency
+        cls.fail_first = fail_first
+        cls.requests_seen = []
+        cls.in_flight = 0
+        cls.max_in_flight = 0
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        cls = type(self)
+        with cls.lock:
+            cls.requests_seen.append({"path": self.path, "api_key": self.headers.get("x-goog-api-key"), "body": body})
+            throttled = len(cls.requests_seen) <= cls.fail_first
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        
+        try:
+            if throttled:
+                self._reply(429, {"error": {"code": 429, "message": "Resource has been exhausted"}})
+                return
+            
+            time.sleep(cls.latency)
+            prompt = body["contents"][0]["parts"][0].get("text", "")
+            self._reply(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": f"answer to: {prompt[:40]}"}]}}],
+                "usageMetadata": {"totalTokenCount": 12}
+            })
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+    
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of clients connect at once
+    request_queue_size = 1024
+
+def start_fake_gemini_server():
+    server = FakeGeminiServer(("127.0.0.1", 0), FakeGeminiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def unlimited_client() -> GeminiClient:
+    """A GeminiClient without per-minute quotas, so only concurrency is measured"""
+    client = GeminiClient()
+    client.request_bucket = TokenBucket(0)
+    client.token_bucket = TokenBucket(0)
+    return client
+
+def make_service(base_url: str, client: GeminiClient = None) -> AsyncLLMService:
+    os.environ["GEMINI_API_BASE_URL"] = base_url
+    return AsyncLLMService(cache=None, client=client or unlimited_client())
+
+async def run_threadpool(base_url: str, requests: int) -> float:
+    """Each request holds a pool thread for the whole blocking call, like a `def` endpoint"""
+    limiter = anyio.CapacityLimiter(THREADPOOL_SIZE)
+    http = httpx.Client(limits=httpx.Limits(max_connections=THREADPOOL_SIZE))
+    url = f"{base_url}/v1beta/models/gemini-1.5-flash:generateContent"
+    
+    def blocking_call(i):
+        body = {"contents": [{"role": "user", "parts": [{"text": f"prompt {i}"}]}]}
+        return http.post(url, json=body, timeout=60).raise_for_status()
+    
+    start = time.perf_counter()
+    async with anyio.create_task_group() as group:
+        for i in range(requests):
+            group.start_soon(lambda i=i: anyio.to_thread.run_sync(blocking_call, i, limiter=limiter))
+    elapsed = time.perf_counter() - start
+    http.close()
+    return elapsed
+
+async def run_async(service: AsyncLLMService, requests: int) -> float:
+    """Every request is a coroutine awaiting Gemini, like an `async def` endpoint"""
+    start = time.perf_counter()
+    await asyncio.gather(*(service.analyze_text(f"prompt {i}") for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await service.aclose()
+    return elapsed
+
+async def run_endpoint(url: str, requests: int) -> float:
+    """Fire the burst at a running backend endpoint instead (POST, no body)"""
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=requests)) as http:
+        responses = await asyncio.gather(*(http.post(url) for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for response in responses if response.status_code >= 400)
+    print(f"   {failed} of {requests} responses failed")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake Gemini latency per call in seconds")
+    parser.add_argument("--endpoint", help="Also load a running endpoint, e.g. "
+                        "http://localhost:8000/api/analyst/claims/1/sentiment-analysis?refresh=true")
+    args = parser.parse_args()
+    
+    server, base_url = start_fake_gemini_server()
+    print("🧪 LLM LOAD TEST")
+    print("=" * 50)
+    print(f"{args.requests} requests, fake Gemini latency {args.latency * 1000:.0f} ms\n")
+    
+    try:
+        FakeGeminiHandler.reset(latency=args.latency)
+        elapsed = anyio.run(run_threadpool, base_url, args.requests)
+        threadpool = (elapsed, FakeGeminiHandler.max_in_flight)
+        print(f"threadpool   {elapsed:6.2f}s  {args.requests / elapsed:7.1f} req/s  peak in flight {threadpool[1]}")
+        
+        FakeGeminiHandler.reset(latency=args.latency)
+        elapsed = asyncio.run(run_async(make_service(base_url), args.requests))
+        asynchronous = (elapsed, FakeGeminiHandler.max_in_flight)
+        print(f"async        {elapsed:6.2f}s  {args.requests / elapsed:7.1f} req/s  peak in flight {asynchronous[1]}")
+        
+        print(f"\n✅ Async: x{threadpool[0] / asynchronous[0]:.1f} faster, "
+              f"{asynchronous[1]} vs {threadpool[1]} requests in flight")
+    finally:
+        server.shutdown()
+    
+    if args.endpoint:
+        print(f"\n📊 Endpoint {args.endpoint}")
+        elapsed = asyncio.run(run_endpoint(args.endpoint, args.requests))
+        print(f"   {elapsed:.2f}s, {args.requests / elapsed:.1f} req/s")
+
+if __name__ == "__main__":
+    main()
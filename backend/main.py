@@ -13,24 +13,38 @@ import time
 import os
 from sqlalchemy import text
 
-from app.core.database import engine, Base
+from app.core.database import db_manager, Base
+from app.core.migrations import run_migrations
 from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, ClaimStatusUpdate, DashboardStats
 from app.services.email_scheduler import email_scheduler
+from app.services.llm_cache import get_llm_cache
+from app.services.gemini_client import gemini_client
+from app.services.async_llm_service import close_async_llm_service
+from app.services.single_flight import llm_single_flight
+from app.services.claim_triage import claim_triage
+from app.services.ocr_job_queue import ocr_job_queue
+from app.services.replication_service import background_replicator
 from app.api.analyst_api import router as analyst_router
 
 def init_database():
     """Initialize database and create tables"""
     try:
         print("🔍 Testing database connection...")
+        engine = db_manager.get_engine()
         
         # Test connection
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
             print("✅ Database connection successful")
         
-        # Create tables
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database tables created/verified")
+        # Create/upgrade tables and indexes
+        try:
+            run_migrations(engine)
+            print("✅ Database migrations applied")
+        except Exception as e:
+            print(f"⚠️ Database migrations failed, falling back to create_all: {e}")
+            Base.metadata.create_all(bind=engine)
+            print("✅ Database tables created/verified")
         
         return True
         
@@ -44,17 +58,24 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Claims Management System...")
     
-    # Initialize database
-    if not init_database():
-        print("⚠️  Database initialization failed, but continuing...")
+    # Pick the database backend in the background; requests that need it wait for that one probe
+    db_manager.start()
     
-    # Start email scheduler in separate thread
-    def start_scheduler():
-        time.sleep(5)  # Wait for app to be ready
+    # Initialize database, then start the workers that use it, without holding up the first request
+    def start_background_services():
+        if not init_database():
+            print("⚠️  Database initialization failed, but continuing...")
+        
+        # Resume OCR jobs interrupted by the last shutdown
+        ocr_job_queue.requeue_unfinished()
+        
         email_scheduler.start_scheduler()
+        
+        # Keep the SQLite fallback seconds behind the primary
+        background_replicator.start()
     
-    scheduler_thread = threading.Thread(target=start_scheduler, daemon=True)
-    scheduler_thread.start()
+    startup_thread = threading.Thread(target=start_background_services, name="startup", daemon=True)
+    startup_thread.start()
     
     print("✅ System started successfully")
     
@@ -63,6 +84,10 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("🛑 Stopping Claims Management System...")
     email_scheduler.stop_scheduler()
+    ocr_job_queue.shutdown()
+    background_replicator.stop()
+    await close_async_llm_service()
+    db_manager.stop()
     print("✅ System stopped")
 
 # Create FastAPI application
@@ -110,28 +135,41 @@ def health_check():
     """Health check endpoint"""
     from app.core.database import get_current_database_info
     
-    try:
-        # Test database connection
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+    # Do not block the health check on the startup probe
+    if not db_manager.is_resolved:
+        db_status = "resolving"
+    else:
+        try:
+            # Test database connection
+            with db_manager.get_engine().connect() as conn:
+                conn.execute(text("SELECT 1"))
+            db_status = "connected"
+        except Exception as e:
+            db_status = f"error: {str(e)}"
     
     db_info = get_current_database_info()
+    llm_cache = get_llm_cache()
     
     return {
         "status": "healthy",
         "timestamp": time.time(),
         "database": {
             "status": db_status,
+            "role": db_info.get("role"),
+            "pending_writes": db_info.get("pending_writes", 0),
+            "replay_lag_seconds": db_info.get("replay_lag_seconds", 0.0),
+            "replication": background_replicator.stats(),
             "info": db_info
         },
         "services": {
             "email_scheduler": "running" if email_scheduler.is_running else "stopped",
             "gmail_service": "available",
             "llm_service": "available"
-        }
+        },
+        "llm_cache": llm_cache.stats() if llm_cache else {"enabled": False},
+        "gemini": gemini_client.stats(),
+        "llm_coalescing": llm_single_flight.stats(),
+        "claim_triage": claim_triage.stats()
     }
 
 @app.get("/api/status")
@@ -8,6 +8,7 @@ import os
 import sys
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any
 from pathlib import Path
@@ -23,6 +24,8 @@ from app.services.storage_service import StorageService
 from app.services.gemini_ocr_service import GeminiOCRService
 from app.models.claim_models import Document
 from app.core.models import DocumentOCR
+# Limitador compartido de Gemini del backend (solo usa la librería estándar)
+from backend.app.services.gemini_client import gemini_client
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy import text
 
@@ -37,6 +40,8 @@ class StorageDocumentOCRProcessor:
     def __init__(self):
         self.storage_service = StorageService()
         self.gemini_service = GeminiOCRService()
+        # Las llamadas respetan la cuota de Gemini (RPM/TPM), con reintentos ante 429/5xx
+        self.gemini_service.model = gemini_client.wrap(self.gemini_service.model)
         
     def get_documents_from_storage(self) -> List[Dict[str, Any]]:
         """Obtiene la lista de documentos del Google Cloud Storage"""
@@ -115,6 +120,9 @@ class StorageDocumentOCRProcessor:
             
             # Procesar con Gemini OCR usando el método correcto
             ocr_result = self.gemini_service.process_document_image(file_content, filename)
+            if ocr_result.get('error_message'):
+                # Gemini falló tras los reintentos: se guarda como 'failed' y se reintenta en la próxima ejecución
+                raise RuntimeError(ocr_result['error_message'])
             
             processing_time = time.time() - start_time
             
@@ -169,6 +177,43 @@ class StorageDocumentOCRProcessor:
             print(f"❌ Error guardando OCR en DB: {e}")
             return False
     
+    def process_storage_document(self, doc_info: Dict[str, Any]) -> str:
+        """Procesa un documento del storage; devuelve 'success', 'error', 'failed' o 'skipped'"""
+        try:
+            print(f"\n📄 Procesando: {doc_info['name']}")
+            
+            # Buscar documento en la base de datos
+            db_document = self.get_document_from_db(doc_info['name'])
+            
+            if not db_document:
+                print(f"⚠️  Documento no encontrado en DB: {doc_info['name']}")
+                return 'skipped'
+            
+            # Verificar si ya fue procesado
+            if self.check_if_ocr_processed(db_document.id):
+                print(f"⏭️  Documento ya procesado: {doc_info['name']}")
+                return 'skipped'
+            
+            # Descargar documento
+            file_content = self.download_document(doc_info['bucket'], doc_info['name'])
+            if not file_content:
+                print(f"❌ No se pudo descargar: {doc_info['name']}")
+                return 'skipped'
+            
+            # Procesar documento
+            ocr_result = self.process_document_with_gemini(file_content, doc_info['name'])
+            
+            # Guardar resultado
+            if self.save_ocr_result(db_document.id, ocr_result):
+                print(f"✅ Procesado exitosamente: {doc_info['name']}")
+                return 'success'
+            print(f"❌ Error guardando resultado: {doc_info['name']}")
+            return 'error'
+            
+        except Exception as e:
+            print(f"❌ Error procesando {doc_info['name']}: {e}")
+            return 'failed'
+    
     def process_all_documents(self):
         """Procesa todos los documentos del storage con OCR"""
         print("🚀 INICIANDO PROCESAMIENTO OCR DE DOCUMENTOS DEL STORAGE")
@@ -181,51 +226,14 @@ class StorageDocumentOCRProcessor:
             print("📭 No se encontraron documentos para procesar")
             return
         
-        processed_count = 0
-        success_count = 0
-        error_count = 0
+        # Tantos documentos a la vez como llamadas simultáneas permite el cliente de Gemini;
+        # el ritmo lo marca el limitador de cuota, no una pausa fija
+        with ThreadPoolExecutor(max_workers=gemini_client.max_concurrency) as executor:
+            outcomes = list(executor.map(self.process_storage_document, storage_documents))
         
-        for doc_info in storage_documents:
-            try:
-                print(f"\n📄 Procesando: {doc_info['name']}")
-                
-                # Buscar documento en la base de datos
-                db_document = self.get_document_from_db(doc_info['name'])
-                
-                if not db_document:
-                    print(f"⚠️  Documento no encontrado en DB: {doc_info['name']}")
-                    continue
-                
-                # Verificar si ya fue procesado
-                if self.check_if_ocr_processed(db_document.id):
-                    print(f"⏭️  Documento ya procesado: {doc_info['name']}")
-                    continue
-                
-                # Descargar documento
-                file_content = self.download_document(doc_info['bucket'], doc_info['name'])
-                if not file_content:
-                    print(f"❌ No se pudo descargar: {doc_info['name']}")
-                    continue
-                
-                # Procesar documento
-                ocr_result = self.process_document_with_gemini(file_content, doc_info['name'])
-                
-                # Guardar resultado
-                if self.save_ocr_result(db_document.id, ocr_result):
-                    success_count += 1
-                    print(f"✅ Procesado exitosamente: {doc_info['name']}")
-                else:
-                    error_count += 1
-                    print(f"❌ Error guardando resultado: {doc_info['name']}")
-                
-                processed_count += 1
-                
-                # Pausa entre documentos para no sobrecargar la API
-                time.sleep(2)
-                
-            except Exception as e:
-                error_count += 1
-                print(f"❌ Error procesando {doc_info['name']}: {e}")
+        processed_count = sum(1 for outcome in outcomes if outcome in ('success', 'error'))
+        success_count = outcomes.count('success')
+        error_count = outcomes.count('error') + outcomes.count('failed')
         
         print("\n" + "=" * 60)
         print("📊 RESUMEN DEL PROCESAMIENTO")
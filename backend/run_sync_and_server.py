@@ -1,38 +1,27 @@
 #!/usr/bin/env python3
 """
-Run database sync and then start the server
-This script ensures we have local data before starting the API
+Run database sync and the server side by side
+The sync refreshes the local SQLite copy in the background while the API starts serving
 """
 
 import os
 import sys
 import subprocess
-import time
 from pathlib import Path
 
-def run_sync():
-    """Run the database sync script"""
-    print("🔄 Starting database sync...")
+def start_sync():
+    """Start the database sync script without waiting for it"""
+    print("🔄 Starting database sync in the background...")
     
     try:
-        # Run the sync script
-        result = subprocess.run([
+        # Run the sync script; its output goes straight to this console
+        return subprocess.Popen([
             sys.executable, "sync_render_to_sqlite.py"
-        ], capture_output=True, text=True, cwd=Path(__file__).parent)
-        
-        if result.returncode == 0:
-            print("✅ Database sync completed successfully")
-            print(result.stdout)
-            return True
-        else:
-            print("⚠️ Database sync failed, but continuing...")
-            print("STDOUT:", result.stdout)
-            print("STDERR:", result.stderr)
-            return False
-            
+        ], cwd=Path(__file__).parent)
+    
     except Exception as e:
         print(f"⚠️ Error running sync: {e}")
-        return False
+        return None
 
 def run_server():
     """Run the FastAPI server"""
@@ -59,17 +48,14 @@ def main():
     backend_dir = Path(__file__).parent
     os.chdir(backend_dir)
     
-    # Run sync first
-    sync_success = run_sync()
-    
-    if not sync_success:
-        print("⚠️ Sync failed, but starting server anyway...")
-    
-    # Wait a moment
-    time.sleep(2)
+    # Sync alongside the server instead of before it
+    sync_process = start_sync()
     
     # Run server
     run_server()
+    
+    if sync_process and sync_process.poll() is None:
+        sync_process.terminate()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
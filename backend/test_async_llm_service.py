@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test AsyncLLMService against the local fake Gemini server of load_test_llm.py
+"""
+
+import sys
+import time
+import base64
+import asyncio
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.gemini_client import LLMServiceError
+from load_test_llm import FakeGeminiHandler, start_fake_gemini_server, make_service, unlimited_client
+
+def test_many_requests_in_flight():
+    server, base_url = start_fake_gemini_server()
+    try:
+        FakeGeminiHandler.reset(latency=0.3)
+        service = make_service(base_url)
+        
+        async def burst():
+            answers = await asyncio.gather(*(service.analyze_text(f"prompt {i}") for i in range(120)))
+            await service.aclose()
+            return answers
+        
+        start = time.perf_counter()
+        answers = asyncio.run(burst())
+        elapsed = time.perf_counter() - start
+        
+        assert answers[7] == "answer to: prompt 7"
+        assert FakeGeminiHandler.max_in_flight > 100, FakeGeminiHandler.max_in_flight
+        assert elapsed < 1.5, elapsed
+        # The API key is sent in a header, never in the URL
+        assert FakeGeminiHandler.requests_seen[0]["path"] == "/v1beta/models/gemini-1.5-flash:generateContent"
+        assert FakeGeminiHandler.requests_seen[0]["api_key"] == service.api_key
+        print(f"✅ 120 requests in {elapsed:.2f}s, {FakeGeminiHandler.max_in_flight} in flight at once")
+    finally:
+        server.shutdown()
+
+def test_vision_retries_and_errors():
+    server, base_url = start_fake_gemini_server()
+    try:
+        FakeGeminiHandler.reset(latency=0.0, fail_first=2)
+        client = unlimited_client()
+        client.backoff_base = client.backoff_max = 0.01
+        service = make_service(base_url, client)
+        
+        answer = asyncio.run(service.generate_text_with_image_data("read this", b"%PDF-1.7 fake", "application/pdf"))
+        assert answer == "answer to: read this"
+        assert len(FakeGeminiHandler.requests_seen) == 3 and client.stats()["retries"] == 2
+        inline = FakeGeminiHandler.requests_seen[-1]["body"]["contents"][0]["parts"][1]["inline_data"]
+        assert inline["mime_type"] == "application/pdf"
+        assert base64.b64decode(inline["data"]) == b"%PDF-1.7 fake"
+        
+        # A server that never answers successfully ends in LLMServiceError, not ""
+        FakeGeminiHandler.reset(latency=0.0, fail_first=100)
+        client.max_retries = 1
+        try:
+            asyncio.run(service.analyze_text("hello"))
+            raise AssertionError("expected LLMServiceError")
+        except LLMServiceError as e:
+            assert e.status == 429
+            assert service.api_key not in str(e) and service.api_key not in str(e.__cause__), str(e)
+        print("✅ Vision payload sent inline, 429s retried, persistent failures raise LLMServiceError")
+    finally:
+        server.shutdown()
+
+class DictCache:
+    def __init__(self):
+        self.values = {}
+    
+    def get(self, key):
+        return self.values.get(key)
+    
+    def set(self, key, value):
+        self.values[key] = value
+
+def test_cache_bypass():
+    server, base_url = start_fake_gemini_server()
+    try:
+        FakeGeminiHandler.reset(latency=0.0)
+        service = make_service(base_url)
+        service.cache = DictCache()
+        
+        async def calls():
+            answers = [await service.analyze_text("hello"), await service.analyze_text("hello")]
+            answers.append(await service.analyze_text("hello", use_cache=False))
+            answers.append(await service.generate_text("hello"))
+            await service.aclose()
+            return answers
+        
+        assert asyncio.run(calls()) == ["answer to: hello"] * 4
+        assert len(FakeGeminiHandler.requests_seen) == 2, FakeGeminiHandler.requests_seen
+        print("✅ use_cache=False calls Gemini even when the answer is cached")
+    finally:
+        server.shutdown()
+
+def main():
+    print("🧪 ASYNC LLM SERVICE TEST")
+    print("=" * 50)
+    test_many_requests_in_flight()
+    test_vision_retries_and_errors()
+    test_cache_bypass()
+    print("\n🎉 All async LLM service tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Test the staged attachment pipeline against the local fake Gmail server
+Storage and OCR are slow fakes, so overlapping stages show up in the wall time
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+import httplib2
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, DocumentBlob
+from app.services.attachment_pipeline import AttachmentPipeline
+from app.services.document_blob_store import ocr_failed
+from app.services.enhanced_ocr_service import EnhancedOCRService
+from app.services.email_processor import EmailProcessor
+from app.services.gmail_service import GmailService
+from test_gmail_batch_fetch import FakeGmailHandler, start_fake_gmail_server
+
+ATTACHMENTS = 8
+STORAGE_SECONDS = 0.1
+OCR_SECONDS = 0.2
+
+class SlowStorage:
+    """Stands in for StorageService; counts how many uploads run at once and on how many clients"""
+    
+    def __init__(self, parent=None):
+        self.client = True
+        self.parent = parent
+        self.workers = []
+        self.in_use = False
+        self.shared = False
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+    
+    def for_worker(self):
+        worker = SlowStorage(self)
+        self.workers.append(worker)
+        return worker
+    
+    def upload_bytes(self, data, claim_id, document_type, original_filename, content_type=None):
+        root = self.parent or self
+        with root.lock:
+            root.shared = root.shared or self.in_use
+            self.in_use = True
+            root.active += 1
+            root.max_active = max(root.max_active, root.active)
+        time.sleep(STORAGE_SECONDS)
+        with root.lock:
+            self.in_use = False
+            root.active -= 1
+        path = f"documents/{claim_id}/{original_filename}"
+        return {"storage_url": f"gs://bucket/{path}", "storage_path": path, "filename": original_filename, "file_size": len(data)}
+
+class SlowOCR:
+    """Stands in for EnhancedOCRService"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def process_document_with_gemini(self, image_data, filename, document_type="OTHER", mime_type=None):
+        self.calls += 1
+        time.sleep(OCR_SECONDS)
+        return {"extracted_text": f"text of {filename}", "structured_data": {"bytes": len(image_data)},
+                "key_information": {"total_amount": "12.50"}}
+
+def claim_payload(attachment_ids=None):
+    attachment_ids = attachment_ids or [f"receipt-{i}" for i in range(ATTACHMENTS)]
+    parts = [{"mimeType": "text/plain", "filename": "", "body": {"data": ""}}]
+    parts += [
+        {"mimeType": "image/jpeg", "filename": f"receipt-{i}.jpg", "body": {"attachmentId": attachment_id, "size": 16}}
+        for i, attachment_id in enumerate(attachment_ids)
+    ]
+    return {"mimeType": "multipart/mixed", "headers": [], "parts": parts}
+
+def test_pipeline_overlaps_stages():
+    server, base_url = start_fake_gmail_server()
+    try:
+        FakeGmailHandler.requests_seen = []
+        gmail = GmailService(http=httplib2.Http(), api_endpoint=base_url)
+        storage = SlowStorage()
+        pipeline = AttachmentPipeline(gmail, storage, SlowOCR())
+        
+        started = time.perf_counter()
+        results = pipeline.process("m4", claim_payload(), "CLM-1")
+        elapsed = time.perf_counter() - started
+        
+        sequential = ATTACHMENTS * (STORAGE_SECONDS + OCR_SECONDS)
+        assert [r["filename"] for r in results] == [f"receipt-{i}.jpg" for i in range(ATTACHMENTS)]
+        assert all(r["storage"] and r["ocr_result"] and "data" not in r for r in results)
+        assert storage.max_active > 1
+        assert len(FakeGmailHandler.requests_seen) == ATTACHMENTS // pipeline.fetch_batch_size
+        assert elapsed < sequential / 2, (elapsed, sequential)
+        
+        # Concurrent uploads each had a storage client of their own, kept for the next email
+        workers = len(storage.workers)
+        assert not storage.shared and 1 < workers <= pipeline.storage_concurrency, workers
+        pipeline.process("m5", claim_payload(), "CLM-2")
+        assert not storage.shared and len(storage.workers) == workers
+        print(f"✅ Pipeline: {ATTACHMENTS} attachments in {elapsed:.2f}s (sequential: {sequential:.2f}s)")
+    finally:
+        server.shutdown()
+
+def test_documents_committed_with_claim():
+    server, base_url = start_fake_gmail_server()
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        email_record = Email(gmail_id="m4", thread_id="t-m4", from_email="a@example.com",
+                             to_email="claims@example.com", subject="Claim notification")
+        db.add(email_record)
+        db.flush()
+        claim = ClaimSubmission(email_id=email_record.id, customer_name="Ana", customer_email="a@example.com",
+                                claim_type="Lost Baggage")
+        db.add(claim)
+        db.commit()
+        
+        gmail = GmailService(http=httplib2.Http(), api_endpoint=base_url)
+        storage = SlowStorage()
+        processor = EmailProcessor(db, llm_service=object(), gmail_service=gmail, storage_service=storage)
+        processor.attachment_pipeline = AttachmentPipeline(gmail, storage, SlowOCR())
+        processor.process_email_attachments(email_record, claim_payload())
+        
+        documents = db.query(DocumentAgentOCR).order_by(DocumentAgentOCR.id).all()
+        assert len(documents) == ATTACHMENTS
+        assert all(d.claim_submission_id == claim.id and d.email_id == email_record.id for d in documents)
+        assert documents[0].ocr_text == "text of receipt-0.jpg" and documents[0].is_processed
+        assert documents[0].storage_path == f"documents/{claim.claim_number}/receipt-0.jpg"
+        print(f"✅ {len(documents)} documents committed for claim {claim.claim_number}")
+    finally:
+        db.close()
+        server.shutdown()
+
+def test_identical_content_is_processed_once():
+    """A receipt re-sent in a follow-up (and twice in one email) is uploaded and read only once"""
+    server, base_url = start_fake_gmail_server()
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        first = Email(gmail_id="m1", thread_id="t-1", from_email="a@example.com",
+                      to_email="claims@example.com", subject="Claim notification")
+        follow_up = Email(gmail_id="m2", thread_id="t-1", from_email="a@example.com",
+                          to_email="claims@example.com", subject="Re: Claim notification")
+        db.add_all([first, follow_up])
+        db.flush()
+        claim = ClaimSubmission(email_id=first.id, customer_name="Ana", customer_email="a@example.com",
+                                claim_type="Lost Baggage")
+        db.add(claim)
+        db.commit()
+        
+        gmail = GmailService(http=httplib2.Http(), api_endpoint=base_url)
+        storage = SlowStorage()
+        ocr = SlowOCR()
+        processor = EmailProcessor(db, llm_service=object(), gmail_service=gmail, storage_service=storage)
+        processor.attachment_pipeline = AttachmentPipeline(gmail, storage, ocr)
+        
+        processor.process_email_attachments(first, claim_payload(["receipt-a", "receipt-b", "receipt-a"]))
+        assert ocr.calls == 2, ocr.calls
+        processor.process_email_attachments(follow_up, claim_payload(["receipt-b"]))
+        assert ocr.calls == 2, ocr.calls
+        
+        documents = db.query(DocumentAgentOCR).order_by(DocumentAgentOCR.id).all()
+        assert len(documents) == 4
+        assert db.query(DocumentBlob).count() == 2
+        assert documents[3].blob_id == documents[1].blob_id
+        assert documents[3].storage_path == documents[1].storage_path
+        assert documents[3].ocr_text == documents[1].ocr_text and documents[3].is_processed
+        print(f"✅ Deduplication: {len(documents)} documents, 2 blobs, {ocr.calls} Gemini calls")
+    finally:
+        db.close()
+        server.shutdown()
+
+class FlakyOCR(SlowOCR):
+    """Gemini fails on the first call: EnhancedOCRService then returns its failure placeholder"""
+    
+    def process_document_with_gemini(self, image_data, filename, document_type="OTHER", mime_type=None):
+        self.calls += 1
+        if self.calls == 1:
+            return EnhancedOCRService._get_default_ocr_result(None, filename, document_type)
+        return {"extracted_text": f"text of {filename}", "confidence": 0.9}
+
+def test_failed_ocr_is_not_reused():
+    """A failed OCR is not stored for the content, so the next copy is read again"""
+    server, base_url = start_fake_gmail_server()
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        first = Email(gmail_id="m1", thread_id="t-1", from_email="a@example.com",
+                      to_email="claims@example.com", subject="Claim notification")
+        follow_up = Email(gmail_id="m2", thread_id="t-1", from_email="a@example.com",
+                          to_email="claims@example.com", subject="Re: Claim notification")
+        db.add_all([first, follow_up])
+        db.flush()
+        db.add(ClaimSubmission(email_id=first.id, customer_name="Ana", customer_email="a@example.com",
+                               claim_type="Lost Baggage"))
+        db.commit()
+        
+        gmail = GmailService(http=httplib2.Http(), api_endpoint=base_url)
+        storage = SlowStorage()
+        ocr = FlakyOCR()
+        processor = EmailProcessor(db, llm_service=object(), gmail_service=gmail, storage_service=storage)
+        processor.attachment_pipeline = AttachmentPipeline(gmail, storage, ocr)
+        
+        processor.process_email_attachments(first, claim_payload(["receipt-a"]))
+        blob = db.query(DocumentBlob).one()
+        assert blob.ocr_result is None
+        assert not db.query(DocumentAgentOCR).one().is_processed
+        
+        processor.process_email_attachments(follow_up, claim_payload(["receipt-a"]))
+        assert ocr.calls == 2
+        db.refresh(blob)
+        assert blob.ocr_result["extracted_text"] == "text of receipt-0.jpg"
+        
+        # A placeholder stored before failures were flagged is not reused either
+        legacy = {"extracted_text": "Processing failed", "confidence": 0.0}
+        assert ocr_failed(legacy) and not ocr_failed(blob.ocr_result)
+        print("✅ Failed OCR: not stored, the next copy of the file is read again")
+    finally:
+        db.close()
+        server.shutdown()
+
+def main():
+    print("🧪 ATTACHMENT PIPELINE TEST")
+    print("=" * 50)
+    test_pipeline_overlaps_stages()
+    test_documents_committed_with_claim()
+    test_identical_content_is_processed_once()
+    test_failed_ocr_is_not_reused()
+    print("\n🎉 All attachment pipeline tests passed")
+
+if __name__ == "__main__":
+    main()
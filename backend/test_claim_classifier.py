@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test the shared claim keyword classifier
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.claim_classifier import ClaimKeywordClassifier, claim_classifier
+from app.services.email_processor import EmailProcessor
+from app.services.email_scheduler import EmailScheduler
+from benchmark_claim_classifier import scheduler_loop
+
+def test_matches_whole_words_and_phrases():
+    result = claim_classifier.classify(
+        "Travel Insurance Claim - flight cancelled",
+        "My flight was delayed.\nI ask for compensation for the\n  flight delays and my LOSSES."
+    )
+    assert result.matched == ["travel insurance claim", "delay", "compensation", "flight delay", "loss"], result.matched
+    assert result.score == 9.0 and result.is_claim
+    
+    # Substrings of other words are not keywords
+    assert not claim_classifier.is_claim("Newsletter", "Disclaimer: reclaim your glossary points")
+    assert claim_classifier.is_claim("Claims", "")
+    print("✅ Whole words, plurals and multi-word phrases are matched")
+
+def test_inflections_the_old_loop_caught():
+    # The old scheduler loop matched substrings, so these reached the LLM
+    emails = {
+        "My flight was delayed 8 hours": ["delay"],
+        "Flights delayed by the strike": ["delay"],
+        "Luggage damaged at the airport": ["damage"],
+        "I claimed the costs last week": ["claim"],
+        "We are claiming our deposit back": ["claim"],
+    }
+    for subject, matched in emails.items():
+        assert scheduler_loop(subject, ""), subject
+        assert claim_classifier.classify(subject, "").matched == matched, subject
+        assert claim_classifier.is_claim(subject, "")
+    
+    # Forms that are not a substring of their keyword: missed before, found now
+    emails = {
+        "I was injured on my trip": ["injury"],
+        "Injuries after a fall at the hotel": ["injury"],
+        "The airline lost my bag": ["loss"],
+        "Two emergencies in one week": ["emergency"],
+    }
+    for subject, matched in emails.items():
+        assert claim_classifier.classify(subject, "").matched == matched, subject
+    assert claim_classifier.classify("Hello", "the flight delayed twice").matched == ["flight delay"]
+    
+    # Whole words still: other words sharing a stem are not keywords
+    assert not claim_classifier.is_claim("Closed for the holidays", "Police parade downtown, the claimant fair")
+    print("✅ -s, -ed, -ing, -ies and lost/loss forms are matched")
+
+def test_html_markup_is_ignored():
+    body = ('<html><head><style>.policy { color: red }</style></head><body>'
+            '<a href="https://shop.example.com/privacy-policy" title="claim">Privacy</a>'
+            '<!-- insurance --> Weekly deals &amp; more</body></html>')
+    assert claim_classifier.classify("Weekly deals", body).matched == []
+    
+    body = '<p style="margin:0">Please process my <b>insurance claim</b></p>'
+    assert claim_classifier.classify("Hello", body).matched == ["insurance claim"]
+    
+    # A bare "<" in a plain-text body is not a tag
+    assert claim_classifier.classify("hi", "price x < 5 then my claim for trip delay").matched == ["claim", "trip delay"]
+    
+    # The markup is searched once, not again for every keyword found in a large newsletter
+    rows = '<tr><td style="padding:8px"><a href="https://example.com/policy">Insurance deals</a></td></tr>' * 12000
+    body = f"<html><head><style>.policy {{ margin: 0 }}</style></head><body><table>{rows}</table></body></html>"
+    strict = ClaimKeywordClassifier(threshold=3.0)
+    start = time.perf_counter()
+    assert strict.classify("Weekly deals", body).matched == ["insurance"]
+    assert not strict.is_claim("Weekly deals", body)
+    assert time.perf_counter() - start < 2
+    print("✅ Tags, styles, scripts and comments are not text")
+
+def test_threshold():
+    strict = ClaimKeywordClassifier(threshold=3.0)
+    assert not strict.is_claim("Our privacy policy changed", "Coverage of your account")
+    assert strict.is_claim("Trip interruption", "")
+    assert strict.is_claim("Policy coverage", "An accident")
+    assert strict.classify("Policy coverage", "An accident").score == 3.0
+    print("✅ Broad terms add up to the threshold, claim phrases reach it alone")
+
+def test_scheduler_and_processor_share_the_list():
+    scheduler = EmailScheduler.__new__(EmailScheduler)
+    scheduler.classifier = claim_classifier
+    processor = EmailProcessor.__new__(EmailProcessor)
+    processor.classifier = claim_classifier
+    for subject in ("Flight cancellation", "Medical claim", "Hotel problem", "Monthly statement"):
+        assert scheduler._is_claim_email(subject, "") == processor.is_claim_notification(subject, "")
+    print("✅ EmailScheduler and EmailProcessor classify the same way")
+
+def main():
+    print("🧪 CLAIM CLASSIFIER TEST")
+    print("=" * 50)
+    test_matches_whole_words_and_phrases()
+    test_inflections_the_old_loop_caught()
+    test_html_markup_is_ignored()
+    test_threshold()
+    test_scheduler_and_processor_share_the_list()
+    print("\n🎉 All claim classifier tests passed")
+
+if __name__ == "__main__":
+    main()
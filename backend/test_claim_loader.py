@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test that the claim aggregate loads in a fixed number of queries
+Claim detail and document endpoints must not issue one query per document or status update,
+and the OCR text stays out of the list views unless it is asked for
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+
+from app.models.email_models import DocumentAgentOCR, ClaimStatusUpdate
+from app.services.claim_loader import OCR_PREVIEW_CHARS, load_claim_aggregate, load_claim_documents, ocr_preview
+from test_query_plans import build_database, capture
+from test_claims_list import make_client
+
+LONG_OCR_TEXT = "Hotel Madrid, 2 nights, total 240.00 EUR. " * 40
+
+def add_history(Session, claim_id, documents):
+    """More documents (with long OCR text) and status updates for one claim"""
+    db = Session()
+    claim_email_id = db.query(DocumentAgentOCR.email_id).filter(DocumentAgentOCR.claim_submission_id == claim_id).scalar()
+    start = datetime(2024, 2, 1)
+    for i in range(documents):
+        db.add(DocumentAgentOCR(
+            claim_submission_id=claim_id, email_id=claim_email_id, original_filename=f"receipt-{i}.png",
+            file_type="image/png", file_size=10, storage_url="u", storage_path="p", ocr_text=LONG_OCR_TEXT,
+            structured_data='{"amounts": ["240.00"]}', uploaded_at=start + timedelta(hours=i)
+        ))
+        db.add(ClaimStatusUpdate(claim_submission_id=claim_id, old_status="PENDING", new_status="UNDER_REVIEW"))
+    db.commit()
+    db.close()
+
+def selects(statements):
+    return [statement for statement, _ in statements if statement.lstrip().upper().startswith("SELECT")]
+
+def check_aggregate(engine, Session):
+    db = Session()
+    try:
+        with capture(engine) as statements:
+            claim = load_claim_aggregate(db, 3)
+            email = claim.initial_email
+            previews = [ocr_preview(doc) for doc in claim.documents]
+            history = [update.new_status for update in claim.status_updates]
+        
+        assert len(selects(statements)) == 2, selects(statements)
+        assert email.gmail_id == "g2" and len(previews) == 11 and len(history) == 11
+        
+        # Without include_ocr the full text is never loaded, only a preview
+        long_docs = [doc for doc in claim.documents if doc.original_filename.startswith("receipt-")]
+        assert all("ocr_text" not in doc.__dict__ for doc in long_docs)
+        assert ocr_preview(long_docs[0]) == LONG_OCR_TEXT[:OCR_PREVIEW_CHARS] + "..."
+        assert "total 10" in previews
+    finally:
+        db.close()
+    
+    db = Session()
+    try:
+        with capture(engine) as statements:
+            claim = load_claim_aggregate(db, 3, include_ocr=True)
+            texts = [doc.ocr_text for doc in claim.documents]
+        assert len(selects(statements)) == 2 and LONG_OCR_TEXT in texts
+        
+        with capture(engine) as statements:
+            documents = load_claim_documents(db, 3, include_ocr=False)
+            [ocr_preview(doc) for doc in documents]
+        assert len(selects(statements)) == 1
+        uploaded = [doc.uploaded_at for doc in documents]
+        assert uploaded == sorted(uploaded, reverse=True)
+    finally:
+        db.close()
+    print("✅ Claim, email, 11 documents and 11 status updates in 2 queries; documents list in 1")
+
+def check_endpoints_do_not_grow_with_documents(engine, Session):
+    client = make_client(Session)
+    
+    def queries(path, params=None):
+        with capture(engine) as statements:
+            response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        return len(selects(statements))
+    
+    # Claim 3 has 11 documents, claim 4 only one
+    for path, params in (("/api/analyst/claims/{}", None), ("/api/analyst/claims/{}", {"include_ocr": True}),
+                         ("/api/analyst/claims/{}/documents", None)):
+        many, one = queries(path.format(3), params), queries(path.format(4), params)
+        assert many == one, (path, params, many, one)
+    print("✅ Claim detail and documents endpoints: same query count for 1 and 11 documents")
+
+def test_claim_loader():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = build_database(os.path.join(tmp, "loader.db"))
+        try:
+            add_history(Session, 3, documents=10)
+            check_aggregate(engine, Session)
+            check_endpoints_do_not_grow_with_documents(engine, Session)
+        finally:
+            engine.dispose()
+
+def main():
+    print("🧪 CLAIM LOADER TEST")
+    print("=" * 50)
+    test_claim_loader()
+    print("\n🎉 All claim loader tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test the local claim triage model and the gate in front of the LLM
+"""
+
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.email_models import Base, Email, ClaimSubmission
+from app.services.email_processor import EmailProcessor
+from app.services.claim_triage import ClaimTriage, ClaimTriageModel, evaluate, load_training_examples, tokenize
+from train_claim_triage import synthetic_examples, split
+
+def test_tokenize():
+    features = tokenize("Flight delay claim", "<p style='color:red'>My flight was cancelled</p>")
+    assert features["s:claim"] == 1 and features["flight"] == 1
+    assert features["flight was"] == 1
+    assert "style" not in features and "color" not in features
+    print("✅ Subject words, body words and pairs, markup dropped")
+
+def test_training_separates_claims():
+    train, test = split(synthetic_examples(1200), 0.25)
+    model = ClaimTriageModel.train(train, epochs=10)
+    
+    claim = model.score("Trip cancellation", "I had to cancel my trip because my mother fell ill. Policy POL-2024-001")
+    newsletter = model.score("Update to our privacy policy", "We updated our privacy policy and terms of service.")
+    assert claim > 0.9 and newsletter < 0.1, (claim, newsletter)
+    
+    metrics = evaluate(model, test, 0.1)
+    assert metrics["claim_recall"] == 1.0 and metrics["non_claims_skipped_rate"] > 0.9, metrics
+    print(f"✅ Held out: {metrics['non_claims_skipped']} non-claims skip the LLM, recall {metrics['claim_recall']}")
+
+def test_save_and_load():
+    model = ClaimTriageModel.train(synthetic_examples(300), epochs=5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.json")
+        model.save(path)
+        loaded = ClaimTriageModel.load(path)
+    
+    for subject, body, _ in synthetic_examples(20, seed=99):
+        assert abs(model.score(subject, body) - loaded.score(subject, body)) < 1e-4
+    assert loaded.metadata["examples"] == 300
+    print("✅ A saved model scores the same when loaded")
+
+def test_gate():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.json")
+        triage = ClaimTriage(model_path=path)
+        triage.enabled = True
+        
+        # No model: every email goes to the LLM, as before
+        email = {"subject": "Your weekly deals", "body_text": "Save 20% this weekend"}
+        assert triage.should_process(email) and "triage_score" not in email
+        
+        ClaimTriageModel.train(synthetic_examples(600), epochs=10).save(path)
+        triage.reload()
+        newsletter = {"subject": "Update to our privacy policy",
+                      "body_text": "We updated our privacy policy and terms of service."}
+        claim = {"subject": "Flight delay claim",
+                 "body_text": "My flight IB3170 was delayed nine hours and I missed my connection to Rome."}
+        assert not triage.should_process(newsletter)
+        assert triage.should_process(claim)
+        assert newsletter["triage_score"] < triage.skip_below <= claim["triage_score"]
+        
+        stats = triage.stats()
+        assert stats["model_loaded"] and stats["scored"] == 2 and stats["skipped"] == 1, stats
+    print("✅ Without a model everything goes on; with one, only confident non-claims skip")
+
+def test_training_labels():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        def email(gmail_id, subject, **fields):
+            return Email(gmail_id=gmail_id, thread_id=f"t-{gmail_id}", from_email="customer@example.com",
+                         to_email="claims@example.com", subject=subject, body_text=f"{subject} body", **fields)
+        
+        def claim(email_id, status):
+            return ClaimSubmission(email_id=email_id, customer_name="Ana Lopez", customer_email="customer@example.com",
+                                   claim_type="trip_cancellation", status=status)
+        
+        rows = [
+            # Recorded by the single-pass analysis
+            email("a", "Claim", is_claim=True),
+            email("b", "Deals", is_claim=False),
+            # Processed before is_claim existed: a claim when an analyst handled the thread
+            email("c", "Accident", is_first_notification=True),
+            email("d", "Policy", is_first_notification=True),
+            # Never processed
+            email("e", "Hello"),
+        ]
+        db.add_all(rows)
+        db.flush()
+        db.add_all([claim(rows[2].id, "APPROVED"), claim(rows[3].id, "PENDING")])
+        db.commit()
+        
+        labels = {subject: label for subject, _, label in load_training_examples(db)}
+        assert labels == {"Claim": 1, "Deals": 0, "Accident": 1}, labels
+    finally:
+        db.close()
+    print("✅ Labels from is_claim and analyst-handled claim threads")
+
+class StubLLM:
+    def __init__(self, is_claim):
+        self.is_claim = is_claim
+    
+    def analyze_text(self, prompt):
+        return json.dumps({"is_claim": self.is_claim, "notification_type": "FIRST", "customer_name": "Ana Lopez",
+                           "claim_type": "Trip Cancellation", "summary": "Flight cancelled"})
+
+class RecordingGmail:
+    def __init__(self):
+        self.sent = []
+    
+    def send_email(self, to_email, subject, body, *args, **kwargs):
+        self.sent.append(to_email)
+        return True
+
+def test_llm_verdict_stops_non_claims():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        for gmail_id, is_claim in (("n1", False), ("c1", True)):
+            gmail = RecordingGmail()
+            processor = EmailProcessor(db, llm_service=StubLLM(is_claim), gmail_service=gmail,
+                                       storage_service=object(), single_pass=True)
+            processor.process_email_attachments = lambda *args, **kwargs: None
+            email_record = processor.claim_email({"id": gmail_id, "threadId": f"t-{gmail_id}", "subject": "Travel deals",
+                                                  "from": "shop@example.com", "to": "claims@example.com",
+                                                  "body_text": "Travel insurance from $9"})
+            processor.process_claim_email(email_record)
+            
+            claims = db.query(ClaimSubmission).filter(ClaimSubmission.email_id == email_record.id).count()
+            assert email_record.is_processed and email_record.is_claim is is_claim
+            assert claims == int(is_claim) and len(gmail.sent) == int(is_claim), (gmail_id, claims, gmail.sent)
+    finally:
+        db.close()
+    print("✅ The LLM's is_claim=false stops the claim flow: no claim, no reply")
+
+def main():
+    print("🧪 CLAIM TRIAGE TEST")
+    print("=" * 50)
+    test_tokenize()
+    test_training_separates_claims()
+    test_save_and_load()
+    test_gate()
+    test_training_labels()
+    test_llm_verdict_stops_non_claims()
+    print("\n🎉 All claim triage tests passed")
+
+if __name__ == "__main__":
+    main()
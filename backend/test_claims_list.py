@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test the claims list endpoint: keyset cursor pages, ?fields= projection and the count modes
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import get_db
+from app.models.email_models import ClaimSubmission
+from app.api import analyst_api
+from test_query_plans import build_database
+
+def make_client(Session):
+    app = FastAPI()
+    app.include_router(analyst_api.router)
+    
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+def check_cursor_round_trip(client):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 6, "count": "none"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/analyst/claims", params=params).json()
+        ids += [claim["id"] for claim in page["claims"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    
+    # Newest first, every claim exactly once
+    assert ids == list(range(20, 0, -1)), ids
+    
+    pending = client.get("/api/analyst/claims", params={"limit": 4, "status": "PENDING", "count": "none"}).json()
+    rest = client.get("/api/analyst/claims", params={"limit": 50, "status": "PENDING", "count": "none",
+                                                     "cursor": pending["next_cursor"]}).json()
+    statuses = {claim["status"] for claim in pending["claims"] + rest["claims"]}
+    assert len(pending["claims"]) + len(rest["claims"]) == 13 and statuses == {"PENDING"}
+    assert rest["next_cursor"] is None
+    
+    assert client.get("/api/analyst/claims", params={"cursor": "not-a-cursor"}).status_code == 400
+    print("✅ Cursor pages cover every claim once, newest first, with and without filters")
+
+def check_projection(client):
+    page = client.get("/api/analyst/claims", params={"limit": 2, "fields": "id,status,traffic_light"}).json()
+    assert [set(claim) for claim in page["claims"]] == [{"id", "status", "traffic_light"}] * 2
+    assert page["claims"][0]["traffic_light"] is None
+    
+    assert client.get("/api/analyst/claims", params={"fields": "id,password"}).status_code == 400
+    print("✅ ?fields= returns only the requested columns and rejects unknown ones")
+
+def check_count_modes(client, Session):
+    def total(**params):
+        page = client.get("/api/analyst/claims", params={"limit": 1, **params}).json()
+        return page["total"], page["total_is_estimate"]
+    
+    assert total() == (20, False)
+    assert total(status="APPROVED", count="exact") == (7, False)
+    assert total(count="none") == (None, False)
+    assert total(count="estimated") == (20, True)
+    assert total(status="APPROVED", count="estimated") == (7, True)
+    
+    # Filtered by priority: a briefly cached COUNT(*), so a new claim shows up only later
+    analyst_api._claim_count_cache.clear()
+    assert total(priority="HIGH", count="estimated") == (5, True)
+    db = Session()
+    for priority in ("HIGH", "CRITICAL"):
+        db.add(ClaimSubmission(email_id=1, customer_name="Ana", customer_email="a@example.com",
+                               claim_type="Trip Delay", priority=priority))
+    db.commit()
+    db.close()
+    assert total(priority="HIGH", count="estimated") == (5, True)
+    assert total(priority="HIGH") == (6, False)
+    
+    # Values outside the known statuses and priorities are counted, never cached
+    assert total(priority="CRITICAL", count="estimated") == (1, True)
+    assert list(analyst_api._claim_count_cache) == [(None, "HIGH")]
+    print("✅ count=exact, estimated (materialized stats or cached COUNT) and none")
+
+def check_limit_bounds(client):
+    for limit in (0, -1, 201):
+        response = client.get("/api/analyst/claims", params={"limit": limit})
+        assert response.status_code == 422, (limit, response.status_code)
+    assert client.get("/api/analyst/claims", params={"offset": -1}).status_code == 422
+    assert len(client.get("/api/analyst/claims", params={"limit": 200}).json()["claims"]) == 20
+    print("✅ limit is bounded to 1-200 and offset cannot be negative")
+
+def test_claims_list():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = build_database(os.path.join(tmp, "claims.db"))
+        try:
+            client = make_client(Session)
+            check_cursor_round_trip(client)
+            check_projection(client)
+            check_limit_bounds(client)
+            check_count_modes(client, Session)
+        finally:
+            engine.dispose()
+
+def main():
+    print("🧪 CLAIMS LIST TEST")
+    print("=" * 50)
+    test_claims_list()
+    print("\n🎉 All claims list tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test the materialized dashboard stats: deltas applied after commit match a full recompute,
+rolled-back writes leave the counters alone, and write transactions never touch the row
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, DashboardStats
+from app.services.dashboard_stats_service import dashboard_stats
+
+def make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(bind=engine)
+
+def counters(db):
+    """The dashboard payload without its timestamps"""
+    db.expire_all()
+    snapshot = dashboard_stats.to_dict(db.query(DashboardStats).one())
+    snapshot.pop("last_updated")
+    snapshot.pop("computed_at")
+    return snapshot
+
+def add_email(db, gmail_id, processed=False):
+    email = Email(gmail_id=gmail_id, thread_id=f"t-{gmail_id}", from_email="a@example.com",
+                  to_email="claims@example.com", subject="Claim", is_processed=processed)
+    db.add(email)
+    db.flush()
+    dashboard_stats.on_email_created(db, processed=processed)
+    return email
+
+def add_claim(db, email, amount, status="PENDING"):
+    claim = ClaimSubmission(email_id=email.id, customer_name="Ana", customer_email="a@example.com",
+                            claim_type="Trip Delay", status=status, estimated_amount=amount)
+    db.add(claim)
+    dashboard_stats.on_claim_created(db, status, amount)
+    return claim
+
+def test_deltas_match_recompute():
+    engine, Session = make_session()
+    db = Session()
+    try:
+        dashboard_stats.recompute(db)
+        
+        for i in range(6):
+            email = add_email(db, f"m{i}")
+            claim = add_claim(db, email, 100.0 * (i + 1))
+            db.add(DocumentAgentOCR(claim_submission=claim, email_id=email.id, original_filename="r.png",
+                                    file_type="image/png", file_size=1, storage_url="u", storage_path="p"))
+            dashboard_stats.on_document_created(db)
+            db.commit()
+        
+        add_email(db, "done", processed=True)
+        email = db.query(Email).filter(Email.gmail_id == "m0").one()
+        email.is_processed = True
+        dashboard_stats.on_email_processed(db)
+        
+        for claim_id, status in ((1, "APPROVED"), (2, "REJECTED"), (3, "APPROVED")):
+            claim = db.get(ClaimSubmission, claim_id)
+            dashboard_stats.on_claim_status_changed(db, claim.status, status, claim.estimated_amount)
+            claim.status = status
+        db.commit()
+        # Approved, then back under review
+        claim = db.get(ClaimSubmission, 3)
+        dashboard_stats.on_claim_status_changed(db, claim.status, "UNDER_REVIEW", claim.estimated_amount)
+        claim.status = "UNDER_REVIEW"
+        db.commit()
+        
+        incremental = counters(db)
+        assert incremental["claims_summary"]["total_claims"] == 6
+        assert incremental["financial_summary"]["total_amount_approved"] == 100.0
+        assert incremental["processing_summary"]["processed_emails"] == 2
+        
+        dashboard_stats.recompute(db)
+        assert counters(db) == incremental, (incremental, counters(db))
+    finally:
+        db.close()
+        engine.dispose()
+    print("✅ Counters kept by deltas equal a full recompute")
+
+def test_rolled_back_writes_are_not_counted():
+    engine, Session = make_session()
+    db = Session()
+    try:
+        dashboard_stats.recompute(db)
+        before = counters(db)
+        
+        add_claim(db, add_email(db, "m1"), 50.0)
+        db.rollback()
+        
+        # A session closed without committing drops its deltas too
+        add_email(db, "m2")
+        db.close()
+        
+        db = Session()
+        assert counters(db) == before
+        add_email(db, "m3")
+        db.commit()
+        assert counters(db)["processing_summary"]["total_emails"] == 1
+        
+        dashboard_stats.recompute(db)
+        assert counters(db)["processing_summary"]["total_emails"] == 1
+    finally:
+        db.close()
+        engine.dispose()
+    print("✅ Deltas of rolled-back or abandoned transactions are dropped")
+
+def test_write_transactions_do_not_touch_the_row():
+    engine, Session = make_session()
+    db = Session()
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    try:
+        dashboard_stats.recompute(db)
+        event.listen(engine, "before_cursor_execute", record)
+        
+        add_claim(db, add_email(db, "m1"), 75.0)
+        db.flush()
+        assert not [s for s in statements if "DASHBOARD_STATS" in s], statements
+        
+        db.commit()
+        updates = [s for s in statements if s.startswith("UPDATE") and "DASHBOARD_STATS" in s]
+        assert len(updates) == 1, updates
+        assert counters(db)["claims_summary"]["total_claims"] == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        db.close()
+        engine.dispose()
+    print("✅ The stats row is updated once, after the write transaction committed")
+
+def main():
+    print("🧪 DASHBOARD STATS TEST")
+    print("=" * 50)
+    test_deltas_match_recompute()
+    test_rolled_back_writes_are_not_counted()
+    test_write_transactions_do_not_touch_the_row()
+    print("\n🎉 All dashboard stats tests passed")
+
+if __name__ == "__main__":
+    main()
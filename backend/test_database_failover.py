@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Test runtime failover to the SQLite replica, write journaling and failback with replay
+Two SQLite files stand in for Render PostgreSQL and the replica; the outage is simulated
+by making the primary file impossible to open
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine, select, text
+
+from app.core.database import Base, DatabaseManager
+from app.core.migrations import run_migrations
+from app.core.write_journal import JOURNAL_TABLE, replay_pending
+from app.models.email_models import Email, ClaimSubmission, ClaimStatusUpdate, OCRJob
+
+def new_session(manager):
+    """What get_db does: connect first, retry once on the replica if the primary is gone"""
+    db = manager.session_factory()
+    try:
+        db.connection()
+    except Exception:
+        db.close()
+        db = manager.session_factory()
+    return db
+
+def seed_primary(path):
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO EMAILS (id, gmail_id, thread_id, from_email, to_email, subject, is_processed) "
+            "VALUES (1, 'g1', 't1', 'a@example.com', 'claims@example.com', 'Claim', 1)"
+        ))
+        conn.execute(text(
+            "INSERT INTO CLAIM_SUBMISSIONS (id, claim_number, email_id, customer_name, customer_email, claim_type, status) "
+            "VALUES (1, 'CLM-1', 1, 'Ana', 'a@example.com', 'Trip Delay', 'PENDING')"
+        ))
+    engine.dispose()
+
+def start_outage(tmp):
+    """A seeded primary and its replica, then the primary goes away: (manager, primary path)"""
+    primary_path = os.path.join(tmp, "primary.db")
+    replica_path = os.path.join(tmp, "replica.db")
+    seed_primary(primary_path)
+    shutil.copy(primary_path, replica_path)  # what the Render -> SQLite sync provides
+    
+    manager = DatabaseManager(primary_url=f"sqlite:///{primary_path}", fallback_url=f"sqlite:///{replica_path}")
+    assert manager.get_engine() is not None and manager.role == "primary"
+    
+    # Outage: existing connections drop and new ones are refused
+    os.rename(primary_path, primary_path + ".down")
+    os.mkdir(primary_path)
+    manager._primary_engine.dispose()
+    return manager, primary_path
+
+def end_outage(primary_path):
+    os.rmdir(primary_path)
+    os.rename(primary_path + ".down", primary_path)
+
+def test_failover_and_failback():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager, primary_path = start_outage(tmp)
+        
+        db = new_session(manager)
+        assert manager.role == "fallback", manager.info()
+        assert manager.failovers == 1
+        
+        # Reads are real data from the replica; writes are journaled
+        claim = db.query(ClaimSubmission).filter(ClaimSubmission.id == 1).one()
+        claim.status = "UNDER_REVIEW"
+        db.add(ClaimStatusUpdate(claim_submission_id=1, old_status="PENDING", new_status="UNDER_REVIEW"))
+        email = Email(gmail_id="g2", thread_id="t2", from_email="b@example.com",
+                      to_email="claims@example.com", subject="New claim")
+        db.add(email)
+        db.flush()
+        db.add(ClaimSubmission(claim_number="CLM-2", email_id=email.id, customer_name="Bo",
+                               customer_email="b@example.com", claim_type="Lost Baggage"))
+        db.commit()
+        db.close()
+        
+        info = manager.info()
+        assert info["pending_writes"] == 4, info
+        print(f"✅ Failover: role={info['role']}, {info['pending_writes']} writes journaled")
+        
+        # Primary comes back, having taken a row that collides with the replica's new email ID
+        end_outage(primary_path)
+        with create_engine(f"sqlite:///{primary_path}").begin() as conn:
+            conn.execute(text(
+                "INSERT INTO EMAILS (id, gmail_id, thread_id, from_email, to_email, subject) "
+                "VALUES (2, 'g-other', 't9', 'c@example.com', 'claims@example.com', 'Other')"
+            ))
+        
+        assert manager.check_primary() is True
+        assert manager.role == "primary"
+        assert manager.info()["pending_writes"] == 0
+        
+        with create_engine(f"sqlite:///{primary_path}").connect() as conn:
+            status = conn.execute(text("SELECT status FROM CLAIM_SUBMISSIONS WHERE id = 1")).scalar()
+            assert status == "UNDER_REVIEW"
+            new_email_id = conn.execute(text("SELECT id FROM EMAILS WHERE gmail_id = 'g2'")).scalar()
+            assert new_email_id not in (None, 2)
+            claim_email_id = conn.execute(text("SELECT email_id FROM CLAIM_SUBMISSIONS WHERE claim_number = 'CLM-2'")).scalar()
+            assert claim_email_id == new_email_id, (claim_email_id, new_email_id)
+            updates = conn.execute(text("SELECT COUNT(*) FROM CLAIM_STATUS_UPDATES WHERE claim_submission_id = 1")).scalar()
+            assert updates == 1
+        print("✅ Failback: journal replayed on the primary with remapped IDs")
+        
+        manager._get_fallback_engine().dispose()
+        manager._get_primary_engine().dispose()
+
+def test_bulk_writes_are_journaled():
+    """query.update()/delete() skip the flush; the OCR worker claims its job with one"""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager, primary_path = start_outage(tmp)
+        
+        db = new_session(manager)
+        assert manager.role == "fallback"
+        db.add(OCRJob(job_id="j1", claim_submission_id=1, original_filename="scan.pdf", file_type="application/pdf",
+                      file_size=10, file_path="/tmp/scan.pdf", status="pending", attempts=0))
+        db.add(ClaimStatusUpdate(claim_submission_id=1, old_status="PENDING", new_status="UNDER_REVIEW"))
+        db.commit()
+        
+        # What OCRJobQueue._run_job does, plus an expression: the stored value is journaled
+        started_at = datetime(2026, 10, 18, 9, 30)
+        claimed = db.query(OCRJob).filter(OCRJob.job_id == "j1", OCRJob.status == "pending").update(
+            {"status": "running", "started_at": started_at, "attempts": OCRJob.attempts + 1}, synchronize_session=False
+        )
+        not_claimed = db.query(OCRJob).filter(OCRJob.job_id == "j1", OCRJob.status == "pending").update(
+            {"status": "running"}, synchronize_session=False
+        )
+        deleted = db.query(ClaimStatusUpdate).filter(ClaimStatusUpdate.claim_submission_id == 1).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        db.close()
+        assert (claimed, not_claimed, deleted) == (1, 0, 1)
+        assert manager.info()["pending_writes"] == 4, manager.info()
+        
+        end_outage(primary_path)
+        assert manager.check_primary() is True and manager.info()["pending_writes"] == 0
+        with create_engine(f"sqlite:///{primary_path}").connect() as conn:
+            job = conn.execute(text("SELECT status, started_at, attempts FROM OCR_JOBS WHERE job_id = 'j1'")).one()
+            updates = conn.execute(text("SELECT COUNT(*) FROM CLAIM_STATUS_UPDATES")).scalar()
+        assert job.status == "running" and job.attempts == 1 and job.started_at.startswith("2026-10-18 09:30"), job
+        assert updates == 0
+        
+        manager._get_fallback_engine().dispose()
+        manager._get_primary_engine().dispose()
+    print("✅ Bulk update()/delete() on the replica are journaled and replayed")
+
+def test_failed_insert_blocks_its_dependents():
+    """Entries for a row whose insert failed never land on the primary row with the same ID"""
+    with tempfile.TemporaryDirectory() as tmp:
+        primary = create_engine(f"sqlite:///{os.path.join(tmp, 'primary.db')}")
+        replica = create_engine(f"sqlite:///{os.path.join(tmp, 'replica.db')}")
+        for engine in (primary, replica):
+            run_migrations(engine)
+        seed = ("INSERT INTO EMAILS (id, gmail_id, thread_id, from_email, to_email, subject) "
+                "VALUES (:id, :gmail_id, 't', 'a@example.com', 'claims@example.com', :subject)")
+        with primary.begin() as conn:
+            conn.execute(text(seed), [{"id": 1, "gmail_id": "g1", "subject": "Before"},
+                                      {"id": 2, "gmail_id": "g-primary", "subject": "Unrelated"}])
+        
+        journal = Base.metadata.tables[JOURNAL_TABLE]
+        entries = [
+            # Local email 2: the payload lacks a NOT NULL column, so the insert fails on the primary
+            ("EMAILS", "insert", 2, {"id": 2, "gmail_id": "g2", "thread_id": "t2", "subject": "Outage"}),
+            ("EMAILS", "update", 2, {"subject": "Changed during the outage"}),
+            ("CLAIM_SUBMISSIONS", "insert", 5, {"id": 5, "claim_number": "CLM-5", "email_id": 2, "customer_name": "Bo",
+                                                 "customer_email": "b@example.com", "claim_type": "Lost Baggage"}),
+            ("EMAILS", "delete", 2, {}),
+            # Email 1 existed before the outage: replayed as usual
+            ("EMAILS", "update", 1, {"subject": "After"}),
+        ]
+        with replica.begin() as conn:
+            conn.execute(journal.insert(), [
+                {"table_name": table_name, "operation": operation, "row_id": row_id, "payload": payload,
+                 "status": "pending", "created_at": datetime.now()}
+                for table_name, operation, row_id, payload in entries
+            ])
+        
+        replay_pending(replica, primary, Base.metadata)
+        
+        with replica.connect() as conn:
+            statuses = [row.status for row in conn.execute(select(journal.c.status).order_by(journal.c.id))]
+        assert statuses == ["failed", "failed", "failed", "failed", "replayed"], statuses
+        with primary.connect() as conn:
+            subjects = dict(conn.execute(text("SELECT id, subject FROM EMAILS")).all())
+            claims = conn.execute(text("SELECT COUNT(*) FROM CLAIM_SUBMISSIONS")).scalar()
+        assert subjects == {1: "After", 2: "Unrelated"} and claims == 0, (subjects, claims)
+        primary.dispose()
+        replica.dispose()
+        print("✅ Replay: a failed insert fails its updates, deletes and references too")
+
+def main():
+    print("🧪 DATABASE FAILOVER TEST")
+    print("=" * 50)
+    test_failover_and_failback()
+    test_bulk_writes_are_journaled()
+    test_failed_insert_blocks_its_dependents()
+    print("\n🎉 All database failover tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test concurrent claim email processing: the unique gmail_id lets exactly one worker claim a
+message, and the scheduler's worker pool processes a batch in parallel, once per message
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.services.email_scheduler as email_scheduler_module
+from app.core.database import Base
+from app.models.email_models import Email, ClaimSubmission
+from app.services.claim_triage import claim_triage
+from app.services.email_processor import EmailProcessor
+from app.services.email_scheduler import EmailScheduler
+
+PROCESS_SECONDS = 0.2
+
+def file_db(tmp):
+    """A SQLite file, so every thread gets a connection of its own"""
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'emails.db')}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(bind=engine)
+
+def message(gmail_id, subject="Travel insurance claim - flight cancelled",
+            body="My flight was cancelled and I need to file a claim"):
+    return {"id": gmail_id, "threadId": f"t-{gmail_id}", "subject": subject, "from": "customer@example.com",
+            "to": "claims@example.com", "body_text": body}
+
+class SlowProcessor(EmailProcessor):
+    """EmailProcessor whose claim step only records concurrency and creates the claim"""
+    
+    active = 0
+    max_active = 0
+    processed = []
+    lock = threading.Lock()
+    
+    @classmethod
+    def reset(cls):
+        cls.active = 0
+        cls.max_active = 0
+        cls.processed = []
+    
+    def process_claim_email(self, email_record, payload=None):
+        cls = SlowProcessor
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            cls.processed.append(email_record.gmail_id)
+        time.sleep(PROCESS_SECONDS)
+        with cls.lock:
+            cls.active -= 1
+        
+        self.db.add(ClaimSubmission(email_id=email_record.id, customer_name="Ana",
+                                    customer_email="customer@example.com", claim_type="Trip Delay"))
+        self.db.commit()
+
+class StubSync:
+    """GmailSyncService look-alike: a fixed batch, and the checkpoints it was asked to save"""
+    
+    def __init__(self, emails):
+        self.emails = emails
+        self.saved = []
+    
+    def fetch_new_emails(self, db, is_candidate=None):
+        return list(self.emails), "42"
+    
+    def save_checkpoint(self, db, history_id):
+        self.saved.append((history_id, list(SlowProcessor.processed)))
+
+def test_claim_email_is_won_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = file_db(tmp)
+        barrier = threading.Barrier(8)
+        winners = []
+        
+        def claim():
+            db = Session()
+            try:
+                processor = EmailProcessor(db, llm_service=object(), gmail_service=object(), storage_service=object())
+                barrier.wait()
+                record = processor.claim_email(message("m1"), mark_processed=True)
+                if record is not None:
+                    winners.append(record.id)
+            finally:
+                db.close()
+        
+        threads = [threading.Thread(target=claim) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        db = Session()
+        try:
+            assert len(winners) == 1, winners
+            assert db.query(Email).filter(Email.gmail_id == "m1").count() == 1
+        finally:
+            db.close()
+            engine.dispose()
+    print("✅ Eight workers claiming one message: one wins, the rest see it as taken")
+
+def test_worker_pool_processes_each_email_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = file_db(tmp)
+        real_session_local = email_scheduler_module.SessionLocal
+        triage_enabled = claim_triage.enabled
+        email_scheduler_module.SessionLocal = Session
+        claim_triage.enabled = False
+        SlowProcessor.reset()
+        try:
+            scheduler = EmailScheduler()
+            scheduler.max_workers = 4
+            scheduler._get_processor = lambda db: SlowProcessor(db, llm_service=object(), gmail_service=object(),
+                                                                storage_service=object())
+            # m3 twice (listed by two history records), one message that is no claim
+            batch = [message(f"m{i}") for i in range(1, 9)] + [message("m3"), message("n1", "Weekly newsletter", "Top 10 destinations for the summer")]
+            scheduler.gmail_sync = StubSync(batch)
+            
+            started = time.perf_counter()
+            scheduler.process_new_emails()
+            elapsed = time.perf_counter() - started
+            
+            assert sorted(SlowProcessor.processed) == [f"m{i}" for i in range(1, 9)], SlowProcessor.processed
+            assert 1 < SlowProcessor.max_active <= 4, SlowProcessor.max_active
+            assert elapsed < 8 * PROCESS_SECONDS, elapsed
+            # The checkpoint is saved once every email of the batch was handled
+            assert scheduler.gmail_sync.saved == [("42", SlowProcessor.processed)]
+            
+            # The same batch again (e.g. the checkpoint was not saved): nothing is processed twice
+            scheduler.process_new_emails()
+            assert len(SlowProcessor.processed) == 8
+            
+            db = Session()
+            try:
+                assert db.query(Email).count() == 8 and db.query(ClaimSubmission).count() == 8
+            finally:
+                db.close()
+            
+            # A tick that starts while the previous one still runs is skipped
+            scheduler._tick_lock.acquire()
+            try:
+                scheduler.process_new_emails()
+            finally:
+                scheduler._tick_lock.release()
+            assert len(scheduler.gmail_sync.saved) == 2
+            scheduler.executor.shutdown()
+        finally:
+            email_scheduler_module.SessionLocal = real_session_local
+            claim_triage.enabled = triage_enabled
+            engine.dispose()
+    print(f"✅ Worker pool: 8 claim emails in {elapsed:.2f}s, at most 4 at once, each processed once")
+
+def main():
+    print("🧪 EMAIL WORKERS TEST")
+    print("=" * 50)
+    test_claim_email_is_won_once()
+    test_worker_pool_processes_each_email_once()
+    print("\n🎉 All email worker tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test the shared Gemini client: rate limiting, concurrency cap, retries and deadlines
+A fake model stands in for genai.GenerativeModel, so no Gemini key is needed
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from google.api_core import exceptions as api_exceptions
+
+from app.services.gemini_client import GeminiClient, LLMServiceError, deadline
+
+class FakeModel:
+    """Fails with the queued errors first, then answers after `latency` seconds"""
+    
+    def __init__(self, errors=(), latency=0.0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+    
+    def generate_content(self, contents):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            error = self.errors.pop(0) if self.errors else None
+        try:
+            if error:
+                raise error
+            time.sleep(self.latency)
+            return f"answer to {contents}"
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def make_client(**settings) -> GeminiClient:
+    client = GeminiClient()
+    client.backoff_base = 0.01
+    client.backoff_max = 0.05
+    for name, value in settings.items():
+        setattr(client, name, value)
+    client.request_bucket.__init__(client.requests_per_minute)
+    client.token_bucket.__init__(client.tokens_per_minute)
+    client.slots = threading.BoundedSemaphore(client.max_concurrency)
+    return client
+
+def test_retries_transient_errors():
+    client = make_client()
+    model = FakeModel([api_exceptions.ResourceExhausted("quota"), api_exceptions.ServiceUnavailable("busy")])
+    assert client.generate_content(model, "hello") == "answer to hello"
+    assert model.calls == 3 and client.stats()["retries"] == 2
+    
+    model = FakeModel([api_exceptions.InvalidArgument("bad request")])
+    try:
+        client.generate_content(model, "hello")
+        raise AssertionError("a 400 must not be retried")
+    except LLMServiceError as e:
+        assert e.status == 400 and not e.retryable and model.calls == 1
+    
+    client.max_retries = 2
+    model = FakeModel([api_exceptions.ResourceExhausted("quota")] * 5)
+    try:
+        client.generate_content(model, "hello")
+        raise AssertionError("retries must stop")
+    except LLMServiceError as e:
+        assert e.status == 429 and e.retryable and model.calls == 3
+    print("✅ 429/5xx retried with backoff, 4xx and exhausted retries raise LLMServiceError")
+
+def test_requests_per_minute_and_concurrency():
+    # 600 RPM = 10 per second: a burst of 600 is allowed, then one request every 0.1s
+    client = make_client(requests_per_minute=600, max_concurrency=3)
+    client.request_bucket.tokens = 0
+    model = FakeModel(latency=0.05)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: client.generate_content(model, str(i)), range(8)))
+    elapsed = time.perf_counter() - start
+    
+    assert model.max_active <= 3, model.max_active
+    assert elapsed >= 0.7, elapsed
+    print(f"✅ 8 requests paced to 10/s in {elapsed:.2f}s, at most {model.max_active} in flight")
+
+def test_deadline():
+    client = make_client(requests_per_minute=60)
+    client.request_bucket.tokens = 0
+    model = FakeModel()
+    
+    start = time.perf_counter()
+    try:
+        with deadline(0.2):
+            client.generate_content(model, "hello")
+        raise AssertionError("the quota wait exceeds the deadline")
+    except LLMServiceError as e:
+        assert e.retryable and model.calls == 0
+    assert time.perf_counter() - start < 0.1
+    # The reservation was returned
+    assert client.request_bucket.tokens > -0.5
+    
+    client = make_client()
+    model = FakeModel([api_exceptions.ServiceUnavailable("busy")] * 10)
+    client.backoff_base = client.backoff_max = 0.3
+    start = time.perf_counter()
+    try:
+        with deadline(0.5):
+            client.generate_content(model, "hello")
+        raise AssertionError("backoff must stop at the deadline")
+    except LLMServiceError:
+        assert time.perf_counter() - start < 0.5 and model.calls < 10
+    print("✅ Deadline stops quota waits and retries early")
+
+def main():
+    print("🧪 GEMINI CLIENT TEST")
+    print("=" * 50)
+    test_retries_transient_errors()
+    test_requests_per_minute_and_concurrency()
+    test_deadline()
+    print("\n🎉 All Gemini client tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Test batched Gmail fetching against a local fake Gmail server
+Checks that only claim candidates are downloaded in full and that the number of HTTP round-trips stays low
+"""
+
+import sys
+import json
+import base64
+import threading
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import httplib2
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.email_models import Base
+from app.services.gmail_service import GmailService, GmailFetchError
+from app.services.gmail_sync_service import GmailSyncService
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+FAKE_MAILBOX = {
+    "m1": ("Travel insurance claim - flight cancelled", "My flight was cancelled and I need to file a claim"),
+    "m2": ("Weekly newsletter", "Top 10 destinations for the summer"),
+    "m3": ("Receipt for your order", "Thanks for shopping with us"),
+    "m4": ("Claim notification - lost baggage", "My suitcase never arrived, please help with my claim"),
+}
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    """Implements the handful of Gmail API calls GmailService uses"""
+    
+    requests_seen = []
+    # message_id -> statuses to answer its next fetches with (e.g. [429, 429] fails twice)
+    failures = {}
+    # History API: messages added after each historyId, and the oldest historyId still kept
+    history = []
+    oldest_history_id = 1
+    
+    @classmethod
+    def reset(cls):
+        cls.requests_seen = []
+        cls.failures = {}
+        cls.history = [(2, "m1"), (3, "m2"), (4, "m3"), (5, "m4")]
+        cls.oldest_history_id = 1
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _message_resource(self, message_id, fmt):
+        subject, body = FAKE_MAILBOX[message_id]
+        payload = {
+            "mimeType": "multipart/mixed",
+            "headers": [
+                {"name": "Subject", "value": subject},
+                {"name": "From", "value": "customer@example.com"},
+                {"name": "To", "value": "claims@example.com"},
+            ],
+        }
+        if fmt == "full":
+            payload["parts"] = [
+                {"mimeType": "text/plain", "filename": "", "body": {"data": _b64(body)}},
+                {"mimeType": "image/png", "filename": "receipt.png", "body": {"attachmentId": f"att-{message_id}"}},
+            ]
+        return {"id": message_id, "threadId": f"t-{message_id}", "snippet": body[:40], "payload": payload}
+    
+    def _route(self, method, url):
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        parts = parsed.path.strip("/").split("/")
+        
+        cls = FakeGmailHandler
+        latest_history_id = max((history_id for history_id, _ in cls.history), default=1)
+        if parts == ["gmail", "v1", "users", "me", "profile"]:
+            return 200, {"emailAddress": "claims@example.com", "historyId": str(latest_history_id)}
+        if parts == ["gmail", "v1", "users", "me", "history"]:
+            start = int(query["startHistoryId"][0])
+            if start < cls.oldest_history_id:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            added = [{"id": str(history_id), "messagesAdded": [{"message": {"id": m, "threadId": f"t-{m}"}}]}
+                     for history_id, m in cls.history if history_id > start]
+            return 200, {"history": added, "historyId": str(latest_history_id)}
+        
+        # gmail/v1/users/me/messages[/<id>[/attachments/<id>]]
+        if parts[:5] == ["gmail", "v1", "users", "me", "messages"]:
+            if len(parts) == 5:
+                return 200, {"messages": [{"id": m, "threadId": f"t-{m}"} for m in reversed(list(FAKE_MAILBOX))]}
+            if len(parts) == 6 and cls.failures.get(parts[5]):
+                status = cls.failures[parts[5]].pop(0)
+                return status, {"error": {"code": status, "message": "Try again later"}}
+            if len(parts) == 6 and parts[5] in FAKE_MAILBOX:
+                fmt = query.get("format", ["full"])[0]
+                return 200, self._message_resource(parts[5], fmt)
+            if len(parts) == 8 and parts[6] == "attachments":
+                # Attachments of the fake mailbox share one content; any other ID gets its own
+                data = "fake image bytes" if parts[7].startswith("att-m") else f"image bytes of {parts[7]}"
+                return 200, {"data": _b64(data), "size": len(data)}
+        return 404, {"error": {"code": 404, "message": "Not found"}}
+    
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_GET(self):
+        FakeGmailHandler.requests_seen.append(("GET", self.path))
+        self._send_json(*self._route("GET", self.path))
+    
+    def do_POST(self):
+        FakeGmailHandler.requests_seen.append(("POST", self.path))
+        if not self.path.startswith("/batch/gmail/v1"):
+            self._send_json(404, {})
+            return
+        
+        length = int(self.headers["Content-Length"])
+        raw = b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self.rfile.read(length)
+        batch = BytesParser(policy=HTTP).parsebytes(raw)
+        
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for part in batch.iter_parts():
+            request_line = part.get_payload().splitlines()[0]
+            method, url, _ = request_line.split(" ", 2)
+            status, body = self._route(method, url)
+            content_id = part["Content-ID"].strip("<>")
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\n"
+                f"Content-Type: application/json\r\n\r\n"
+                f"{json.dumps(body)}\r\n"
+            )
+        data = ("".join(chunks) + f"--{boundary}--\r\n").encode()
+        
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_fake_gmail_server():
+    """Start the fake server on a free port and return (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGmailHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def fake_gmail(base_url):
+    """GmailService against the fake server, retrying without waiting"""
+    gmail = GmailService(http=httplib2.Http(), api_endpoint=base_url)
+    gmail.batch_retry_delay = 0
+    return gmail
+
+def is_claim(subject, snippet):
+    text = f"{subject} {snippet}".lower()
+    return "claim" in text
+
+def test_candidate_fetch_uses_batches():
+    """Metadata for every message, full payload only for claims, two round-trips in total"""
+    server, base_url = start_fake_gmail_server()
+    try:
+        FakeGmailHandler.reset()
+        gmail = fake_gmail(base_url)
+        
+        emails = gmail.get_candidate_emails(list(FAKE_MAILBOX), is_claim)
+        
+        assert [e["id"] for e in emails] == ["m1", "m4"], emails
+        assert emails[0]["body_text"].startswith("My flight was cancelled")
+        assert all(method == "POST" for method, _ in FakeGmailHandler.requests_seen)
+        assert len(FakeGmailHandler.requests_seen) == 2, FakeGmailHandler.requests_seen
+        print("✅ Candidate fetch: 4 messages filtered with 2 batched requests")
+    finally:
+        server.shutdown()
+
+def test_attachments_reuse_payload():
+    """Attachments are extracted from the fetched payload without re-downloading the message"""
+    server, base_url = start_fake_gmail_server()
+    try:
+        FakeGmailHandler.reset()
+        gmail = fake_gmail(base_url)
+        email_data = gmail.get_candidate_emails(["m4"], is_claim)[0]
+        
+        FakeGmailHandler.requests_seen = []
+        attachments = gmail.get_email_attachments("m4", email_data["payload"])
+        
+        assert [a["filename"] for a in attachments] == ["receipt.png"]
+        assert attachments[0]["data"] == b"fake image bytes"
+        assert len(FakeGmailHandler.requests_seen) == 1  # only the attachment itself
+        assert "/attachments/" in FakeGmailHandler.requests_seen[0][1]
+        print("✅ Attachments: payload reused, only the attachment body was downloaded")
+    finally:
+        server.shutdown()
+
+def test_failed_messages_are_retried_or_reported():
+    """429s and 5xx inside a batch are retried; what still fails is raised, never dropped"""
+    server, base_url = start_fake_gmail_server()
+    try:
+        FakeGmailHandler.reset()
+        FakeGmailHandler.failures = {"m1": [429, 503], "m3": [500]}
+        gmail = fake_gmail(base_url)
+        
+        emails = gmail.get_candidate_emails(list(FAKE_MAILBOX), is_claim)
+        assert [e["id"] for e in emails] == ["m1", "m4"], emails
+        
+        # A message deleted since it was listed is skipped, not an error
+        assert set(gmail.get_messages_batch(["m2", "deleted"], format='metadata')) == {"m2"}
+        
+        FakeGmailHandler.failures = {"m4": [500] * 10}
+        try:
+            gmail.get_candidate_emails(list(FAKE_MAILBOX), is_claim)
+            raise AssertionError("expected GmailFetchError")
+        except GmailFetchError as e:
+            assert e.failed_ids == ["m4"]
+            assert [email["id"] for email in e.fetched] == ["m1"]
+        print("✅ Failed messages: retried with backoff, reported when they keep failing")
+    finally:
+        server.shutdown()
+
+def test_checkpoint_waits_for_failed_messages():
+    """fetch_new_emails processes what it got but does not advance past unfetched messages"""
+    server, base_url = start_fake_gmail_server()
+    db = memory_db()
+    try:
+        FakeGmailHandler.reset()
+        sync = GmailSyncService(fake_gmail(base_url))
+        sync.save_checkpoint(db, "1")
+        
+        FakeGmailHandler.failures = {"m4": [500] * 10}
+        emails, history_id = sync.fetch_new_emails(db, is_candidate=is_claim)
+        assert [e["id"] for e in emails] == ["m1"] and history_id is None
+        sync.save_checkpoint(db, history_id)
+        assert sync._get_state(db).history_id == "1"
+        
+        # Next run: m4 is listed again and fetched
+        FakeGmailHandler.failures = {}
+        emails, history_id = sync.fetch_new_emails(db, is_candidate=is_claim)
+        assert [e["id"] for e in emails] == ["m1", "m4"] and history_id == "5"
+        print("✅ Checkpoint: kept until every new message has been fetched")
+    finally:
+        db.close()
+        server.shutdown()
+
+def memory_db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+def main():
+    """Run all tests"""
+    print("🧪 GMAIL BATCH FETCH TEST")
+    print("=" * 50)
+    test_candidate_fetch_uses_batches()
+    test_attachments_reuse_payload()
+    test_failed_messages_are_retried_or_reported()
+    test_checkpoint_waits_for_failed_messages()
+    print("\n🎉 All Gmail batch fetch tests passed")
+
+if __name__ == "__main__":
+    main()
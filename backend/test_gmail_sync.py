@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test incremental Gmail sync against the fake Gmail server of test_gmail_batch_fetch.py:
+full resync without a checkpoint, history-based fetches, checkpoint storage and the
+fallback when the stored historyId has expired
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.models.email_models import Email, GmailSyncState
+from app.services.gmail_sync_service import GmailSyncService
+from test_gmail_batch_fetch import FAKE_MAILBOX, FakeGmailHandler, start_fake_gmail_server, fake_gmail, memory_db, is_claim
+
+def store_email(db, gmail_id):
+    db.add(Email(gmail_id=gmail_id, thread_id=f"t-{gmail_id}", from_email="customer@example.com",
+                 to_email="claims@example.com", subject=FAKE_MAILBOX[gmail_id][0]))
+    db.commit()
+
+def paths_seen():
+    return [path.split("?")[0] for _, path in FakeGmailHandler.requests_seen]
+
+def test_first_run_is_a_full_resync():
+    server, base_url = start_fake_gmail_server()
+    db = memory_db()
+    try:
+        FakeGmailHandler.reset()
+        sync = GmailSyncService(fake_gmail(base_url))
+        
+        emails, history_id = sync.fetch_new_emails(db)
+        # Oldest first, fully parsed, with the historyId read before listing
+        assert [e["id"] for e in emails] == ["m1", "m2", "m3", "m4"], emails
+        assert emails[0]["subject"] == FAKE_MAILBOX["m1"][0] and history_id == "5"
+        
+        sync.save_checkpoint(db, history_id)
+        state = db.query(GmailSyncState).one()
+        assert state.account == "me" and state.history_id == "5" and state.last_full_sync_at is not None
+        
+        # Nothing to save keeps the stored checkpoint
+        sync.save_checkpoint(db, None)
+        assert sync._get_state(db).history_id == "5"
+    finally:
+        db.close()
+        server.shutdown()
+    print("✅ No checkpoint: recent messages listed, checkpoint and full-sync time saved")
+
+def test_history_fetches_only_new_messages():
+    server, base_url = start_fake_gmail_server()
+    db = memory_db()
+    FAKE_MAILBOX["m5"] = ("Claim for my delayed flight", "The flight was delayed 6 hours, I want to claim")
+    try:
+        FakeGmailHandler.reset()
+        sync = GmailSyncService(fake_gmail(base_url))
+        sync.save_checkpoint(db, "3")
+        # Stored by a run that crashed before saving its checkpoint
+        store_email(db, "m3")
+        
+        emails, history_id = sync.fetch_new_emails(db)
+        assert [e["id"] for e in emails] == ["m4"] and history_id == "5"
+        assert "/gmail/v1/users/me/history" in paths_seen()
+        assert "/gmail/v1/users/me/messages" not in paths_seen()
+        sync.save_checkpoint(db, history_id)
+        assert sync._get_state(db).last_full_sync_at is None
+        
+        # The next run starts from the saved checkpoint; only candidates are downloaded
+        FakeGmailHandler.history.append((6, "m5"))
+        FakeGmailHandler.history.append((7, "m2"))
+        emails, history_id = sync.fetch_new_emails(db, is_candidate=is_claim)
+        assert [e["id"] for e in emails] == ["m5"] and history_id == "7"
+        
+        # Nothing new: no messages, the checkpoint stays where it is
+        sync.save_checkpoint(db, history_id)
+        assert sync.fetch_new_emails(db) == ([], "7")
+    finally:
+        del FAKE_MAILBOX["m5"]
+        db.close()
+        server.shutdown()
+    print("✅ Stored historyId: only messages added since then, minus the ones already stored")
+
+def test_expired_history_falls_back_to_full_resync():
+    server, base_url = start_fake_gmail_server()
+    db = memory_db()
+    try:
+        FakeGmailHandler.reset()
+        # Gmail keeps about a week of history; older startHistoryIds get a 404
+        FakeGmailHandler.oldest_history_id = 4
+        sync = GmailSyncService(fake_gmail(base_url))
+        sync.save_checkpoint(db, "2")
+        store_email(db, "m1")
+        
+        emails, history_id = sync.fetch_new_emails(db)
+        assert [e["id"] for e in emails] == ["m2", "m3", "m4"] and history_id == "5"
+        assert "/gmail/v1/users/me/messages" in paths_seen()
+        
+        sync.save_checkpoint(db, history_id)
+        state = sync._get_state(db)
+        assert state.history_id == "5" and state.last_full_sync_at is not None
+    finally:
+        db.close()
+        server.shutdown()
+    print("✅ Expired historyId (404): full resync of recent messages, known ones skipped")
+
+def main():
+    print("🧪 GMAIL SYNC TEST")
+    print("=" * 50)
+    test_first_run_is_a_full_resync()
+    test_history_fetches_only_new_messages()
+    test_expired_history_falls_back_to_full_resync()
+    print("\n🎉 All Gmail sync tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test the image preprocessing applied before Gemini Vision calls
+"""
+
+import io
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.image_preprocessing import ImagePreprocessor
+
+def phone_photo(width=4000, height=3000, orientation=6) -> bytes:
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 180, 160)).save(output, "JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+def test_photo_is_rotated_downscaled_and_grayscaled():
+    preprocessor = ImagePreprocessor()
+    preprocessor.max_dimension = 1600
+    data, mime_type = preprocessor.preprocess(phone_photo(), "image/jpeg")
+    
+    image = Image.open(io.BytesIO(data))
+    assert mime_type == "image/jpeg"
+    assert image.size == (1200, 1600), image.size
+    assert image.mode == "L"
+    print(f"✅ 4000x3000 rotated photo sent as {image.size[0]}x{image.size[1]} grayscale ({len(data)} bytes)")
+
+def test_pdf_and_disabled_pass_through():
+    preprocessor = ImagePreprocessor()
+    assert preprocessor.preprocess(b"%PDF-1.7 ...", "application/pdf") == (b"%PDF-1.7 ...", "application/pdf")
+    
+    preprocessor.enabled = False
+    photo = phone_photo()
+    assert preprocessor.preprocess(photo, "image/jpeg") == (photo, "image/jpeg")
+    print("✅ PDFs and disabled preprocessing pass through untouched")
+
+def test_small_image_kept_when_not_smaller():
+    preprocessor = ImagePreprocessor()
+    output = io.BytesIO()
+    Image.new("L", (40, 20), 255).save(output, "PNG")
+    assert preprocessor.preprocess(output.getvalue(), "image/png") == (output.getvalue(), "image/png")
+    
+    assert preprocessor.preprocess(b"not an image", "image/jpeg") == (b"not an image", "image/jpeg")
+    print("✅ Tiny and unreadable images are sent as they are")
+
+def main():
+    print("🧪 IMAGE PREPROCESSING TEST")
+    print("=" * 50)
+    test_photo_is_rotated_downscaled_and_grayscaled()
+    test_pdf_and_disabled_pass_through()
+    test_small_image_kept_when_not_smaller()
+    print("\n🎉 All image preprocessing tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test the LLM response cache: TTL expiry, LRU eviction in both tiers, read-through from the
+SQLite tier, and that no SQLite connection is left open
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.llm_cache import LLMResponseCache, make_cache_key
+
+def disk_keys(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT key FROM llm_cache"))
+    finally:
+        conn.close()
+
+def test_ttl_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        cache = LLMResponseCache(memory_entries=10, db_path=db_path, ttl_seconds=0.2, max_entries=10)
+        cache.set("k", "answer")
+        assert cache.get("k") == "answer"
+        
+        time.sleep(0.3)
+        assert cache.get("k") is None
+        # The expired row was deleted on read, not only skipped
+        assert disk_keys(db_path) == []
+        assert cache.stats()["misses"] == 1
+    print("✅ Entries expire after the TTL in both tiers")
+
+def test_lru_eviction():
+    memory = LLMResponseCache(memory_entries=2, db_path="", ttl_seconds=60)
+    memory.set("a", "1")
+    memory.set("b", "2")
+    assert memory.get("a") == "1"
+    memory.set("c", "3")
+    assert memory.get("b") is None and memory.get("a") == "1" and memory.get("c") == "3"
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        cache = LLMResponseCache(memory_entries=0, db_path=db_path, ttl_seconds=60, max_entries=2)
+        cache.set("a", "1")
+        time.sleep(0.01)
+        cache.set("b", "2")
+        time.sleep(0.01)
+        assert cache.get("a") == "1"
+        time.sleep(0.01)
+        cache.set("c", "3")
+        assert disk_keys(db_path) == ["a", "c"]
+        assert cache.stats()["evictions"] == 1
+    print("✅ The least recently used entry is evicted from memory and from disk")
+
+def test_read_through():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        key = make_cache_key("gemini-1.5-flash", "prompt", b"image")
+        LLMResponseCache(memory_entries=10, db_path=db_path, ttl_seconds=60).set(key, "answer")
+        
+        # Another process (a new instance): the first read comes from SQLite and fills the LRU
+        cache = LLMResponseCache(memory_entries=10, db_path=db_path, ttl_seconds=60)
+        assert cache.get(key) == "answer" and cache.get(key) == "answer"
+        stats = cache.stats()
+        assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1 and stats["memory_entries"] == 1, stats
+        assert cache.get(make_cache_key("gemini-1.5-flash", "prompt", b"other image")) is None
+    print("✅ A miss in memory reads through to SQLite and is kept in memory")
+
+def test_connections_are_closed():
+    opened = []
+    real_connect = sqlite3.connect
+    
+    def tracking_connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        opened.append(conn)
+        return conn
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite3.connect = tracking_connect
+        try:
+            cache = LLMResponseCache(memory_entries=0, db_path=os.path.join(tmp, "cache.db"), ttl_seconds=60)
+            cache.set("k", "answer")
+            cache.get("k")
+            cache.get("missing")
+            cache.clear()
+        finally:
+            sqlite3.connect = real_connect
+        
+        assert len(opened) == 5
+        for conn in opened:
+            try:
+                conn.execute("SELECT 1")
+                raise AssertionError("connection left open")
+            except sqlite3.ProgrammingError:
+                pass
+    print("✅ Every SQLite connection is closed after its operation")
+
+def main():
+    print("🧪 LLM CACHE TEST")
+    print("=" * 50)
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_read_through()
+    test_connections_are_closed()
+    print("\n🎉 All LLM cache tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Test the background OCR job queue: a job's lifecycle, requeue after a restart, failures,
+and the size limit and hash of uploads
+"""
+
+import os
+import sys
+import asyncio
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.services.ocr_job_queue as ocr_job_queue_module
+from app.api import analyst_api
+from app.core.database import Base, get_db
+from app.models.email_models import Email, ClaimSubmission, DocumentAgentOCR, DocumentBlob, OCRJob
+from app.services.enhanced_ocr_service import EnhancedOCRService
+from app.services.ocr_job_queue import OCRJobQueue, UploadTooLargeError
+
+class StubOCR:
+    """Stands in for EnhancedOCRService; fail=True returns its placeholder for a failed Gemini call"""
+    
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+    
+    def process_document_file(self, file_path, filename, document_type="OTHER", mime_type=None, sha256=None):
+        self.calls += 1
+        if self.fail:
+            return EnhancedOCRService._get_default_ocr_result(None, filename, document_type)
+        with open(file_path, "rb") as f:
+            return {"extracted_text": f.read().decode(), "confidence": 0.9, "document_type": document_type}
+    
+    def get_document_summary(self, ocr_result):
+        return ocr_result["extracted_text"][:20]
+
+class InlineExecutor:
+    """Runs submitted jobs right away, so the test sees their outcome"""
+    
+    def submit(self, fn, *args):
+        fn(*args)
+
+class StoppedExecutor:
+    """A pool that stopped before running what was submitted"""
+    
+    def submit(self, fn, *args):
+        pass
+
+class Upload:
+    """UploadFile look-alike; records the size of every read"""
+    
+    def __init__(self, data):
+        self.data = data
+        self.reads = []
+    
+    async def read(self, size):
+        self.reads.append(size)
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+def setup(tmp, ocr):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    ocr_job_queue_module.SessionLocal = sessionmaker(bind=engine)
+    
+    db = ocr_job_queue_module.SessionLocal()
+    email = Email(gmail_id="m1", thread_id="t-1", from_email="a@example.com", to_email="claims@example.com",
+                  subject="Claim notification")
+    db.add(email)
+    db.flush()
+    claim = ClaimSubmission(email_id=email.id, customer_name="Ana", customer_email="a@example.com",
+                            claim_type="Lost Baggage")
+    db.add(claim)
+    db.commit()
+    
+    queue = OCRJobQueue(ocr_service=ocr)
+    queue.upload_dir = tmp
+    queue.executor = InlineExecutor()
+    return db, queue, claim
+
+def submit(db, queue, claim, data):
+    spooled = asyncio.run(queue.spool_upload(Upload(data)))
+    job = queue.submit(db, spooled, "receipt.txt", "text/plain", claim.id, "RECEIPT")
+    return spooled, job.job_id
+
+def test_job_lifecycle():
+    with tempfile.TemporaryDirectory() as tmp:
+        ocr = StubOCR()
+        db, queue, claim = setup(tmp, ocr)
+        try:
+            spooled, job_id = submit(db, queue, claim, b"Taxi 12.50 EUR")
+            db.expire_all()
+            job = queue.get_job(db, job_id)
+            assert job.status == "done" and job.attempts == 1 and job.finished_at is not None
+            assert job.result["summary"] == "Taxi 12.50 EUR"
+            
+            document = db.query(DocumentAgentOCR).filter(DocumentAgentOCR.id == job.document_id).one()
+            assert document.is_processed and document.claim_submission_id == claim.id
+            assert db.query(DocumentBlob).one().ocr_result["extracted_text"] == "Taxi 12.50 EUR"
+            assert not os.path.exists(spooled.file_path)
+            
+            # The same content again: the stored OCR result is reused
+            submit(db, queue, claim, b"Taxi 12.50 EUR")
+            assert ocr.calls == 1 and db.query(DocumentAgentOCR).count() == 2
+        finally:
+            db.close()
+    print("✅ pending -> running -> done: document created, spooled file removed, identical content reused")
+
+def test_requeue_unfinished():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, queue, claim = setup(tmp, StubOCR())
+        try:
+            # Jobs left behind by a process that stopped before running or finishing them
+            executor, queue.executor = queue.executor, StoppedExecutor()
+            _, pending_id = submit(db, queue, claim, b"Hotel 80 EUR")
+            _, running_id = submit(db, queue, claim, b"Taxi 12.50 EUR")
+            db.query(OCRJob).filter(OCRJob.job_id == running_id).update({"status": "running"})
+            db.commit()
+            queue.executor = executor
+            
+            assert queue.requeue_unfinished() == 2
+            db.expire_all()
+            assert [queue.get_job(db, job_id).status for job_id in (pending_id, running_id)] == ["done", "done"]
+            assert queue.requeue_unfinished() == 0
+        finally:
+            db.close()
+    print("✅ Pending and interrupted jobs are requeued and run once")
+
+def test_failed_ocr_fails_the_job():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, queue, claim = setup(tmp, StubOCR(fail=True))
+        try:
+            spooled, job_id = submit(db, queue, claim, b"Taxi 12.50 EUR")
+            db.expire_all()
+            job = queue.get_job(db, job_id)
+            assert job.status == "failed" and "OCR failed" in job.error, (job.status, job.error)
+            assert job.document_id is None and db.query(DocumentAgentOCR).count() == 0
+            assert db.query(DocumentBlob).count() == 0
+            # The upload is kept for another attempt
+            assert os.path.exists(spooled.file_path)
+        finally:
+            db.close()
+    print("✅ A failed OCR result fails the job instead of storing the placeholder")
+
+def test_spool_upload_limit_and_hash():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = OCRJobQueue(ocr_service=StubOCR())
+        queue.upload_dir = tmp
+        queue.chunk_size = 1024
+        data = os.urandom(5000)
+        
+        upload = Upload(data)
+        spooled = asyncio.run(queue.spool_upload(upload, max_bytes=5000))
+        assert spooled.size == 5000 and spooled.sha256 == hashlib.sha256(data).hexdigest()
+        with open(spooled.file_path, "rb") as f:
+            assert f.read() == data
+        # Read in chunks, never all at once
+        assert set(upload.reads) == {1024}
+        
+        upload = Upload(data)
+        try:
+            asyncio.run(queue.spool_upload(upload, max_bytes=3000))
+            raise AssertionError("expected UploadTooLargeError")
+        except UploadTooLargeError:
+            pass
+        # Stopped at the first chunk past the limit, and the partial file is gone
+        assert len(upload.reads) == 3 and upload.data
+        assert os.listdir(tmp) == [os.path.basename(spooled.file_path)]
+    print("✅ spool_upload: chunked copy with its sha256, stops and cleans up past the limit")
+
+@contextmanager
+def shared_queue(tmp, queue, max_upload_bytes):
+    """The endpoint uses the global queue: point it at the test's directory, OCR and limit"""
+    shared = analyst_api.ocr_job_queue
+    overrides = {"upload_dir": tmp, "max_upload_bytes": max_upload_bytes, "executor": InlineExecutor(),
+                 "_ocr_service": queue._ocr_service}
+    saved = {name: getattr(shared, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(shared, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(shared, name, value)
+
+def make_app(db):
+    app = FastAPI()
+    app.include_router(analyst_api.router)
+    app.dependency_overrides[get_db] = lambda: db
+    return app
+
+def test_upload_endpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, queue, claim = setup(tmp, StubOCR())
+        try:
+            with shared_queue(tmp, queue, 1024):
+                client = TestClient(make_app(db))
+                
+                def upload(data):
+                    return client.post("/api/analyst/documents/upload", data={"claim_id": claim.id, "document_type": "RECEIPT"},
+                                       files={"file": ("receipt.txt", data, "text/plain")})
+                
+                # Within the form overhead the route lets through: the file's own size is checked
+                response = upload(b"x" * 2048)
+                assert response.status_code == 413, response.text
+                assert os.listdir(tmp) == [] and db.query(OCRJob).count() == 0
+                
+                response = upload(b"Taxi 12.50 EUR")
+                assert response.status_code == 202, response.text
+                body = response.json()
+                assert body["status_url"] == f"/api/analyst/jobs/{body['job_id']}"
+                
+                db.expire_all()
+                job = client.get(body["status_url"]).json()
+                assert job["status"] == "done" and job["summary"] == "Taxi 12.50 EUR", job
+                assert queue.get_job(db, body["job_id"]).content_sha256 == hashlib.sha256(b"Taxi 12.50 EUR").hexdigest()
+        finally:
+            db.close()
+    print("✅ Upload endpoint: 413 over the limit (nothing spooled), 202 and a pollable job otherwise")
+
+def post_upload(app, chunks, content_length=None):
+    """POST a multipart upload body in chunks straight to the ASGI app: (status, chunks it read)"""
+    boundary = "limit-test"
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="claim_id"\r\n\r\n1\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="scan.pdf"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode()
+    pending = [head] + list(chunks)
+    read = []
+    sent = []
+    
+    async def receive():
+        if pending:
+            read.append(pending.pop(0))
+            return {"type": "http.request", "body": read[-1], "more_body": bool(pending)}
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        sent.append(message)
+    
+    headers = [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": "/api/analyst/documents/upload", "raw_path": b"/api/analyst/documents/upload",
+             "root_path": "", "query_string": b"", "headers": headers, "server": ("test", 80), "client": ("test", 1)}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], len(read)
+
+def test_upload_rejected_before_body_is_read():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, queue, claim = setup(tmp, StubOCR())
+        try:
+            with shared_queue(tmp, queue, 1024 * 1024):
+                app = make_app(db)
+                chunk = b"x" * 64 * 1024
+                
+                # A declared size over the limit: refused before any of the body is received
+                status, read = post_upload(app, [chunk] * 40, content_length=40 * len(chunk))
+                assert status == 413 and read == 0, (status, read)
+                
+                # No Content-Length: reading stops once the limit plus form overhead is passed,
+                # with the form head and 17 chunks (1 MB + 64 KB) of the 40
+                status, read = post_upload(app, [chunk] * 40)
+                assert status == 413 and read == 1 + 17, (status, read)
+                
+                assert os.listdir(tmp) == [] and db.query(OCRJob).count() == 0
+        finally:
+            db.close()
+    print("✅ Oversized uploads: 413 from Content-Length unread, or after reading just past the limit")
+
+def main():
+    print("🧪 OCR JOB QUEUE TEST")
+    print("=" * 50)
+    test_job_lifecycle()
+    test_requeue_unfinished()
+    test_failed_ocr_fails_the_job()
+    test_spool_upload_limit_and_hash()
+    test_upload_endpoint()
+    test_upload_rejected_before_body_is_read()
+    print("\n🎉 All OCR job queue tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test page-wise PDF OCR with a fake Gemini
+Text-layer pages must be read without Vision; only scanned pages are rendered and sent
+"""
+
+import io
+import os
+import sys
+import json
+import threading
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import pymupdf
+from PIL import Image
+
+from app.services.enhanced_ocr_service import EnhancedOCRService
+from app.services.pdf_ocr_service import PdfOCRService
+
+SAMPLE_PDF = current_dir.parent / "Redacted Customer ClaimForm.pdf"
+TEXT_PAGE = "Hospital Central invoice INV-2291. Patient: Ana Lopez. Total due: $1,250.00 on 2024-03-02."
+
+class FakeGemini:
+    """Stands in for LLMService; records which calls were made"""
+    
+    def __init__(self):
+        self.text_calls = []
+        self.image_calls = []
+        self.lock = threading.Lock()
+    
+    def analyze_text(self, prompt):
+        with self.lock:
+            self.text_calls.append(prompt)
+        return json.dumps({
+            "document_type": "MEDICAL_BILL",
+            "confidence": 0.9,
+            "extracted_text": "model copy of the text",
+            "structured_data": {"amounts": ["$1,250.00"], "reference_numbers": ["INV-2291"]},
+            "key_information": {"total_amount": "$1,250.00", "issuer": "Hospital Central"},
+            "ocr_quality": "good"
+        })
+    
+    def generate_text_with_image_data(self, prompt, image_data, mime_type=None):
+        with self.lock:
+            self.image_calls.append((image_data, mime_type))
+            page = len(self.image_calls)
+        return json.dumps({
+            "document_type": "OTHER",
+            "confidence": 0.6,
+            "extracted_text": f"scanned page {page}",
+            "structured_data": {"amounts": ["$1,250.00", "$80.00"]},
+            "key_information": {"total_amount": "$80.00", "date": "2024-03-05"},
+            "ocr_quality": "fair"
+        })
+
+def build_pdf(scan_stamp=None):
+    """A text page followed by a scanned page, optionally with a short text-layer stamp"""
+    document = pymupdf.open()
+    document.new_page().insert_text((72, 72), TEXT_PAGE, fontsize=9)
+    image = io.BytesIO()
+    Image.new("RGB", (200, 100), "white").save(image, "PNG")
+    scanned = document.new_page()
+    scanned.insert_image(pymupdf.Rect(72, 72, 272, 172), stream=image.getvalue())
+    if scan_stamp:
+        scanned.insert_text((72, 40), scan_stamp, fontsize=9)
+    data = document.tobytes()
+    document.close()
+    return data
+
+def make_service():
+    service = EnhancedOCRService()
+    service.gemini_service = FakeGemini()
+    return service
+
+def test_only_scanned_pages_use_vision():
+    service = make_service()
+    result = service.process_document_with_gemini(build_pdf(), "invoice.pdf", "MEDICAL_BILL", "application/pdf")
+    gemini = service.gemini_service
+    
+    assert len(gemini.text_calls) == 1 and TEXT_PAGE in gemini.text_calls[0]
+    assert len(gemini.image_calls) == 1 and gemini.image_calls[0][1] == "image/png"
+    assert result["page_count"] == 2 and result["vision_pages"] == 1
+    assert result["extracted_text"] == f"{TEXT_PAGE}\n\nscanned page 1"
+    assert result["structured_data"]["amounts"] == ["$1,250.00", "$80.00"]
+    assert result["key_information"]["total_amount"] == "$1,250.00"
+    assert result["key_information"]["date"] == "2024-03-05"
+    assert result["document_type"] == "MEDICAL_BILL"
+    assert result["confidence"] == 0.75 and result["ocr_quality"] == "fair"
+    print(f"✅ 2-page PDF: 1 text call, 1 Vision call ({result['processing_notes']})")
+
+def test_scanned_page_with_stamp_uses_vision_text():
+    service = make_service()
+    result = service.process_document_with_gemini(build_pdf(scan_stamp="RECEIVED"), "invoice.pdf",
+                                                  "MEDICAL_BILL", "application/pdf")
+    
+    assert len(service.gemini_service.image_calls) == 1 and result["vision_pages"] == 1
+    assert result["extracted_text"] == f"{TEXT_PAGE}\n\nscanned page 1", result["extracted_text"]
+    print("✅ A scanned page with a short text-layer stamp keeps Vision's text")
+
+def test_scanned_sample_pages_in_parallel():
+    service = make_service()
+    service.pdf_service = PdfOCRService()
+    result = service.process_document_file(str(SAMPLE_PDF), SAMPLE_PDF.name, "CLAIM_FORM")
+    gemini = service.gemini_service
+    
+    assert not gemini.text_calls
+    assert len(gemini.image_calls) == result["page_count"] == 3
+    assert all(data.startswith(b"\x89PNG") for data, _ in gemini.image_calls)
+    assert sorted(result["extracted_text"].split("\n\n")) == [f"scanned page {i}" for i in (1, 2, 3)]
+    print(f"✅ Sample claim form: {result['vision_pages']} scanned pages sent to Vision")
+
+def test_page_limit():
+    service = make_service()
+    service.pdf_service = PdfOCRService()
+    service.pdf_service.max_ocr_pages = 2
+    result = service.process_document_with_gemini(SAMPLE_PDF.read_bytes(), SAMPLE_PDF.name)
+    
+    assert len(service.gemini_service.image_calls) == 2
+    assert "1 scanned pages over the limit skipped" in result["processing_notes"]
+    print("✅ Page limit respected")
+
+def main():
+    print("🧪 PDF OCR TEST")
+    print("=" * 50)
+    test_only_scanned_pages_use_vision()
+    test_scanned_page_with_stamp_uses_vision_text()
+    test_scanned_sample_pages_in_parallel()
+    test_page_limit()
+    print("\n🎉 All PDF OCR tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test Render -> SQLite replication: full copy, incremental upserts by watermark, parallel tables
+A second SQLite file stands in for Render PostgreSQL
+"""
+
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine, text
+
+from app.core.migrations import run_migrations
+from app.core.database import DatabaseManager
+from app.services.replication_service import ReplicationService, BackgroundReplicator, create_sqlite_engine
+
+def seed_source(engine, emails):
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO EMAILS (id, gmail_id, thread_id, from_email, to_email, subject, received_at) "
+            "VALUES (:id, :gmail_id, 't', 'a@example.com', 'claims@example.com', 'Claim', datetime('now', :age))"
+        ), [{"id": i, "gmail_id": f"g{i}", "age": f"-{emails + 10 - i} minutes"} for i in range(1, emails + 1)])
+        conn.execute(text(
+            "INSERT INTO CLAIM_SUBMISSIONS (id, claim_number, email_id, customer_name, customer_email, claim_type, status, created_at) "
+            "VALUES (1, 'CLM-1', 1, 'Ana', 'a@example.com', 'Trip Delay', 'PENDING', datetime('now', '-1 day'))"
+        ))
+        conn.execute(text(
+            "INSERT INTO CLAIM_STATUS_UPDATES (claim_submission_id, old_status, new_status) VALUES (1, NULL, 'PENDING')"
+        ))
+
+def test_full_then_incremental():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = create_engine(f"sqlite:///{os.path.join(tmp, 'render.db')}")
+        target = create_sqlite_engine(os.path.join(tmp, "replica.db"))
+        seed_source(source, emails=2500)
+        
+        replication = ReplicationService(source_engine=source, target_engine=target,
+                                         metadata_path=os.path.join(tmp, "sync_metadata.json"), chunk_size=500)
+        first = replication.replicate(parallel=3)
+        assert first["tables"]["EMAILS"]["rows"] == 2500, first
+        print(f"✅ First sync copied {first['rows']} rows in {first['seconds']}s")
+        
+        # A row the replica took during an outage, holding a gmail_id the primary stores under another id
+        with target.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO EMAILS (id, gmail_id, thread_id, from_email, to_email, subject) "
+                "VALUES (9999, 'g2501', 't', 'b@example.com', 'claims@example.com', 'Local')"
+            ))
+        
+        with source.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO EMAILS (id, gmail_id, thread_id, from_email, to_email, subject, received_at) "
+                "VALUES (2501, 'g2501', 't', 'b@example.com', 'claims@example.com', 'New', CURRENT_TIMESTAMP)"
+            ))
+            conn.execute(text("UPDATE CLAIM_SUBMISSIONS SET status = 'APPROVED', updated_at = CURRENT_TIMESTAMP WHERE id = 1"))
+            conn.execute(text(
+                "INSERT INTO CLAIM_STATUS_UPDATES (claim_submission_id, old_status, new_status) VALUES (1, 'PENDING', 'APPROVED')"
+            ))
+        
+        second = replication.replicate()
+        # Only the new row plus what falls inside the overlap window is read again
+        assert second["tables"]["EMAILS"]["rows"] <= 3, second
+        assert second["tables"]["CLAIM_STATUS_UPDATES"]["rows"] == 2, second
+        
+        with target.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM EMAILS")).scalar() == 2501
+            assert conn.execute(text("SELECT id FROM EMAILS WHERE gmail_id = 'g2501'")).scalar() == 2501
+            assert conn.execute(text("SELECT status FROM CLAIM_SUBMISSIONS WHERE id = 1")).scalar() == "APPROVED"
+            assert conn.execute(text("SELECT COUNT(*) FROM CLAIM_STATUS_UPDATES")).scalar() == 2
+        
+        with open(replication.metadata_path) as f:
+            watermarks = json.load(f)["tables"]
+        assert watermarks["EMAILS"]["last_id"] == 2501
+        assert watermarks["CLAIM_STATUS_UPDATES"]["last_id"] == 2
+        print(f"✅ Incremental sync upserted {second['rows']} rows in {second['seconds']}s")
+        
+        # An insert-only row whose id was taken before the last sync but committed after it
+        with source.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO CLAIM_STATUS_UPDATES (id, claim_submission_id, old_status, new_status) "
+                "VALUES (10, 1, 'APPROVED', 'CLOSED')"
+            ))
+        replication.replicate(tables=["CLAIM_STATUS_UPDATES"])
+        with source.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO CLAIM_STATUS_UPDATES (id, claim_submission_id, old_status, new_status) "
+                "VALUES (7, 1, 'APPROVED', 'UNDER_REVIEW')"
+            ))
+        late = replication.replicate(tables=["CLAIM_STATUS_UPDATES"])
+        assert late["tables"]["CLAIM_STATUS_UPDATES"]["rows"] == 4, late
+        with target.connect() as conn:
+            ids = [row[0] for row in conn.execute(text("SELECT id FROM CLAIM_STATUS_UPDATES ORDER BY id"))]
+        assert ids == [1, 2, 7, 10], ids
+        print("✅ Insert-only tables re-read an id window, so late commits of lower ids are copied")
+        
+        source.dispose()
+        target.dispose()
+
+def test_background_replicator():
+    with tempfile.TemporaryDirectory() as tmp:
+        primary_path = os.path.join(tmp, "render.db")
+        replica_path = os.path.join(tmp, "replica.db")
+        seed_source(create_engine(f"sqlite:///{primary_path}"), emails=10)
+        
+        manager = DatabaseManager(primary_url=f"sqlite:///{primary_path}", fallback_url=f"sqlite:///{replica_path}")
+        assert manager.get_engine() is not None and manager.role == "primary"
+        replicator = BackgroundReplicator(manager, interval=1, metadata_path=os.path.join(tmp, "sync_metadata.json"))
+        
+        assert replicator.replicate_once() is True
+        with manager._get_primary_engine().begin() as conn:
+            conn.execute(text("UPDATE CLAIM_SUBMISSIONS SET status = 'CLOSED', updated_at = CURRENT_TIMESTAMP WHERE id = 1"))
+        assert replicator.replicate_once() is True
+        
+        with manager._get_fallback_engine().connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM EMAILS")).scalar() == 10
+            assert conn.execute(text("SELECT status FROM CLAIM_SUBMISSIONS WHERE id = 1")).scalar() == "CLOSED"
+        stats = replicator.stats()
+        assert stats["passes"] == 2 and stats["lag_seconds"] is not None, stats
+        
+        # On the replica the local writes win: nothing is copied over them
+        manager.fail_over("test")
+        assert replicator.replicate_once() is False
+        assert "fallback" in replicator.stats()["skipped_reason"]
+        print(f"✅ Background replicator: {stats['passes']} passes, lag {stats['lag_seconds']}s")
+        
+        manager._get_fallback_engine().dispose()
+        manager._get_primary_engine().dispose()
+
+def main():
+    print("🧪 REPLICATION TEST")
+    print("=" * 50)
+    test_full_then_incremental()
+    test_background_replicator()
+    print("\n🎉 All replication tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test stored claim analyses: served from the database, recomputed when the inputs
+change, and recomputed by Gemini (not the LLM cache) on an explicit refresh
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.email_models import Base, Email, ClaimSubmission, ClaimAnalysis
+from app.services.llm_service import LLMService
+from app.services.sentiment_analysis_service import SentimentAnalysisService
+
+class DictCache:
+    def __init__(self):
+        self.values = {}
+    
+    def get(self, key):
+        return self.values.get(key)
+    
+    def set(self, key, value):
+        self.values[key] = value
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubGeminiClient:
+    """GeminiClient look-alike: each call answers with a higher risk score"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def generate_content(self, model, prompt):
+        self.calls += 1
+        return StubResponse(json.dumps({"sentiment_label": "negative", "sentiment_score": 0.2,
+                                        "risk_score": self.calls / 10, "priority_level": "high",
+                                        "traffic_light": "red"}))
+
+class StubAsyncLLM:
+    def __init__(self):
+        self.use_cache = []
+    
+    async def generate_text(self, prompt, use_cache=True):
+        self.use_cache.append(use_cache)
+        return json.dumps({"risk_score": 0.9})
+
+def make_service():
+    service = SentimentAnalysisService()
+    service.gemini_service = LLMService(cache=DictCache())
+    service.gemini_service.client = StubGeminiClient()
+    return service
+
+def make_claim(db):
+    email = Email(gmail_id="m1", thread_id="t1", from_email="ana@example.com", to_email="claims@example.com",
+                  subject="Flight cancelled")
+    db.add(email)
+    db.flush()
+    claim = ClaimSubmission(email_id=email.id, customer_name="Ana Lopez", customer_email="ana@example.com", claim_type="TRAVEL_INSURANCE",
+                            incident_description="My flight was cancelled and I paid for a hotel")
+    db.add(claim)
+    db.commit()
+    return claim
+
+def memory_db():
+    # The async path runs the database work on worker threads
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+def test_stored_analysis_is_reused():
+    db = memory_db()
+    try:
+        service = make_service()
+        claim = make_claim(db)
+        
+        analysis, from_db = service.get_claim_analysis(db, claim)
+        assert not from_db and analysis["risk_score"] == 0.1
+        assert claim.risk_score == 0.1 and claim.sentiment_analysis == "NEGATIVE"
+        
+        analysis, from_db = service.get_claim_analysis(db, claim)
+        assert from_db and analysis["risk_score"] == 0.1
+        assert service.gemini_service.client.calls == 1
+        assert db.query(ClaimAnalysis).count() == 1
+    finally:
+        db.close()
+    print("✅ A current stored analysis is served without calling Gemini")
+
+def test_changed_inputs_are_recomputed():
+    db = memory_db()
+    try:
+        service = make_service()
+        claim = make_claim(db)
+        service.get_claim_analysis(db, claim)
+        
+        claim.incident_description = "My flight was cancelled; the hotel and two taxis cost 480 EUR"
+        db.commit()
+        analysis, from_db = service.get_claim_analysis(db, claim)
+        assert not from_db and analysis["risk_score"] == 0.2
+        
+        stored = db.query(ClaimAnalysis).one()
+        assert stored.risk_score == 0.2
+        assert stored.input_hash == service.compute_input_hash(claim.incident_description, "Ana Lopez", "TRAVEL_INSURANCE")
+    finally:
+        db.close()
+    print("✅ A stale stored analysis is recomputed and replaced in place")
+
+def test_refresh_skips_the_llm_cache():
+    db = memory_db()
+    try:
+        service = make_service()
+        claim = make_claim(db)
+        service.get_claim_analysis(db, claim)
+        
+        # Same inputs, same prompt: only a bypass of the LLM cache reaches Gemini
+        analysis, from_db = service.get_claim_analysis(db, claim, refresh=True)
+        assert not from_db and analysis["risk_score"] == 0.2
+        assert service.gemini_service.client.calls == 2
+        assert db.query(ClaimAnalysis).one().risk_score == 0.2
+        
+        # The refreshed answer replaced the cached one
+        prompt = service._build_prompt(claim.incident_description, "Ana Lopez", "TRAVEL_INSURANCE")
+        assert json.loads(service.gemini_service.analyze_text(prompt))["risk_score"] == 0.2
+        assert service.gemini_service.client.calls == 2
+        
+        service.async_gemini_service = StubAsyncLLM()
+        asyncio.run(service.get_claim_analysis_async(db, claim))
+        asyncio.run(service.get_claim_analysis_async(db, claim, refresh=True))
+        assert service.async_gemini_service.use_cache == [False]
+    finally:
+        db.close()
+    print("✅ refresh=True recomputes with Gemini instead of the cached answer")
+
+def main():
+    print("🧪 SENTIMENT ANALYSIS STORAGE TEST")
+    print("=" * 50)
+    test_stored_analysis_is_reused()
+    test_changed_inputs_are_recomputed()
+    test_refresh_skips_the_llm_cache()
+    print("\n🎉 All sentiment analysis storage tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test single-flight coalescing of identical in-flight LLM requests
+"""
+
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.single_flight import SingleFlight
+from app.services.gemini_client import LLMServiceError, deadline
+from load_test_llm import FakeGeminiHandler, start_fake_gemini_server, make_service
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.3)
+        return "answer"
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: flight.do("same prompt", slow_call), range(8)))
+    
+    assert results == ["answer"] * 8
+    assert len(calls) == 1, len(calls)
+    stats = flight.stats()
+    assert stats["calls"] == 1 and stats["coalesced"] == 7 and stats["in_flight"] == 0, stats
+    
+    # Different keys are not coalesced, and a finished call is not reused
+    assert flight.do("other prompt", lambda: "other") == "other"
+    flight.do("same prompt", slow_call)
+    assert len(calls) == 2
+    print("✅ 8 identical threaded calls made 1 upstream call")
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    started = threading.Event()
+    
+    def failing_call():
+        started.set()
+        time.sleep(0.2)
+        raise LLMServiceError("quota exhausted", status=429)
+    
+    errors = []
+    def caller():
+        try:
+            flight.do("key", failing_call)
+        except LLMServiceError as e:
+            errors.append(e.status)
+    
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+    
+    assert errors == [429] * 4, errors
+    assert flight.stats()["calls"] == 1
+    print("✅ The leader's error is raised in every waiting caller")
+
+def test_follower_deadline():
+    flight = SingleFlight()
+    threading.Thread(target=flight.do, args=("key", lambda: time.sleep(0.5))).start()
+    time.sleep(0.05)
+    
+    start = time.perf_counter()
+    try:
+        with deadline(0.1):
+            flight.do("key", lambda: "never runs")
+        raise AssertionError("expected LLMServiceError")
+    except LLMServiceError:
+        pass
+    assert time.perf_counter() - start < 0.3
+    print("✅ A follower gives up at its own deadline")
+
+def test_async_requests_share_one_gemini_call():
+    server, base_url = start_fake_gemini_server()
+    try:
+        FakeGeminiHandler.reset(latency=0.3)
+        flight = SingleFlight()
+        service = make_service(base_url)
+        service.flight = flight
+        
+        async def double_click():
+            answers = await asyncio.gather(
+                *(service.analyze_text("analyze claim 42") for _ in range(20)),
+                service.analyze_text("analyze claim 43"),
+            )
+            await service.aclose()
+            return answers
+        
+        answers = asyncio.run(double_click())
+        assert answers[:20] == ["answer to: analyze claim 42"] * 20
+        assert answers[20] == "answer to: analyze claim 43"
+        assert len(FakeGeminiHandler.requests_seen) == 2, len(FakeGeminiHandler.requests_seen)
+        stats = flight.stats()
+        assert stats["calls"] == 2 and stats["coalesced"] == 19, stats
+        print(f"✅ 21 async requests, 2 Gemini calls, coalesced rate {stats['coalesced_rate']}")
+    finally:
+        server.shutdown()
+
+def main():
+    print("🧪 SINGLE-FLIGHT TEST")
+    print("=" * 50)
+    test_threads_share_one_call()
+    test_errors_are_shared()
+    test_follower_deadline()
+    test_async_requests_share_one_gemini_call()
+    print("\n🎉 All single-flight tests passed")
+
+if __name__ == "__main__":
+    main()
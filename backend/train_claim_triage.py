@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Train and evaluate the local claim triage model (app/services/claim_triage.py)
+Labels come from the EMAILS table (is_claim, or claim threads an analyst handled), from a JSONL
+export ({"subject", "body", "is_claim"} per line) or from a synthetic mailbox. A hold-out split
+is scored at several skip thresholds: LLM calls avoided on non-claims, claims that would skip
+the LLM, and scoring time per email.
+
+    python train_claim_triage.py                      # EMAILS table, saves the model
+    python train_claim_triage.py --jsonl labeled.jsonl
+    python train_claim_triage.py --synthetic 3000 --no-save
+    python train_claim_triage.py --evaluate-only      # the saved model on the current labels
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+# Agregar el directorio actual al path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from app.services.claim_triage import ClaimTriageModel, evaluate, load_training_examples, claim_triage
+
+THRESHOLDS = [0.05, 0.1, 0.2, 0.3, 0.5]
+
+NAMES = ["Ana Lopez", "John Smith", "Maria Garcia", "Peter Brown", "Lucia Fernandez", "David Miller"]
+CITIES = ["Madrid", "Paris", "Rome", "Lisbon", "Mexico City", "New York"]
+INCIDENTS = [
+    "my flight {flight} to {city} was cancelled and I had to book a hotel for two nights",
+    "my flight {flight} was delayed nine hours and I missed my connection to {city}",
+    "I had an accident during my trip to {city} and was treated at the hospital",
+    "my luggage was lost on the way to {city} and I had to buy clothes",
+    "I had to cancel my trip to {city} because my mother fell ill",
+    "the hotel in {city} was closed when I arrived and I paid for another one",
+]
+CLAIM_SUBJECTS = ["Travel insurance claim", "Claim for trip cancellation", "Flight delay claim",
+                  "Re: Claim {ref}", "Trip interruption - policy {policy}", "Medical claim during my trip"]
+CLAIM_CLOSINGS = [
+    "I attach the receipts. My policy number is {policy}. Please let me know what else you need.",
+    "How do I get reimbursed for these costs? Policy {policy}.",
+    "Please find the medical report attached for claim {ref}. Regards, {name}",
+    "Could you tell me the status of claim {ref}? I sent the documents last week.",
+]
+NOISE_SUBJECTS = ["Your weekly deals", "Order {ref} has shipped", "Your receipt from {city} Cafe",
+                  "Update to our privacy policy", "Flash sale: travel insurance from $9",
+                  "Shipping delay on your order", "Your statement is ready", "Webinar: loss prevention tips",
+                  "Claim your free upgrade", "Flight {flight} to {city}: schedule change"]
+NOISE_BODIES = [
+    "<html><body><h1>New arrivals</h1><p>Save 20% this weekend on shoes and bags. "
+    "Free shipping on orders over $50.</p><p>Disclaimer: see our return policy.</p></body></html>",
+    "Thanks for your order {ref}. Due to high demand there may be a delay of 2-3 days. Track your package online.",
+    "Receipt {ref}: 2 x cappuccino, 1 x croissant. Total 9.40. Paid with card ending 4242.",
+    "We updated our privacy policy and terms of service. No action is needed on your side.",
+    "Protect your next holiday! Travel insurance with full coverage from $9. Get a quote in 2 minutes.",
+    "Join our free webinar on loss prevention and damage control for small businesses. Register now.",
+    "Your monthly statement is available. Log in to your account to view it. This is an automated message.",
+    "Hello {name}, claim your free seat upgrade on your next trip to {city}. Offer valid until Sunday.",
+    "Dear {name}, your flight {flight} to {city} now departs 40 minutes later. No action is needed, "
+    "we apologise for the delay.",
+]
+
+def synthetic_examples(count: int, seed: int = 5):
+    """A mailbox of what passes the keyword check: ~35% claims, the rest keyword-laden noise"""
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(count):
+        slots = {
+            "name": rng.choice(NAMES), "city": rng.choice(CITIES),
+            "flight": f"{rng.choice(['IB', 'AF', 'AZ', 'TP', 'AM'])}{rng.randint(100, 9999)}",
+            "policy": f"POL-{rng.randint(2020, 2025)}-{rng.randint(1, 999):03d}",
+            "ref": f"CLM-{rng.randint(1000, 9999)}",
+        }
+        if rng.random() < 0.35:
+            subject = rng.choice(CLAIM_SUBJECTS).format(**slots)
+            body = (f"Hello, my name is {slots['name']}. {rng.choice(INCIDENTS).format(**slots).capitalize()}. "
+                    f"{rng.choice(CLAIM_CLOSINGS).format(**slots)}")
+            examples.append((subject, body, 1))
+        else:
+            examples.append((rng.choice(NOISE_SUBJECTS).format(**slots), rng.choice(NOISE_BODIES).format(**slots), 0))
+    return examples
+
+def jsonl_examples(path: str):
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row.get("subject", ""), row.get("body", ""), int(bool(row["is_claim"]))))
+    return examples
+
+def database_examples():
+    from app.core.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        return load_training_examples(db)
+    finally:
+        db.close()
+
+def split(examples, test_fraction: float, seed: int = 11):
+    """Stratified hold-out split"""
+    rng = random.Random(seed)
+    train, test = [], []
+    for label in (0, 1):
+        group = [example for example in examples if example[2] == label]
+        rng.shuffle(group)
+        cut = int(round(len(group) * test_fraction))
+        test.extend(group[:cut])
+        train.extend(group[cut:])
+    return train, test
+
+def report(model: ClaimTriageModel, examples):
+    print(f"{'skip below':>10s} {'LLM calls':>10s} {'non-claims skipped':>19s} {'claims skipped':>15s} {'recall':>7s}")
+    for threshold in THRESHOLDS:
+        metrics = evaluate(model, examples, threshold)
+        print(f"{threshold:10.2f} {metrics['llm_calls']:5d}/{metrics['examples']:<4d} "
+              f"{metrics['non_claims_skipped']:6d} ({metrics['non_claims_skipped_rate'] * 100:5.1f}%)   "
+              f"{metrics['claims_skipped']:10d}     {metrics['claim_recall']:7.3f}")
+    metrics = evaluate(model, examples, 0.5)
+    print(f"\nAt 0.5: accuracy {metrics['accuracy']:.3f}, precision {metrics['precision']:.3f}")
+    
+    start = time.perf_counter()
+    for subject, body, _ in examples:
+        model.score(subject, body)
+    elapsed = time.perf_counter() - start
+    print(f"Scoring: {elapsed * 1e6 / max(1, len(examples)):.0f} µs/email")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jsonl", help="Labeled emails, one JSON object per line")
+    parser.add_argument("--synthetic", type=int, help="Train on a synthetic mailbox of this many emails")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--output", default=claim_triage.model_path, help="Where the model is saved")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--evaluate-only", action="store_true", help="Evaluate the saved model on all examples")
+    args = parser.parse_args()
+    
+    print("🧪 CLAIM TRIAGE MODEL")
+    print("=" * 50)
+    
+    if args.synthetic:
+        examples, source = synthetic_examples(args.synthetic), f"synthetic mailbox of {args.synthetic}"
+    elif args.jsonl:
+        examples, source = jsonl_examples(args.jsonl), args.jsonl
+    else:
+        examples, source = database_examples(), "EMAILS table"
+    
+    claims = sum(label for _, _, label in examples)
+    print(f"{len(examples)} labeled emails from {source}: {claims} claims, {len(examples) - claims} other\n")
+    
+    if args.evaluate_only:
+        model = ClaimTriageModel.load(args.output)
+        print(f"Model {args.output}: {model.metadata}\n")
+        report(model, examples)
+        return
+    
+    if not claims or claims == len(examples):
+        print("❌ Both claims and non-claims are needed to train. Let the single-pass analysis label emails first")
+        sys.exit(1)
+    
+    train, test = split(examples, args.test_fraction)
+    start = time.perf_counter()
+    model = ClaimTriageModel.train(train, epochs=args.epochs)
+    print(f"Trained on {len(train)} emails in {time.perf_counter() - start:.1f}s, "
+          f"{len(model.idf)} features; evaluating on {len(test)} held out\n")
+    report(model, test)
+    
+    if not args.no_save:
+        # The saved model uses every example
+        model = ClaimTriageModel.train(examples, epochs=args.epochs)
+        model.save(args.output)
+        print(f"\n✅ Model saved to {args.output}; restart the backend (or call claim_triage.reload()) to use it")
+
+if __name__ == "__main__":
+    main()